@@ -20,6 +20,13 @@ class YourAppConfig(AppConfig):
     
     # apps.py
     def ready(self):
+        from . import search  # noqa: F401  registers the search index signal handlers
+        from . import media_storage  # noqa: F401  releases media references on delete
+        from . import permissions  # noqa: F401  drops cached role masks on change
+        from . import db_tuning  # noqa: F401  SQLite PRAGMAs on each new connection
+        from . import fragments  # noqa: F401  expires cached dropdowns when products/vendors change
+        from . import payables  # noqa: F401  keeps vendor balances in step with purchase orders
+
         #if 'runserver' in sys.argv:
         if os.environ.get('RUN_MAIN') == 'true':
             print("🔥 Starting meeting reminder thread")
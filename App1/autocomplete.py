@@ -0,0 +1,155 @@
+import re
+
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery
+
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+
+# Fields each search key is built from, in order: the name comes first so a
+# prefix of the name is also a prefix of the key.
+CUSTOMER_KEY_FIELDS = ('shop_name', 'full_name', 'customer_name', 'shop_city', 'phone_number')
+PRODUCT_KEY_FIELDS = ('name', 'brand_name', 'model_name', 'hsn_code')
+
+# Sorts after any character a key can contain; closes the prefix range scan.
+_KEY_END = '\uffff'
+
+CUSTOMER_FIELDS = ('id', 'full_name', 'shop_name', 'discount', 'shop_address',
+                   'shop_city', 'shop_district', 'shop_state', 'shop_pincode')
+
+
+def _words(*values):
+    return [w for value in values for w in re.findall(r'[a-z0-9]+', (value or '').lower())]
+
+
+def make_key(*values):
+    """Lowercase words of the values joined by single spaces."""
+    return ' '.join(_words(*values))[:255]
+
+
+def customer_key(customer):
+    # Phone numbers are typed without the spaces or dashes they were saved with
+    phone = re.sub(r'\D', '', customer.phone_number or '')
+    return make_key(customer.shop_name, customer.full_name, customer.customer_name, customer.shop_city, phone)
+
+
+def product_key(product):
+    return make_key(product.name, product.brand_name, product.model_name, product.hsn_code)
+
+
+def refresh_keys(model, key, fields):
+    """
+    Recompute search_key for every row of `model`, writing only the ones that
+    changed. One executemany UPDATE; bulk_update's CASE statements are ~10x slower.
+    """
+    stale = []
+    for obj in model.objects.only('id', 'search_key', *fields).iterator(chunk_size=2000):
+        value = key(obj)
+        if value != obj.search_key:
+            stale.append((value, obj.id))
+
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(f"UPDATE {qn(model._meta.db_table)} SET {qn('search_key')} = %s WHERE {qn('id')} = %s", stale)
+    return len(stale)
+
+
+def rebuild_keys():
+    """Bring the keys up to date after bulk loads that bypass save(). Returns the rows changed."""
+    from .models import Customer, Product
+
+    return (refresh_keys(Customer, customer_key, CUSTOMER_KEY_FIELDS)
+            + refresh_keys(Product, product_key, PRODUCT_KEY_FIELDS))
+
+
+def parse_limit(value):
+    try:
+        return max(1, min(int(value), MAX_LIMIT))
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+
+
+def _match(queryset, query, limit, order=('search_key',)):
+    """
+    Rows whose key starts with the query, in `order` (key order by default):
+    a range scan on the search_key index (SQLite's LIKE is case-insensitive
+    and can't use it). If that finds fewer than `limit`, rows where every
+    token starts a word of the key fill the rest, so "kumar ram" still finds
+    "Sri Ram ... Kumar".
+    """
+    tokens = _words(query)[:8]
+    prefix = ' '.join(tokens)
+    found = list(queryset.filter(search_key__gte=prefix, search_key__lt=prefix + _KEY_END)
+                 .order_by(*order)[:limit])
+
+    if tokens and len(found) < limit:
+        rest = queryset.exclude(id__in=[row['id'] for row in found])
+        for t in tokens:
+            rest = rest.filter(Q(search_key__startswith=t) | Q(search_key__contains=' ' + t))
+        found += list(rest.order_by(*order)[:limit - len(found)])
+    return found
+
+
+def complete_customers(current_user, query, limit=DEFAULT_LIMIT):
+    """Customers for the order form's picker with discount and shop address inline; salesmen see their own."""
+    from .models import Customer
+
+    customers = Customer.objects.all()
+    if not (current_user.role and current_user.role.name.lower() == "admin"):
+        customers = customers.filter(user=current_user)
+
+    return [_customer_entry(c) for c in _match(customers.values(*CUSTOMER_FIELDS), query, limit)]
+
+
+def customer_option(customer):
+    """The picker entry for a Customer instance, e.g. the one the salesman is checked in at."""
+    return _customer_entry({f: getattr(customer, f) for f in CUSTOMER_FIELDS})
+
+
+def _customer_entry(c):
+    return {
+        'id': c['id'],
+        'label': f"{c['full_name']} - ({c['shop_name']})",
+        'discount': float(c['discount'] or 0),
+        'shop_address': c['shop_address'],
+        'shop_city': c['shop_city'],
+        'shop_district': c['shop_district'],
+        'shop_state': c['shop_state'],
+        'shop_pincode': c['shop_pincode'],
+    }
+
+
+def complete_products(query, limit=DEFAULT_LIMIT):
+    """
+    Refurbished products for the order form's picker, fast movers first (see
+    product_ranking). Price and stock come from the same batch
+    get_product_details uses (the oldest one stocked in); products without
+    one are returned with in_stock False.
+    """
+    from .models import DailyProduction, Product
+    from .product_ranking import with_rank
+
+    batch = DailyProduction.objects.filter(product=OuterRef('pk'), stock_in__gt=0).order_by('id').values('id')[:1]
+    products = (with_rank(Product.objects.filter(product_type='REFURBISHED'))
+                .annotate(batch_id=Subquery(batch))
+                .values('id', 'name', 'gstpercentage', 'batch_id', 'abc_class'))
+    products = _match(products, query, limit, order=(F('sales_rank').asc(nulls_last=True), 'search_key'))
+
+    batches = DailyProduction.objects.only('sale_price', 'mrp', 'current_stock').in_bulk(
+        [p['batch_id'] for p in products if p['batch_id']]
+    )
+    results = []
+    for p in products:
+        b = batches.get(p['batch_id'])
+        results.append({
+            'id': p['id'],
+            'name': p['name'],
+            'gstpercentage': float(p['gstpercentage']),
+            'abc_class': p['abc_class'],
+            'in_stock': b is not None,
+            'sale_price': float(b.sale_price) if b else None,
+            'mrp': float(b.mrp) if b else None,
+            'current_stock': b.current_stock if b else 0,
+        })
+    return results
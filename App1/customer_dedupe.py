@@ -0,0 +1,223 @@
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import Count
+
+
+# Words that carry no identity for a shop name ("Sri Ram Electronics Pvt Ltd"
+# and "Sriram Electronics" are the same shop).
+NAME_STOPWORDS = {
+    'the', 'and', 'of', 'm/s', 'ms', 'pvt', 'private', 'ltd', 'limited', 'llp',
+    'co', 'company', 'corp', 'inc', 'shop', 'store', 'stores', 'enterprise', 'enterprises',
+}
+
+ADDRESS_ABBREVIATIONS = {
+    'rd': 'road', 'st': 'street', 'opp': 'opposite', 'nr': 'near', 'ngr': 'nagar',
+    'no': '', 'blr': 'bangalore', 'bengaluru': 'bangalore',
+}
+
+GRAM_SIZE = 3
+NAME_WEIGHT = 0.7
+ADDRESS_WEIGHT = 0.3
+DEFAULT_THRESHOLD = 0.6
+MAX_POSTING = 2000
+
+
+def _words(value):
+    value = (value or '').lower().replace('&', ' and ')
+    return re.findall(r'[a-z0-9]+', value)
+
+
+def normalize_name(value):
+    """Lowercase, drop punctuation and legal/filler words, remove spaces."""
+    words = [w for w in _words(value) if w not in NAME_STOPWORDS]
+    return ''.join(words)[:255]
+
+
+def normalize_address(value):
+    words = (ADDRESS_ABBREVIATIONS.get(w, w) for w in _words(value))
+    return ' '.join(w for w in words if w)[:255]
+
+
+def normalize_gst(value):
+    return re.sub(r'[^A-Z0-9]', '', (value or '').upper())
+
+
+def trigrams(key):
+    """Character n-grams of a normalized key, padded so short names still index."""
+    if not key:
+        return set()
+    padded = f"  {key} "
+    return {padded[i:i + GRAM_SIZE] for i in range(len(padded) - GRAM_SIZE + 1)}
+
+
+def dice(a, b):
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def address_similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def set_customer_keys(customer):
+    customer.name_key = normalize_name(customer.shop_name)
+    customer.address_key = normalize_address(customer.shop_address)
+    customer.gst_key = normalize_gst(customer.gst_number)
+
+
+def index_customer(customer):
+    """Replace the customer's trigram postings. Called from Customer.save."""
+    from .models import CustomerTrigram
+
+    grams = trigrams(customer.name_key)
+    with transaction.atomic():
+        CustomerTrigram.objects.filter(customer=customer).delete()
+        CustomerTrigram.objects.bulk_create(
+            [CustomerTrigram(customer=customer, gram=g) for g in grams]
+        )
+
+
+def find_duplicate_customers(shop_name='', shop_address='', gst_number='', exclude_id=None,
+                             limit=5, threshold=DEFAULT_THRESHOLD):
+    """
+    Return likely duplicates as a list of dicts sorted by score (0..1).
+    A GSTIN match scores 1.0; otherwise the score blends trigram similarity
+    of the shop name with similarity of the normalized address.
+    Uses the gst_key index and the trigram postings index, never a table scan.
+    """
+    from .models import Customer, CustomerTrigram
+
+    gst_key = normalize_gst(gst_number)
+    name_key = normalize_name(shop_name)
+    address_key = normalize_address(shop_address)
+    query_grams = trigrams(name_key)
+
+    scores = {}
+    if gst_key:
+        for cid in Customer.objects.filter(gst_key=gst_key).values_list('id', flat=True):
+            scores[cid] = 1.0
+
+    if query_grams:
+        # Candidates sharing at least a third of the query's grams, best first.
+        min_hits = max(1, len(query_grams) // 3)
+        hits = (
+            CustomerTrigram.objects.filter(gram__in=query_grams)
+            .values('customer_id')
+            .annotate(hits=Count('id'))
+            .filter(hits__gte=min_hits)
+            .order_by('-hits')[:limit * 10]
+        )
+        candidate_ids = [h['customer_id'] for h in hits]
+
+        for c in Customer.objects.filter(id__in=candidate_ids).values('id', 'name_key', 'address_key'):
+            name_score = dice(query_grams, trigrams(c['name_key']))
+            if address_key:
+                score = NAME_WEIGHT * name_score + ADDRESS_WEIGHT * address_similarity(address_key, c['address_key'])
+            else:
+                score = name_score
+            scores[c['id']] = max(scores.get(c['id'], 0.0), score)
+
+    if exclude_id:
+        scores.pop(exclude_id, None)
+
+    ranked = sorted(
+        ((cid, s) for cid, s in scores.items() if s >= threshold),
+        key=lambda pair: pair[1], reverse=True,
+    )[:limit]
+
+    details = Customer.objects.in_bulk([cid for cid, _ in ranked])
+    return [
+        {
+            'id': cid,
+            'score': round(score, 3),
+            'shop_name': details[cid].shop_name,
+            'shop_address': details[cid].shop_address,
+            'shop_city': details[cid].shop_city,
+            'gst_number': details[cid].gst_number,
+        }
+        for cid, score in ranked
+    ]
+
+
+def rebuild_index():
+    """Recompute keys and trigram postings for every customer in bulk."""
+    from .models import Customer, CustomerTrigram
+
+    customers = list(Customer.objects.only('id', 'shop_name', 'shop_address', 'gst_number'))
+    for c in customers:
+        set_customer_keys(c)
+
+    with transaction.atomic():
+        Customer.objects.bulk_update(customers, ['name_key', 'address_key', 'gst_key'], batch_size=1000)
+        CustomerTrigram.objects.all().delete()
+        CustomerTrigram.objects.bulk_create(
+            [CustomerTrigram(customer_id=c.id, gram=g) for c in customers for g in trigrams(c.name_key)],
+            batch_size=5000,
+        )
+    return len(customers)
+
+
+def cluster_duplicates(threshold=DEFAULT_THRESHOLD):
+    """
+    Group the whole customer table into duplicate clusters.
+    The postings are loaded once into memory; each customer is compared only
+    with customers sharing a trigram, and matches are merged with union-find.
+    Returns a list of clusters (lists of customer ids), largest first.
+    """
+    from .models import Customer, CustomerTrigram
+
+    rows = {c['id']: c for c in Customer.objects.values('id', 'name_key', 'address_key', 'gst_key')}
+    grams = {cid: trigrams(c['name_key']) for cid, c in rows.items()}
+
+    postings = defaultdict(list)
+    for cid, gram in CustomerTrigram.objects.values_list('customer_id', 'gram').iterator(chunk_size=5000):
+        postings[gram].append(cid)
+
+    parent = {cid: cid for cid in rows}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a, b):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    by_gst = defaultdict(list)
+    for cid, c in rows.items():
+        if c['gst_key']:
+            by_gst[c['gst_key']].append(cid)
+    for ids in by_gst.values():
+        for other in ids[1:]:
+            union(ids[0], other)
+
+    # Grams shared by a huge share of the table ("ele", "tro") only add noise.
+    common = {g for g, ids in postings.items() if len(ids) > MAX_POSTING}
+
+    for cid, c in rows.items():
+        shared = Counter(
+            other for g in grams[cid] - common for other in postings.get(g, ()) if other > cid
+        )
+        min_hits = max(1, len(grams[cid]) // 3)
+        for other, hits in shared.items():
+            if hits < min_hits:
+                continue
+            score = dice(grams[cid], grams[other])
+            if c['address_key'] and rows[other]['address_key']:
+                score = NAME_WEIGHT * score + ADDRESS_WEIGHT * address_similarity(c['address_key'], rows[other]['address_key'])
+            if score >= threshold:
+                union(cid, other)
+
+    clusters = defaultdict(list)
+    for cid in rows:
+        clusters[find(cid)].append(cid)
+    return sorted((sorted(ids) for ids in clusters.values() if len(ids) > 1), key=len, reverse=True)
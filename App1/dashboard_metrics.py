@@ -0,0 +1,205 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import CharField, Count, Q, Sum, Value
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Category, Customer, DailyProduction, SaleItem, SalesOrder, User, VendorBalance
+
+
+# Seconds a computed set of metrics is served before it is rebuilt
+TTL = getattr(settings, 'DASHBOARD_METRICS_TIMEOUT', 60)
+# Expired metrics stay in the cache this much longer, served while one request rebuilds them
+STALE_GRACE = getattr(settings, 'DASHBOARD_METRICS_GRACE', 5 * 60)
+# Longest a rebuild may hold the lock before another request is allowed to try
+LOCK_TIMEOUT = 30
+
+PRODUCTION_DAYS = 14
+TOP_N = 5
+
+
+def _cached(key, build):
+    """
+    Metrics from the cache, rebuilt at most once per expiry: the request that
+    wins cache.add() on the lock key recomputes, every other request keeps
+    serving the expired copy until the new one lands. Only a cold cache makes
+    them wait, briefly, for the first build. The lock holds across workers as
+    long as the backend's add() is atomic (App1.file_cache, Redis, Memcached;
+    LocMemCache only within one process).
+    """
+    entry = cache.get(key)
+    if entry and entry['expires'] > time.time():
+        return entry['data']
+
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+        try:
+            data = build()
+            data['generated_at'] = timezone.now().isoformat()
+            cache.set(key, {'data': data, 'expires': time.time() + TTL}, TTL + STALE_GRACE)
+        finally:
+            cache.delete(lock)
+        return data
+
+    if entry:
+        return entry['data']
+    deadline = time.time() + LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry:
+            return entry['data']
+    return build()
+
+
+def _counts(**querysets):
+    """COUNT(*) of several tables in one UNION ALL query."""
+    parts = [
+        qs.order_by().annotate(metric=Value(name, output_field=CharField())).values('metric')
+        .annotate(n=Count('id')).values_list('metric', 'n')
+        for name, qs in querysets.items()
+    ]
+    return dict(parts[0].union(*parts[1:], all=True))
+
+
+def _start_of_today():
+    return timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+
+
+def _top_customers(orders):
+    top = (orders.values('customer_id', 'customer__full_name', 'customer__shop_name', 'customer__shop_city')
+           .annotate(revenue=Sum('grand_total'), orders=Count('id'))
+           .order_by('-revenue')[:TOP_N])
+    return [
+        {
+            'name': c['customer__full_name'],
+            'shop_name': c['customer__shop_name'],
+            'shop_city': c['customer__shop_city'],
+            'revenue': float(c['revenue'] or 0),
+            'orders': c['orders'],
+        }
+        for c in top
+    ]
+
+
+def admin_metrics():
+    """Company-wide KPIs in seven grouped queries."""
+    today = timezone.localdate()
+    counts = _counts(customers=Customer.objects.all(), staff=User.objects.all())
+
+    orders = SalesOrder.objects.aggregate(
+        total_orders=Count('id'),
+        today_orders=Count('id', filter=Q(order_date__gte=_start_of_today())),
+        revenue=Sum('grand_total'),
+        receivables=Sum('balance_due'),
+        pending_deliveries=Count('id', filter=~Q(delivery_status='delivered')),
+    )
+    # Payables and purchases come from the per-vendor running totals
+    payables = VendorBalance.objects.aggregate(payables=Sum('outstanding'), purchases=Sum('total_purchased'))
+
+    categories = list(Category.objects.annotate(product_count=Count('product')).values('name', 'product_count').order_by('name'))
+
+    top_salesmen = (
+        SalesOrder.objects.filter(created_by__role__name__icontains='salesman')
+        .values('created_by_id', 'created_by__first_name', 'created_by__last_name')
+        .annotate(revenue=Sum('grand_total'), orders=Count('id'))
+        .order_by('-revenue')[:TOP_N]
+    )
+    product_distribution = (
+        SaleItem.objects.values('product__name').annotate(total_quantity=Sum('quantity')).order_by('-total_quantity')[:10]
+    )
+    production = (
+        DailyProduction.objects.filter(refurbished_date__gt=today - timedelta(days=PRODUCTION_DAYS))
+        .values('refurbished_date', 'product__name').annotate(total_quantity=Sum('stock_in'))
+        .order_by('refurbished_date', 'product__name')
+    )
+    production = [
+        {'date_only': p['refurbished_date'].isoformat(), 'product__name': p['product__name'], 'total_quantity': p['total_quantity']}
+        for p in production
+    ]
+
+    return {
+        'role': 'admin',
+        'total_customers': counts.get('customers', 0),
+        'total_staff': counts.get('staff', 0),
+        'total_categories': len(categories),
+        'total_products': sum(c['product_count'] for c in categories),
+        'total_orders': orders['total_orders'],
+        'today_orders': orders['today_orders'],
+        'total_revenue': float(orders['revenue'] or 0),
+        'total_receivables': float(orders['receivables'] or 0),
+        'pending_deliveries': orders['pending_deliveries'],
+        'total_payables': float(payables['payables'] or 0),
+        'total_purchases': float(payables['purchases'] or 0),
+        'today_production': sum(p['total_quantity'] for p in production if p['date_only'] == today.isoformat()),
+        'category_distribution': categories,
+        'product_distribution': list(product_distribution),
+        'daily_production_data': production,
+        'top_customers_list': _top_customers(SalesOrder.objects.all()),
+        'top_salesman_list': [
+            {
+                'first_name': s['created_by__first_name'],
+                'last_name': s['created_by__last_name'],
+                'revenue': float(s['revenue'] or 0),
+                'orders': s['orders'],
+            }
+            for s in top_salesmen
+        ],
+    }
+
+
+def salesman_metrics(user):
+    """The salesman's own KPIs in three grouped queries."""
+    orders = SalesOrder.objects.filter(created_by=user)
+
+    by_status = list(
+        orders.values('delivery_status')
+        .annotate(orders=Count('id'), revenue=Sum('grand_total'),
+                  today=Count('id', filter=Q(order_date__gte=_start_of_today())))
+        .order_by('delivery_status')
+    )
+    # This month and the five before it
+    since = (timezone.localdate().replace(day=1) - timedelta(days=150)).replace(day=1)
+    monthly = (
+        orders.filter(order_date__date__gte=since)
+        .annotate(month=TruncMonth('order_date')).values('month')
+        .annotate(revenue=Sum('grand_total')).order_by('month')
+    )
+    labels = dict(SalesOrder.DELIVERY_STATUS_CHOICES)
+
+    return {
+        'role': 'salesman',
+        'today_orders': sum(s['today'] for s in by_status),
+        'total_orders': sum(s['orders'] for s in by_status),
+        'total_revenue': float(sum(s['revenue'] or 0 for s in by_status)),
+        'status_distribution': [
+            {'status': labels.get(s['delivery_status'], s['delivery_status']), 'orders': s['orders']} for s in by_status
+        ],
+        'monthly_revenue': [
+            {'month': m['month'].strftime('%b %Y'), 'revenue': float(m['revenue'] or 0)} for m in monthly
+        ],
+        'top_customers_list': _top_customers(orders),
+    }
+
+
+def is_salesman(user):
+    return bool(user.role and user.role.name.lower() == "salesman")
+
+
+def is_admin(user):
+    return bool(user.role and user.role.name.lower() == "admin")
+
+
+def metrics_for(user):
+    """
+    The dashboard metrics `user` may see: their own as a salesman, the
+    company's as an admin; None for any other role (or none).
+    """
+    if is_salesman(user):
+        return _cached(f'dashboard-metrics:salesman:{user.id}', lambda: salesman_metrics(user))
+    if is_admin(user):
+        return _cached('dashboard-metrics:admin', admin_metrics)
+    return None
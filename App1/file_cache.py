@@ -0,0 +1,52 @@
+import os
+import stat
+from contextlib import contextmanager
+
+from django.core.cache.backends import filebased
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    """
+    Django's file cache, shared by every worker on the host, with two changes:
+
+    - The cache unpickles whatever it reads, so it refuses a directory that
+      another user owns or that group/others can write to.
+    - add() and incr() hold an exclusive flock on one lock file, so the
+      login guard counters, permission version and dashboard rebuild lock
+      stay atomic across processes.
+    """
+
+    def _createdir(self):
+        super()._createdir()  # os.makedirs(..., 0o700) when it doesn't exist yet
+        info = os.stat(self._dir)
+        if (hasattr(os, 'getuid') and info.st_uid != os.getuid()) or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise ImproperlyConfigured(
+                f"Cache directory {self._dir} must be owned by this user and not group/world-writable (chmod 700)."
+            )
+
+    @contextmanager
+    def _exclusive(self):
+        if fcntl is None:
+            yield
+            return
+        self._createdir()
+        with open(os.path.join(self._dir, 'atomic.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def add(self, key, value, timeout=filebased.DEFAULT_TIMEOUT, version=None):
+        with self._exclusive():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._exclusive():
+            return super().incr(key, delta, version)
@@ -0,0 +1,67 @@
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from .models import Product, Vendor
+
+
+# Models whose lists are rendered into cached dropdown fragments. Every save or
+# delete moves the model to a new version, so fragments keyed by it go stale at once.
+VERSIONED = {'product': Product, 'vendor': Vendor}
+
+# Fragment lifetimes in seconds. Dropdowns also expire on a timer because
+# queryset.update() and bulk_create() change rows without sending signals.
+SIDEBAR_TIMEOUT = getattr(settings, 'SIDEBAR_FRAGMENT_TIMEOUT', 24 * 60 * 60)
+DROPDOWN_TIMEOUT = getattr(settings, 'DROPDOWN_FRAGMENT_TIMEOUT', 5 * 60)
+
+
+def _template_release():
+    """Fingerprint of the project templates, so a deploy or an edit never serves old markup from the shared cache."""
+    digest = hashlib.md5()
+    for engine in settings.TEMPLATES:
+        for directory in engine.get('DIRS', []):
+            for root, _dirs, files in os.walk(directory):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    digest.update(f"{path}:{os.stat(path).st_mtime_ns}".encode())
+    return digest.hexdigest()[:10]
+
+
+RELEASE = _template_release()
+
+
+def _key(name):
+    return f'fragment-version:{name}'
+
+
+def version(name=None):
+    """Cache-key component for a fragment: the template release, plus the model's version when named."""
+    if name is None:
+        return RELEASE
+    value = cache.get(_key(name))
+    if value is None:
+        # A clock value rather than 1: if the counter is evicted it must not
+        # come back as a number an old fragment is still cached under.
+        cache.add(_key(name), time.time_ns(), None)
+        value = cache.get(_key(name))
+    return f"{RELEASE}.{value}"
+
+
+def bump(*names):
+    for name in names or VERSIONED:
+        cache.set(_key(name), time.time_ns(), None)
+
+
+def _bump_on_change(sender, **kwargs):
+    for name, model in VERSIONED.items():
+        if sender is model:
+            bump(name)
+
+
+for _name, _model in VERSIONED.items():
+    post_save.connect(_bump_on_change, sender=_model, dispatch_uid=f'fragment-version-save-{_name}')
+    post_delete.connect(_bump_on_change, sender=_model, dispatch_uid=f'fragment-version-delete-{_name}')
@@ -0,0 +1,100 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import GoodsReceipt, Inventory, PurchaseItem, PurchaseOrder, StockMovement
+
+
+CENT = Decimal('0.01')
+
+
+def weighted_average(on_hand, average_cost, quantity, unit_cost):
+    """Average unit cost after `quantity` units arrive at `unit_cost`. Stock below zero counts as none."""
+    on_hand = max(on_hand, 0)
+    if on_hand + quantity <= 0:
+        return average_cost
+    total = on_hand * Decimal(average_cost) + quantity * Decimal(unit_cost)
+    return (total / (on_hand + quantity)).quantize(CENT, ROUND_HALF_UP)
+
+
+def _lines(order, items, quantities):
+    """Validate the requested quantities; returns [(item, quantity)] for the non-zero ones."""
+    if quantities is None:
+        return [(item, item.outstanding) for item in items.values() if item.outstanding > 0]
+
+    lines = []
+    for item_id, quantity in quantities.items():
+        try:
+            item = items.get(int(item_id))
+            quantity = int(quantity or 0)
+        except (TypeError, ValueError):
+            raise ValidationError("Received quantities must be whole numbers.")
+        if item is None:
+            raise ValidationError(f"Item {item_id} is not on PO-{order.id}.")
+        if quantity < 0:
+            raise ValidationError(f"Received quantity for {item.product.name} can't be negative.")
+        if quantity > item.outstanding:
+            raise ValidationError(f"Only {item.outstanding} of {item.product.name} are still to be received.")
+        if quantity:
+            lines.append((item, quantity))
+    return lines
+
+
+def receive(purchase_order_id, quantities=None, user=None, remarks=''):
+    """
+    Post a goods receipt against a purchase order.
+
+    `quantities` maps PurchaseItem id -> units received now (partial receipts
+    are fine); None receives everything still outstanding. Each line adds a
+    StockMovement, raises the product's Inventory and re-weights its average
+    cost. The order is marked received once every line is complete.
+
+    Runs in one transaction and reads the order, its lines and their
+    inventory rows once (locked), then writes everything back with
+    bulk_create/bulk_update: at most nine queries on PostgreSQL however long the
+    order is. SQLite splits bulk statements every 999 parameters.
+    Returns the GoodsReceipt, or None when there was nothing to receive.
+    """
+    with transaction.atomic():
+        order = PurchaseOrder.objects.select_for_update().get(pk=purchase_order_id)
+        items = {
+            item.id: item
+            for item in PurchaseItem.objects.select_for_update(of=('self',)).select_related('product').filter(purchase_order=order)
+        }
+        lines = _lines(order, items, quantities)
+        if not lines:
+            return None
+
+        product_ids = {item.product_id for item, _ in lines}
+        stock = {}
+        for inventory in Inventory.objects.select_for_update().filter(product_id__in=product_ids).order_by('id'):
+            stock.setdefault(inventory.product_id, inventory)
+        for inventory in Inventory.objects.bulk_create([Inventory(product_id=pid) for pid in product_ids - stock.keys()]):
+            stock[inventory.product_id] = inventory
+
+        now = timezone.now()
+        receipt = GoodsReceipt.objects.create(purchase_order=order, received_by=user, received_at=now, remarks=remarks)
+
+        movements = []
+        for item, quantity in lines:
+            inventory = stock[item.product_id]
+            inventory.average_cost = weighted_average(inventory.current_stock, inventory.average_cost, quantity, item.cost_price)
+            inventory.stock_in += quantity
+            inventory.current_stock = inventory.opening_stock + inventory.stock_in - inventory.stock_out
+            inventory.last_updated = now
+            item.received_quantity += quantity
+            movements.append(StockMovement(
+                product_id=item.product_id, movement_type='receipt', quantity=quantity,
+                unit_cost=item.cost_price, receipt=receipt, purchase_item=item, created_at=now,
+            ))
+
+        StockMovement.objects.bulk_create(movements)
+        PurchaseItem.objects.bulk_update([item for item, _ in lines], ['received_quantity'])
+        Inventory.objects.bulk_update(stock.values(), ['stock_in', 'current_stock', 'average_cost', 'last_updated'])
+
+        if all(item.outstanding == 0 for item in items.values()):
+            order.is_received = True
+            order.save(update_fields=['is_received'])
+    return receipt
@@ -0,0 +1,153 @@
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+# Longest side kept for the stored original; camera photos are usually 4000px+.
+MAX_DIMENSION = getattr(settings, 'IMAGE_MAX_DIMENSION', 1600)
+WEBP_QUALITY = getattr(settings, 'IMAGE_WEBP_QUALITY', 85)
+
+# name -> longest side in px, smallest first
+RENDITIONS = {
+    'thumb': 160,
+    'medium': 640,
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_WORKERS', 2),
+    thread_name_prefix='image-renditions',
+)
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _to_webp(img, max_side, quality=WEBP_QUALITY):
+    img = img.copy()
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    buffer = io.BytesIO()
+    # Saving without exif= drops EXIF (GPS, camera serials) from the output.
+    img.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def _open(data):
+    img = Image.open(io.BytesIO(data))
+    img = ImageOps.exif_transpose(img)  # bake in the rotation before EXIF is dropped
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.getbands() or img.mode == 'P' else 'RGB')
+    return img
+
+
+def rendition_name(name, rendition):
+    stem, _ = os.path.splitext(name)
+    return f"{stem}_{rendition}.webp"
+
+
+def optimize_image_field(instance, field_name):
+    """
+    For a freshly uploaded (uncommitted) ImageField value: downscale, strip
+    EXIF, re-encode as WebP and store under a content-hashed name. Identical
+    uploads resolve to the same path and are written only once.
+    Returns the stored name, or None when there was nothing to process
+    (including uploads Pillow can't read, which are stored unchanged).
+    Call from the model's save() before super().save().
+    """
+    fieldfile = getattr(instance, field_name)
+    if not fieldfile or getattr(fieldfile, '_committed', True):
+        return None
+
+    fieldfile.open('rb')
+    fieldfile.seek(0)
+    data = fieldfile.read()
+    digest = hashlib.sha256(data).hexdigest()[:32]
+
+    field = instance._meta.get_field(field_name)
+    storage = field.storage
+    name = field.generate_filename(instance, f"{digest}.webp")
+
+    # A content-addressed storage dedupes and counts references itself.
+    deduplicating = getattr(storage, 'deduplicates', False)
+    optimized = True
+    if deduplicating or not storage.exists(name):
+        try:
+            content = ContentFile(_to_webp(_open(data), MAX_DIMENSION, quality=90))
+        except (UnidentifiedImageError, OSError):
+            if not deduplicating:
+                return None  # not an image Pillow can read; keep the upload untouched
+            # Stored as uploaded, but here, so the old reference is released below.
+            name = field.generate_filename(instance, os.path.basename(fieldfile.name))
+            content, optimized = ContentFile(data), False
+        name = storage.save(name, content)
+
+    if deduplicating and instance.pk:
+        # save() above added a reference for this row, so the one it held
+        # goes: the old picture's, or the duplicate when the same image was
+        # uploaded again.
+        old_name = type(instance)._default_manager.filter(pk=instance.pk).values_list(field_name, flat=True).first()
+        if old_name:
+            transaction.on_commit(lambda: storage.delete(old_name))
+
+    # Point the field at the stored file; super().save() will not write it again.
+    setattr(instance, field_name, name)
+    return name if optimized else None
+
+
+def generate_renditions(name, storage):
+    """Write the thumb/medium WebP renditions of a stored image (idempotent)."""
+    missing = {r: side for r, side in RENDITIONS.items() if not storage.exists(rendition_name(name, r))}
+    if not missing:
+        return
+    with storage.open(name, 'rb') as f:
+        img = _open(f.read())
+    for rendition, side in missing.items():
+        storage.save(rendition_name(name, rendition), ContentFile(_to_webp(img, side)))
+
+
+def _submit(name, storage):
+    # The same hashed image can be saved twice in quick succession (dedup);
+    # only one worker may write its renditions.
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+
+    def job():
+        try:
+            generate_renditions(name, storage)
+        except Exception as e:
+            print(f"❌ Rendition error for {name}: {e}")
+        finally:
+            with _pending_lock:
+                _pending.discard(name)
+
+    _executor.submit(job)
+
+
+def schedule_renditions(name, storage):
+    """Queue rendition generation on the worker pool once the transaction commits."""
+    if name:
+        transaction.on_commit(lambda: _submit(name, storage))
+
+
+def rendition_url(fieldfile, width):
+    """
+    URL of the smallest rendition at least `width` px wide, falling back to
+    the original when no rendition is large enough or it is not generated yet.
+    """
+    if not fieldfile:
+        return ''
+    storage = fieldfile.storage
+    for rendition, side in RENDITIONS.items():
+        if side >= width:
+            candidate = rendition_name(fieldfile.name, rendition)
+            if storage.exists(candidate):
+                return storage.url(candidate)
+            break
+    return fieldfile.url
@@ -0,0 +1,223 @@
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404, resolve
+
+from .models import Customer, Product, SalesOrder, User
+from .query_metrics import QUERY_COUNT_HEADER, percentile
+from .synthetic import PASSWORD
+
+
+class Stats:
+    """Latency and query samples per endpoint, shared by all workers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name, seconds, queries, ok):
+        with self.lock:
+            self.latency[name].append(seconds)
+            if queries is not None:
+                self.queries[name].append(queries)
+            if not ok:
+                self.errors[name] += 1
+
+    def rows(self):
+        for name in sorted(self.latency, key=lambda n: -sum(self.latency[n])):
+            samples = self.latency[name]
+            queries = self.queries[name]
+            yield {
+                'endpoint': name,
+                'requests': len(samples),
+                'errors': self.errors[name],
+                'p50_ms': percentile(samples, 50) * 1000,
+                'p95_ms': percentile(samples, 95) * 1000,
+                'p99_ms': percentile(samples, 99) * 1000,
+                'queries': sum(queries) / len(queries) if queries else None,
+            }
+
+
+def endpoint_name(path):
+    try:
+        return resolve(path.split('?')[0]).url_name or path
+    except Resolver404:
+        return path
+
+
+class InProcessTransport:
+    """Drives the app through Django's test client; queries are counted directly."""
+
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, data=None):
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method)(path, data or {})
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+        return response.status_code, response.get('Location', ''), len(captured.captured_queries)
+
+    def close(self):
+        pass
+
+
+class HttpTransport:
+    """Drives a running server over HTTP; queries come from the X-DB-Queries header when the server sends it."""
+
+    def __init__(self, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, data=None):
+        headers = {}
+        if method == 'post':
+            token = self.session.cookies.get('csrftoken')
+            if token is None:
+                self.session.get(self.base_url + '/')
+                token = self.session.cookies.get('csrftoken', '')
+            headers = {'X-CSRFToken': token, 'Referer': self.base_url + path}
+        query, body = (data, None) if method == 'get' else (None, data)
+        response = self.session.request(method.upper(), self.base_url + path, params=query, data=body,
+                                        headers=headers, allow_redirects=False, timeout=60)
+        queries = response.headers.get(QUERY_COUNT_HEADER)
+        return response.status_code, response.headers.get('Location', ''), int(queries) if queries else None
+
+    def close(self):
+        self.session.close()
+
+
+class Session:
+    """One simulated user: a transport plus the stats it reports into."""
+
+    def __init__(self, transport, stats):
+        self.transport = transport
+        self.stats = stats
+
+    def hit(self, method, path, data=None, expect=(200,), name=None):
+        start = time.perf_counter()
+        status, location, queries = self.transport.request(method, path, data)
+        elapsed = time.perf_counter() - start
+        self.stats.add(name or endpoint_name(path), elapsed, queries, status in expect)
+        return status, location
+
+    def login(self, username):
+        self.hit('get', '/', name='login (page)')
+        _, location = self.hit('post', '/', {'username': username, 'password': PASSWORD}, expect=(302,))
+        return location.endswith('/dashboard/')
+
+
+def salesman_flow(session, rng, salesman, customer_ids, product_ids):
+    """Log in, check in at a customer, place an order, invoice it, then browse lists."""
+    if not session.login(salesman.username):
+        return
+    session.hit('get', '/dashboard/')
+    session.hit('get', '/checkin-checkout/')
+
+    customer_id = rng.choice(customer_ids)
+    session.hit('post', '/checkin-checkout/', {
+        'action': 'checkin', 'customer': customer_id, 'latitude': '12.971600', 'longitude': '77.594600',
+    }, expect=(302,))
+
+    session.hit('get', '/add/order/')
+    session.hit('get', '/autocomplete/customers/', {'q': ''})
+    for query in ('d', 'de', 'dell'):  # the picker looks up as the salesman types
+        session.hit('get', '/autocomplete/products/', {'q': query})
+    product_id = rng.choice(product_ids)
+    qty = rng.choice([1, 1, 2])
+    _, location = session.hit('post', '/add/order/', {
+        'customer': customer_id, 'order_type': 'location',
+        'subtotal': f'{1000 * qty}.00', 'discount_amount': '0', 'taxable_amount': f'{1000 * qty}.00',
+        'tax_amount': f'{180 * qty}.00', 'grand_total': f'{1180 * qty}.00', 'amount_paid': '500.00',
+        'payment_mode': 'upi',
+        'items[]': [f'{product_id},0,{qty},1000.00,{1000 * qty}.00,0,0,{1000 * qty}.00,18,{180 * qty}.00,{1180 * qty}.00'],
+    }, expect=(302,))
+
+    if location.endswith('/order/'):
+        order_id = SalesOrder.objects.filter(created_by=salesman).order_by('-id').values_list('id', flat=True).first()
+        if order_id:
+            session.hit('get', f'/generate_invoice/{order_id}/', expect=(302,))
+            session.hit('get', f'/receipt/{order_id}/')
+
+    session.hit('get', '/order/')
+    session.hit('get', '/customers/')
+    session.hit('post', '/checkin-checkout/', {'action': 'checkout', 'visit_description': 'load test'}, expect=(302,))
+    session.hit('get', '/logout/', expect=(302,))
+
+
+ADMIN_PAGES = [
+    '/dashboard/', '/order/', '/customers/', '/products/', '/inventory/', '/purchase/order/list/',
+    '/reports/orders/', '/reports/customers/', '/reports/salespersons/', '/salesman/visits/', '/attendance/',
+]
+
+
+def admin_flow(session, rng, admin, customer_ids, product_ids):
+    """Log in and walk the list and report pages."""
+    if not session.login(admin.username):
+        return
+    for path in ADMIN_PAGES:
+        session.hit('get', path)
+    session.hit('get', f'/customer/view/{rng.choice(customer_ids)}/')
+    session.hit('get', f'/product/view/{rng.choice(product_ids)}/')
+    session.hit('get', '/logout/', expect=(302,))
+
+
+def run(concurrency=4, iterations=5, admin_share=0.2, base_url=None, seed=1):
+    """
+    Run `concurrency` workers, each completing `iterations` flows; a flow is an
+    admin session with probability `admin_share`, otherwise a salesman session.
+    Uses the synthetic users (see App1.synthetic). Returns the Stats.
+    """
+    admin = User.objects.filter(username='syn_admin').first()
+    salesmen = list(User.objects.filter(username__startswith='syn_salesman_'))
+    if not admin or not salesmen:
+        raise ValueError("No synthetic users found; seed the database first.")
+
+    customers_by_salesman = defaultdict(list)
+    for customer_id, user_id in Customer.objects.filter(user__in=salesmen).values_list('id', 'user_id'):
+        customers_by_salesman[user_id].append(customer_id)
+    all_customers = [cid for ids in customers_by_salesman.values() for cid in ids]
+    product_ids = list(Product.objects.filter(product_type='REFURBISHED', dailyproduction__current_stock__gt=0)
+                       .values_list('id', flat=True).distinct())
+
+    stats = Stats()
+    started = time.perf_counter()
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        # A salesman is driven by one worker at a time so check-ins don't interleave.
+        own_salesmen = salesmen[index::concurrency] or [salesmen[index % len(salesmen)]]
+        transport_factory = (lambda: HttpTransport(base_url)) if base_url else InProcessTransport
+        for _ in range(iterations):
+            transport = transport_factory()
+            session = Session(transport, stats)
+            try:
+                if rng.random() < admin_share:
+                    admin_flow(session, rng, admin, all_customers, product_ids)
+                else:
+                    salesman = rng.choice(own_salesmen)
+                    salesman_flow(session, rng, salesman, customers_by_salesman[salesman.id] or all_customers, product_ids)
+            except Exception as e:
+                print(f"❌ Load test flow failed: {e}")
+                stats.add('flow error', 0.0, None, False)
+            finally:
+                transport.close()
+        connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats.elapsed = time.perf_counter() - started
+    return stats
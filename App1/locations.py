@@ -0,0 +1,157 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Sum
+
+from .margins import batch_cost
+from .models import BatchStock, DailyProduction, Location, SaleItemBatch, StockTransfer, StockTransferLine
+
+
+DEFAULT_NAME = 'Main Store Room'
+
+
+def default_location():
+    """The store room new production goes to unless another is picked; created on first use."""
+    location, _ = Location.objects.get_or_create(is_default=True, defaults={'name': DEFAULT_NAME})
+    return location
+
+
+def stock_in(batch, location):
+    """Hold a newly produced batch's units at `location`."""
+    return BatchStock.objects.create(batch=batch, location=location, product_id=batch.product_id, quantity=batch.current_stock)
+
+
+def restock(batch, delta, product):
+    """
+    Apply an edit of a batch (its stock_in changed by `delta`, its product now
+    `product`) to the location it was stocked into. Raises ValidationError if
+    that location no longer holds enough of the batch to take `delta` back.
+    """
+    location_id = batch.location_id or default_location().id
+    with transaction.atomic():
+        stock, _ = (BatchStock.objects.select_for_update()
+                    .get_or_create(batch=batch, location_id=location_id, defaults={'product_id': product.id}))
+        if stock.quantity + delta < 0:
+            raise ValidationError(
+                f"Only {stock.quantity} units of this batch are left at {stock.location.name}; "
+                f"the rest has been sold or moved."
+            )
+        stock.quantity += delta
+        stock.save(update_fields=['quantity'])
+        if product.id != batch.product_id:
+            BatchStock.objects.filter(batch=batch).update(product=product)
+
+
+def available(location_id, product_ids=None):
+    """{product_id: units} held at a location: one read of batch_stock_location_idx."""
+    rows = BatchStock.objects.filter(location_id=location_id, quantity__gt=0)
+    if product_ids is not None:
+        rows = rows.filter(product_id__in=product_ids)
+    return dict(rows.values('product_id').annotate(units=Sum('quantity')).values_list('product_id', 'units'))
+
+
+def _take(stocks, required):
+    """Walk `stocks` in order taking up to `required` units; returns [(stock, units)] and what's still missing."""
+    taken = []
+    for stock in stocks:
+        if required <= 0:
+            break
+        units = min(required, stock.quantity)
+        if units <= 0:
+            continue
+        stock.quantity -= units
+        taken.append((stock, units))
+        required -= units
+    return taken, required
+
+
+def transfer(from_location, to_location, product, quantity, user=None, remarks=''):
+    """
+    Move `quantity` units of `product` between locations, oldest batches
+    first, and journal it as a StockTransfer with a line per batch moved.
+    Constant query count; raises ValidationError when the source is short.
+    """
+    quantity = int(quantity)
+    if quantity <= 0:
+        raise ValidationError("Quantity must be greater than 0.")
+    if from_location.id == to_location.id:
+        raise ValidationError("Pick two different locations.")
+
+    with transaction.atomic():
+        # Both ends locked in one id-ordered read, so opposite transfers can't deadlock
+        rows = list(BatchStock.objects.select_for_update()
+                    .filter(product=product, location__in=[from_location, to_location]).order_by('id'))
+        sources = sorted((r for r in rows if r.location_id == from_location.id), key=lambda r: r.batch_id)
+        targets = {r.batch_id: r for r in rows if r.location_id == to_location.id}
+
+        taken, missing = _take(sources, quantity)
+        if missing:
+            raise ValidationError(
+                f"Only {quantity - missing} units of {product.name} at {from_location.name} (asked for {quantity})."
+            )
+
+        created = []
+        for stock, units in taken:
+            target = targets.get(stock.batch_id)
+            if target is None:
+                created.append(BatchStock(batch_id=stock.batch_id, location=to_location, product=product, quantity=units))
+            else:
+                target.quantity += units
+        BatchStock.objects.bulk_update([stock for stock, _ in taken] + list(targets.values()), ['quantity'])
+        BatchStock.objects.bulk_create(created)
+
+        move = StockTransfer.objects.create(
+            from_location=from_location, to_location=to_location, created_by=user, remarks=remarks,
+        )
+        StockTransferLine.objects.bulk_create([
+            StockTransferLine(transfer=move, batch_id=stock.batch_id, product=product, quantity=units)
+            for stock, units in taken
+        ])
+    return move
+
+
+def allocate_order(items, home_location_id=None):
+    """
+    Take every sale item's units out of stock, from `home_location_id` first
+    and then from the other locations, oldest batch first within each. Locks
+    the products' stock rows (and their batches) in one id-ordered read, lowers
+    them with two bulk updates and returns the unsaved SaleItemBatch rows
+    recording where each unit came from. Raises ValueError when stock can't
+    cover an item.
+    """
+    product_ids = {item.product_id for item in items}
+    rows = list(BatchStock.objects.select_for_update()
+                .filter(product_id__in=product_ids, quantity__gt=0)
+                .select_related('batch').order_by('id'))
+
+    batches = {}
+    by_product = defaultdict(list)
+    for stock in sorted(rows, key=lambda r: (r.location_id != home_location_id, r.batch_id, r.location_id)):
+        # Rows of one batch at several locations share one instance, so stock_out adds up
+        stock.batch = batches.setdefault(stock.batch_id, stock.batch)
+        by_product[stock.product_id].append(stock)
+
+    allocations, touched = [], []
+    for item in items:
+        taken, missing = _take(by_product[item.product_id], item.quantity)
+        if missing:
+            raise ValueError(
+                f"Not enough stock for product {item.product.name} "
+                f"(needed {item.quantity}, missing {missing})"
+            )
+        for stock, units in taken:
+            batch = stock.batch
+            batch.stock_out += units
+            batch.current_stock = batch.stock_in - batch.stock_out
+            touched.append(stock)
+            allocations.append(SaleItemBatch(
+                sale_item=item, batch=batch, location_id=stock.location_id, quantity=units,
+                unit_cost=batch_cost(batch.unit_cost, item.product.purchase_price),
+            ))
+
+    BatchStock.objects.bulk_update(set(touched), ['quantity'])
+    DailyProduction.objects.bulk_update(
+        {a.batch_id: a.batch for a in allocations}.values(), ['stock_out', 'current_stock'],
+    )
+    return allocations
@@ -0,0 +1,180 @@
+import math
+import random
+import secrets
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import LoginAttempt, User
+
+
+# Failed attempts allowed inside the sliding window, per username and per client IP.
+WINDOW_SECONDS = getattr(settings, 'LOGIN_GUARD_WINDOW', 15 * 60)
+MAX_PER_USERNAME = getattr(settings, 'LOGIN_GUARD_MAX_PER_USERNAME', 5)
+MAX_PER_IP = getattr(settings, 'LOGIN_GUARD_MAX_PER_IP', 20)
+
+# Per-process caches (LocMemCache) would give every worker its own window,
+# so they count attempts in the database instead.
+_PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+USE_CACHE = getattr(
+    settings, 'LOGIN_GUARD_USE_CACHE',
+    settings.CACHES.get('default', {}).get('BACKEND') not in _PROCESS_LOCAL_CACHES,
+)
+
+_dummy_hash = None
+
+
+def _keys(username, ip):
+    keys = []
+    if username:
+        keys.append((f"user:{username.strip().lower()[:150]}", MAX_PER_USERNAME))
+    if ip:
+        keys.append((f"ip:{ip}", MAX_PER_IP))
+    return keys
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+# --- sliding window, cache backend -------------------------------------------
+# Failures are counted per time bucket with cache.add + cache.incr, which are
+# atomic, so a parallel burst can't overwrite its own attempts. The window is
+# the last BUCKETS buckets, i.e. WINDOW_SECONDS to within one bucket.
+
+BUCKETS = 15
+BUCKET_SECONDS = max(1, WINDOW_SECONDS // BUCKETS)
+
+
+def _cache_keys(key, now):
+    """(bucket start, cache key) for the buckets inside the window, oldest first."""
+    current = int(now // BUCKET_SECONDS)
+    return [
+        (bucket * BUCKET_SECONDS, f"login-guard:{key}:{bucket}")
+        for bucket in range(current - BUCKETS + 1, current + 1)
+    ]
+
+
+def _cache_retry_after(key, limit, now):
+    buckets = _cache_keys(key, now)
+    counts = cache.get_many([k for _, k in buckets])
+    total = sum(counts.values())
+    # Drop the oldest buckets until the window is under the limit again;
+    # the last one dropped is the one that has to age out.
+    for start, k in buckets:
+        if total < limit:
+            break
+        total -= counts.get(k, 0)
+        if total < limit:
+            return start + BUCKETS * BUCKET_SECONDS - now
+    return 0
+
+
+def _cache_record(key, now):
+    _, k = _cache_keys(key, now)[-1]
+    cache.add(k, 0, WINDOW_SECONDS + BUCKET_SECONDS)
+    try:
+        cache.incr(k)
+    except ValueError:
+        # Evicted between add and incr: this attempt starts the bucket again.
+        cache.set(k, 1, WINDOW_SECONDS + BUCKET_SECONDS)
+
+
+# --- sliding window, database backend ----------------------------------------
+
+def _db_retry_after(key, limit):
+    since = timezone.now() - timedelta(seconds=WINDOW_SECONDS)
+    recent = LoginAttempt.objects.filter(key=key, attempted_at__gte=since)
+    if recent.count() < limit:
+        return 0
+    # The window reopens when the oldest attempt still counted falls out of it.
+    cutoff = recent.order_by('-attempted_at').values_list('attempted_at', flat=True)[limit - 1]
+    return (cutoff - since).total_seconds()
+
+
+def _db_record(key):
+    LoginAttempt.objects.create(key=key)
+    if random.random() < 0.01:
+        # Sprayed usernames leave one-off keys behind; sweep them occasionally.
+        LoginAttempt.objects.filter(attempted_at__lt=timezone.now() - timedelta(seconds=WINDOW_SECONDS)).delete()
+
+
+# --- public API --------------------------------------------------------------
+
+def retry_after(username, ip):
+    """Seconds until another attempt is allowed for this username/IP, 0 if allowed now."""
+    now = time.time()
+    wait = 0
+    for key, limit in _keys(username, ip):
+        if USE_CACHE:
+            try:
+                wait = max(wait, _cache_retry_after(key, limit, now))
+                continue
+            except Exception as e:
+                print(f"⚠️ Login guard cache unavailable, using database: {e}")
+        wait = max(wait, _db_retry_after(key, limit))
+    return math.ceil(wait)
+
+
+def record_failure(username, ip):
+    now = time.time()
+    for key, _ in _keys(username, ip):
+        if USE_CACHE:
+            try:
+                _cache_record(key, now)
+                continue
+            except Exception as e:
+                print(f"⚠️ Login guard cache unavailable, using database: {e}")
+        _db_record(key)
+
+
+def reset(username):
+    """A successful login clears the username's failures (not the IP's)."""
+    for key, _ in _keys(username, None):
+        if USE_CACHE:
+            try:
+                cache.delete_many([k for _, k in _cache_keys(key, time.time())])
+                # Database rows only come from cache outages, and retry_after
+                # doesn't read them while the cache works.
+                continue
+            except Exception:
+                pass
+        LoginAttempt.objects.filter(key=key).delete()
+
+
+def _dummy():
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = make_password(secrets.token_urlsafe(16))
+    return _dummy_hash
+
+
+def authenticate(username, password):
+    """
+    The user for these credentials, or None.
+
+    Unknown usernames are checked against a dummy hash so they cost the same
+    hasher work as a wrong password and can't be told apart by timing.
+    Hashes made with an older hasher or iteration count are re-hashed with
+    the current settings on a successful login.
+    """
+    user = User.objects.filter(username=username).first() if username else None
+    if user is None:
+        check_password(password, _dummy())
+        return None
+
+    def upgrade(raw_password):
+        # update() rather than save(): a re-hash should not touch updated_at,
+        # the search index or the profile picture pipeline.
+        User.objects.filter(pk=user.pk).update(password=make_password(raw_password))
+
+    if check_password(password, user.password, setter=upgrade):
+        return user
+    return None
@@ -0,0 +1,113 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.utils import timezone
+
+from App1.models import Customer, Product, SalesOrder, User
+from App1.query_metrics import percentile
+
+
+REPORT_PATHS = ['/reports/orders/', '/reports/customers/', '/order/']
+
+
+class Command(BaseCommand):
+    help = (
+        "Run parallel add_order writers and report readers against the configured "
+        "database and report throughput, latency and lock failures. Run it once per "
+        "profile (OMS_DB=sqlite / OMS_DB=postgres) to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--user', default=None, help="Username to log in as (default: first admin).")
+        parser.add_argument('--keep', action='store_true', help="Keep the benchmark customer and the orders created by the run.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']) if options['user'] else User.objects.filter(role__name__iexact='admin')
+        user = user.first()
+        template = Customer.objects.first()
+        product = Product.objects.first()
+        if not (user and template and product):
+            raise CommandError("Needs a user, a customer and a product in the database.")
+
+        # Orders go to a customer of the run's own, so cleanup deletes that
+        # customer (and its orders) and never an order somebody else placed.
+        customer = Customer.objects.create(
+            user=user, shop_name=f"Benchmark run {timezone.now():%Y-%m-%d %H:%M:%S}",
+            shop_address=template.shop_address, shop_city=template.shop_city, shop_district=template.shop_district,
+            shop_pincode=template.shop_pincode, shop_state=template.shop_state, is_active=False,
+        )
+
+        db = settings.DATABASES['default']
+        self.stdout.write(f"{connection.vendor} ({db['NAME']}): {options['writers']} writers, {options['readers']} readers, {options['seconds']}s")
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                self.stdout.write(f"  journal_mode={cursor.fetchone()[0]}")
+
+        order_form = {
+            'customer': customer.id,
+            'order_type': 'telephone',
+            'subtotal': '100.00', 'discount_amount': '0', 'taxable_amount': '100.00',
+            'tax_amount': '18.00', 'grand_total': '118.00', 'amount_paid': '50.00',
+            'payment_mode': 'cash',
+            'items[]': [f"{product.id},0,1,100.00,100.00,0,0,100.00,18,18.00,118.00"],
+        }
+
+        results = {'write': [], 'read': []}
+        failures = {'write': 0, 'read': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['seconds']
+
+        def worker(kind):
+            client = Client()
+            session = client.session
+            session['current_user'] = user.username
+            session.save()
+            client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+            i = 0
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    if kind == 'write':
+                        response = client.post('/add/order/', order_form)
+                        # add_order reports errors (e.g. "database is locked") by redirecting back to itself
+                        ok = response.status_code == 302 and response['Location'].endswith('/order/')
+                    else:
+                        response = client.get(REPORT_PATHS[i % len(REPORT_PATHS)])
+                        ok = response.status_code == 200
+                    elapsed = time.perf_counter() - start
+                    i += 1
+                    with lock:
+                        if ok:
+                            results[kind].append(elapsed)
+                        else:
+                            failures[kind] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=('write',)) for _ in range(options['writers'])]
+        threads += [threading.Thread(target=worker, args=('read',)) for _ in range(options['readers'])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for kind, label in (('write', 'add_order'), ('read', 'reports')):
+            latencies = results[kind]
+            self.stdout.write(
+                f"  {label:<10} {len(latencies) / options['seconds']:7.1f} ok/s  "
+                f"p50 {percentile(latencies, 50) * 1000:7.1f} ms  p95 {percentile(latencies, 95) * 1000:7.1f} ms  "
+                f"failed {failures[kind]}"
+            )
+
+        if options['keep']:
+            self.stdout.write(f"  kept {SalesOrder.objects.filter(customer=customer).count()} orders under customer #{customer.id}")
+        else:
+            customer.delete()
@@ -0,0 +1,66 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from App1.models import User
+
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+
+class Command(BaseCommand):
+    help = "Compare requests/sec and session queries for a page under each session mode."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default=None, help="Username to log in as (default: first admin).")
+        parser.add_argument('--path', default='/order/', help="Page to request (default: the sale order table).")
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--modes', nargs='+', choices=list(ENGINES), default=list(ENGINES))
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+        else:
+            users = users.filter(role__name__iexact='admin')
+        user = users.first()
+        if not user:
+            raise CommandError("No matching user to log in as; pass --user.")
+
+        self.stdout.write(f"{options['requests']} x GET {options['path']} as {user.username} (cache: {settings.CACHES['default']['BACKEND']})")
+        baseline = None
+        for mode in options['modes']:
+            with override_settings(SESSION_ENGINE=ENGINES[mode]):
+                rate, session_queries = self._run(user, options['path'], options['requests'])
+            baseline = baseline or rate
+            self.stdout.write(
+                f"  {mode:<15} {rate:8.1f} req/s   {session_queries:.2f} session queries/request   x{rate / baseline:.2f}"
+            )
+
+    def _run(self, user, path, count):
+        client = Client()
+        session = client.session
+        session['current_user'] = user.username
+        session.save()
+        client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+        response = client.get(path)  # warm up caches, templates and the middleware chain
+        if response.status_code != 200:
+            raise CommandError(f"GET {path} returned {response.status_code}")
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(count):
+                client.get(path)
+            elapsed = time.perf_counter() - start
+
+        session_queries = sum('django_session' in q['sql'] for q in queries.captured_queries)
+        return count / elapsed, session_queries / count
@@ -0,0 +1,53 @@
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from App1.media_storage import CAS_PREFIX
+from App1.models import CustomerShopImage, Product, User
+
+
+class Command(BaseCommand):
+    help = "Move legacy uploads into content-addressed storage, sharing one file per identical image."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be moved.")
+
+    def handle(self, *args, **options):
+        sources = [
+            (Product, 'product_picture'),
+            (User, 'profile_picture'),
+            (CustomerShopImage, 'image'),
+        ]
+        moved, freed, legacy_files = 0, 0, set()
+
+        for model, field_name in sources:
+            storage = model._meta.get_field(field_name).storage
+            rows = (
+                model.objects.exclude(**{field_name: ''})
+                .exclude(**{f'{field_name}__isnull': True})
+                .exclude(**{f'{field_name}__startswith': CAS_PREFIX})
+                .values_list('pk', field_name)
+            )
+            for pk, name in rows:
+                if not storage.exists(name):
+                    self.stderr.write(f"Missing file for {model.__name__} #{pk}: {name}")
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(f"Would move {name}")
+                    continue
+                with storage.open(name, 'rb') as f:
+                    new_name = storage.save(os.path.basename(name), File(f))
+                with transaction.atomic():
+                    model.objects.filter(pk=pk).update(**{field_name: new_name})
+                legacy_files.add((storage, name))
+                moved += 1
+
+        for storage, name in legacy_files:
+            freed += storage.size(name)
+            os.remove(storage.path(name))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} references into {CAS_PREFIX}, removed {len(legacy_files)} legacy files ({freed} bytes)."
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from App1.customer_dedupe import DEFAULT_THRESHOLD, cluster_duplicates, rebuild_index
+from App1.models import Customer
+
+
+class Command(BaseCommand):
+    help = "Cluster likely duplicate customers across the whole customer table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Minimum similarity score (0-1).")
+        parser.add_argument('--rebuild', action='store_true', help="Recompute normalized keys and the trigram index first.")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = rebuild_index()
+            self.stdout.write(f"Re-indexed {count} customers.")
+
+        clusters = cluster_duplicates(threshold=options['threshold'])
+        names = Customer.objects.in_bulk([cid for ids in clusters for cid in ids])
+
+        for ids in clusters:
+            self.stdout.write(f"Cluster of {len(ids)}:")
+            for cid in ids:
+                c = names[cid]
+                self.stdout.write(f"  #{c.id} {c.shop_name} | {c.shop_address} | {c.gst_number or '-'}")
+
+        self.stdout.write(self.style.SUCCESS(f"Found {len(clusters)} duplicate clusters."))
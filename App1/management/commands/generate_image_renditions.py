@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from App1.images import generate_renditions
+from App1.media_storage import CAS_PREFIX
+from App1.models import CustomerShopImage, Product, User
+
+
+class Command(BaseCommand):
+    help = "Generate thumb/medium WebP renditions for images uploaded before the pipeline existed."
+
+    def handle(self, *args, **options):
+        sources = [
+            (Product, 'product_picture'),
+            (User, 'profile_picture'),
+            (CustomerShopImage, 'image'),
+        ]
+        done, legacy = 0, 0
+        for model, field_name in sources:
+            storage = model._meta.get_field(field_name).storage
+            deduplicating = getattr(storage, 'deduplicates', False)
+            names = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}).values_list(field_name, flat=True).distinct()
+            for name in names:
+                if deduplicating and not name.startswith(CAS_PREFIX):
+                    # Its renditions would be hashed into cas/ as new blobs on every run.
+                    legacy += 1
+                    continue
+                try:
+                    generate_renditions(name, storage)
+                    done += 1
+                except (OSError, ValueError) as e:
+                    self.stderr.write(f"Skipped {name}: {e}")
+        if legacy:
+            self.stderr.write(f"Skipped {legacy} legacy uploads; run dedupe_media to move them into {CAS_PREFIX} first.")
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} images."))
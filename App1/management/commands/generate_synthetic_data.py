@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from App1 import synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a reproducible synthetic dataset (roles, salesmen, customers, products, "
+        "production batches, orders with items and payments, visits, attendance) for "
+        "benchmarks and query-plan tests. Scale 1 is "
+        + ", ".join(f"{n} {name}" for name, n in synthetic.SIZES.items()) + "."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help="Multiplies every size below (default 1).")
+        for name in synthetic.SIZES:
+            parser.add_argument(f'--{name}', type=int, default=None, help=f"Exact number of {name} (overrides --scale).")
+        parser.add_argument('--days', type=int, default=90, help="History to spread orders, visits and attendance over.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--flush', action='store_true', help="Delete previously generated synthetic data first.")
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help="Leave the search, autocomplete, duplicate-detection, route and timesheet tables stale.")
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            started = time.perf_counter()
+            synthetic.flush()
+            self.stdout.write(f"Removed synthetic data in {time.perf_counter() - started:.1f}s.")
+        elif synthetic.exists():
+            raise CommandError("Synthetic data already exists; add --flush to regenerate it.")
+
+        sizes = {name: options[name] for name in synthetic.SIZES if options[name]}
+        started = time.perf_counter()
+        counts = synthetic.generate(
+            scale=options['scale'], seed=options['seed'], days=options['days'],
+            log=self.stdout.write, rebuild=False, **sizes,
+        )
+        elapsed = time.perf_counter() - started
+
+        total = sum(counts.values())
+        for name, n in counts.items():
+            self.stdout.write(f"  {name:<20}{n:>10}")
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)"))
+
+        if not options['skip_rebuild']:
+            started = time.perf_counter()
+            synthetic.rebuild_derived(log=self.stdout.write)
+            self.stdout.write(f"Derived tables rebuilt in {time.perf_counter() - started:.1f}s.")
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from App1 import loadtest, synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay salesman and admin traffic (login, check-in, add_order, invoice, receipt, "
+        "lists and reports) and report p50/p95/p99 latency and queries per request per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=None, help="Base URL of a running server (e.g. http://127.0.0.1:8000). Default: in-process.")
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--iterations', type=int, default=5, help="Flows per worker.")
+        parser.add_argument('--admin-share', type=float, default=0.2, help="Fraction of flows that are admin sessions.")
+        parser.add_argument('--seed-data', type=float, metavar='SCALE', default=None,
+                            help="Generate the synthetic dataset at this scale first (1 = 500 customers, 2000 orders).")
+        parser.add_argument('--flush', action='store_true', help="Delete previously generated synthetic data first.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            synthetic.flush()
+            self.stdout.write("Removed synthetic data.")
+        if options['seed_data'] is not None:
+            if synthetic.exists():
+                raise CommandError("Synthetic data already exists; add --flush to regenerate it.")
+            counts = synthetic.generate(scale=options['seed_data'], seed=options['seed'], log=self.stdout.write)
+            self.stdout.write("Seeded " + ", ".join(f"{n} {name}" for name, n in counts.items()))
+
+        try:
+            stats = loadtest.run(
+                concurrency=options['concurrency'], iterations=options['iterations'],
+                admin_share=options['admin_share'], base_url=options['url'], seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(f"{e} Use --seed-data 1.")
+
+        total = sum(len(v) for v in stats.latency.values())
+        self.stdout.write(
+            f"\n{total} requests in {stats.elapsed:.1f}s ({total / stats.elapsed:.1f} req/s), "
+            f"concurrency {options['concurrency']}, {'HTTP ' + options['url'] if options['url'] else 'in-process'}\n"
+        )
+        self.stdout.write(f"{'endpoint':<28}{'reqs':>6}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}")
+        for row in stats.rows():
+            queries = f"{row['queries']:.1f}" if row['queries'] is not None else '-'
+            line = (f"{row['endpoint']:<28}{row['requests']:>6}{row['errors']:>8}"
+                    f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{queries:>9}")
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
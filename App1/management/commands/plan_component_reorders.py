@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from App1.reorder_planner import plan_reorders
+
+
+class Command(BaseCommand):
+    help = "Recompute component usage velocity, days of cover and reorder suggestions (run daily from cron)."
+
+    def handle(self, *args, **options):
+        count = plan_reorders()
+        self.stdout.write(self.style.SUCCESS(f"Planned {count} components."))
@@ -0,0 +1,62 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from App1.query_metrics import percentile, read_log
+
+
+class Command(BaseCommand):
+    help = "Rank views by total DB time from the query metrics log (QUERY_METRICS_LOG)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=None, help="Metrics file (default: settings.QUERY_METRICS_LOG).")
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--since', default=None, help="Only records at or after this ISO timestamp.")
+        parser.add_argument('--statements', action='store_true', help="Show the most repeated statement per view.")
+
+    def handle(self, *args, **options):
+        path = options['log'] or getattr(settings, 'QUERY_METRICS_LOG', None)
+        if not path:
+            raise CommandError("No metrics log; set OMS_QUERY_LOG or pass --log.")
+
+        views = defaultdict(lambda: {'db': [], 'total': [], 'render': [], 'queries': [], 'over': 0, 'dupes': 0})
+        repeated = defaultdict(Counter)
+        statements = {}
+        try:
+            for record in read_log(path):
+                if options['since'] and record.get('ts', '') < options['since']:
+                    continue
+                entry = views[record['view']]
+                entry['db'].append(record['db_ms'])
+                entry['total'].append(record['total_ms'])
+                entry['render'].append(record['render_ms'])
+                entry['queries'].append(record['queries'])
+                entry['over'] += record.get('over_budget', False)
+                entry['dupes'] += record.get('duplicates', 0)
+                for statement in record.get('repeated', []):
+                    repeated[record['view']][statement['fingerprint']] += statement['count']
+                    statements[statement['fingerprint']] = statement['sql']
+        except FileNotFoundError:
+            raise CommandError(f"{path} does not exist yet.")
+
+        if not views:
+            self.stdout.write("No requests recorded.")
+            return
+
+        ranked = sorted(views.items(), key=lambda item: -sum(item[1]['db']))[:options['top']]
+        self.stdout.write(
+            f"{'view':<28}{'reqs':>6}{'db ms':>10}{'avg db':>9}{'avg q':>8}{'max q':>7}"
+            f"{'dupes':>7}{'render':>9}{'p95 ms':>9}{'over':>6}"
+        )
+        for name, entry in ranked:
+            n = len(entry['db'])
+            line = (
+                f"{name[:27]:<28}{n:>6}{sum(entry['db']):>10.0f}{sum(entry['db']) / n:>9.1f}"
+                f"{sum(entry['queries']) / n:>8.1f}{max(entry['queries']):>7}{entry['dupes'] / n:>7.1f}"
+                f"{sum(entry['render']) / n:>9.1f}{percentile(entry['total'], 95):>9.1f}{entry['over']:>6}"
+            )
+            self.stdout.write(self.style.WARNING(line) if entry['over'] else line)
+            if options['statements'] and repeated[name]:
+                key, count = repeated[name].most_common(1)[0]
+                self.stdout.write(f"    {count / n:.0f}x/request  {statements[key][:150]}")
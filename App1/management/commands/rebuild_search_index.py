@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from App1.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents for customers, products, orders and vendors."
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} records."))
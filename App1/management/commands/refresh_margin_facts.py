@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from App1.margins import refresh_facts
+
+
+class Command(BaseCommand):
+    help = "Refresh the daily margin facts (revenue against FIFO batch cost per product, salesman and customer)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild every day instead of only days changed since the last refresh.")
+
+    def handle(self, *args, **options):
+        count = refresh_facts(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {count} margin facts."))
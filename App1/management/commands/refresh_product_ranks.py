@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from App1.product_ranking import WINDOWS, rank_products
+
+
+class Command(BaseCommand):
+    help = "Rank products by sales and assign ABC classes over each rolling window (PRODUCT_RANK_WINDOWS)."
+
+    def handle(self, *args, **options):
+        count = rank_products()
+        windows = ', '.join(f"{days}d" for days in WINDOWS)
+        self.stdout.write(self.style.SUCCESS(f"Ranked {count} product-windows ({windows})."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from App1.route_analytics import refresh_summaries
+
+
+class Command(BaseCommand):
+    help = "Refresh per-salesman daily route summaries (distance, dwell time, orders per visit)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild every day instead of only days changed since the last refresh.")
+
+    def handle(self, *args, **options):
+        count = refresh_summaries(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {count} salesman day summaries."))
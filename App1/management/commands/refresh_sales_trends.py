@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from App1.sales_trends import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = "Refresh the daily sales rollups (with running totals) behind the sales trend API."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild the whole history instead of only days since the last refresh.")
+
+    def handle(self, *args, **options):
+        count = refresh_rollups(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {count} sales rollup rows."))
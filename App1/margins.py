@@ -0,0 +1,206 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import DailyProduction, Invoice, MarginFact, Product, SaleItem, SaleItemBatch, SalesOrder
+
+
+ZERO = Decimal('0.00')
+
+# Dimensions the drill-down API can group by: the fact columns each one returns
+GROUPS = {
+    'day': ('date',),
+    'month': ('month',),
+    'product': ('product_id', 'product__name'),
+    'salesman': ('salesman_id', 'salesman__first_name', 'salesman__last_name'),
+    'customer': ('customer_id', 'customer__shop_name', 'customer__full_name'),
+}
+
+FACT_COLUMNS = ('date', 'product', 'salesman', 'customer', 'quantity', 'estimated_quantity',
+                'revenue', 'cost', 'margin', 'refreshed_at')
+
+# Days back an incremental refresh re-costs estimated (not yet invoiced) sales
+ESTIMATE_DAYS = getattr(settings, 'MARGIN_ESTIMATE_DAYS', 30)
+
+# Days per rebuild statement; keeps the date__in lists under SQLite's parameter cap
+_DAYS_PER_CHUNK = 500
+
+
+def batch_cost(unit_cost, purchase_price):
+    """Cost of one unit from a batch: its bill-of-materials cost, or the product's purchase price for batches made without one."""
+    return unit_cost if unit_cost else purchase_price
+
+
+def _next_batch_costs(product_ids):
+    """{product_id: unit cost of the batch FIFO would serve next}, falling back to the purchase price."""
+    next_batch = DailyProduction.objects.filter(product=OuterRef('pk'), current_stock__gt=0).order_by('id')
+    rows = (Product.objects.filter(id__in=product_ids)
+            .annotate(next_cost=Subquery(next_batch.values('unit_cost')[:1]))
+            .values_list('id', 'next_cost', 'purchase_price'))
+    return {pid: batch_cost(next_cost, purchase_price) for pid, next_cost, purchase_price in rows}
+
+
+def build_facts(days=None):
+    """
+    Fact rows (tuples in FACT_COLUMNS order) for the given order dates, or
+    every date when `days` is None. Three reads: the sale items, the costs
+    already allocated to them, and the next FIFO batch cost of products with
+    unserved units.
+    """
+    items = SaleItem.objects.annotate(day=TruncDate('order__order_date'))
+    allocated = SaleItemBatch.objects.all()
+    if days is not None:
+        items = items.filter(day__in=days)
+        allocated = allocated.annotate(day=TruncDate('sale_item__order__order_date')).filter(day__in=days)
+
+    line_cost = ExpressionWrapper(F('quantity') * F('unit_cost'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    served = {
+        row['sale_item_id']: (row['units'], row['cost'])
+        for row in allocated.values('sale_item_id').annotate(units=Sum('quantity'), cost=Sum(line_cost))
+    }
+
+    rows = list(items.values_list(
+        'id', 'day', 'product_id', 'order__created_by_id', 'order__customer_id', 'quantity', 'taxable_amount',
+    ))
+    unserved_products = {row[2] for row in rows if served.get(row[0], (0, ZERO))[0] < row[5]}
+    estimates = _next_batch_costs(unserved_products) if unserved_products else {}
+
+    totals = defaultdict(lambda: [0, 0, ZERO, ZERO])
+    for item_id, day, product_id, salesman_id, customer_id, quantity, revenue in rows:
+        units, cost = served.get(item_id, (0, ZERO))
+        pending = max(quantity - units, 0)
+        cost += pending * estimates.get(product_id, ZERO)
+
+        fact = totals[(day, product_id, salesman_id, customer_id)]
+        fact[0] += quantity
+        fact[1] += pending
+        fact[2] += revenue
+        fact[3] += cost
+
+    now = timezone.now()
+    return [
+        (day, product_id, salesman_id, customer_id, quantity, pending, revenue, cost, revenue - cost, now)
+        for (day, product_id, salesman_id, customer_id), (quantity, pending, revenue, cost) in totals.items()
+    ]
+
+
+def _write(facts):
+    """
+    Insert fact tuples (in FACT_COLUMNS order) with one executemany; building
+    model instances for bulk_create costs more than the aggregation itself.
+    """
+    qn = connection.ops.quote_name
+    table = qn(MarginFact._meta.db_table)
+    columns = ', '.join(qn(MarginFact._meta.get_field(name).column) for name in FACT_COLUMNS)
+    placeholders = ', '.join(['%s'] * len(FACT_COLUMNS))
+    ops = connection.ops
+    rows = (
+        (ops.adapt_datefield_value(day), *measures, ops.adapt_datetimefield_value(refreshed_at))
+        for day, *measures, refreshed_at in facts
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+
+
+def rebuild_facts(days=None):
+    """Replace the facts for `days` (every day when None). Returns the number of facts written."""
+    if days is None:
+        facts = build_facts()
+        with transaction.atomic():
+            MarginFact.objects.all().delete()
+            _write(facts)
+        return len(facts)
+
+    days = sorted(days)
+    written = 0
+    for start in range(0, len(days), _DAYS_PER_CHUNK):
+        chunk = days[start:start + _DAYS_PER_CHUNK]
+        facts = build_facts(chunk)
+        with transaction.atomic():
+            MarginFact.objects.filter(date__in=chunk).delete()
+            _write(facts)
+        written += len(facts)
+    return written
+
+
+def _dirty_days(since):
+    """
+    Order dates touched after `since`: new orders, orders invoiced since (their
+    estimated cost becomes the served one), and the last ESTIMATE_DAYS days
+    still holding estimates, whose next-batch cost may have moved. Older
+    estimates are refreshed when their orders are invoiced, or by a full rebuild.
+    """
+    days = set(
+        SalesOrder.objects.filter(order_date__gte=since)
+        .annotate(day=TruncDate('order_date')).values_list('day', flat=True).distinct()
+    )
+    days.update(
+        Invoice.objects.filter(created_at__gte=since)
+        .annotate(day=TruncDate('order__order_date')).values_list('day', flat=True).distinct()
+    )
+    days.update(
+        MarginFact.objects.filter(estimated_quantity__gt=0, date__gte=timezone.localdate() - timedelta(days=ESTIMATE_DAYS))
+        .values_list('date', flat=True).distinct()
+    )
+    return days
+
+
+def refresh_facts(full=False):
+    """
+    Incremental refresh: only dates touched since the last refresh are rebuilt.
+    Falls back to a full rebuild when there are no facts yet. Orders deleted
+    since are only dropped by a full rebuild.
+    """
+    watermark = MarginFact.objects.aggregate(last=Max('refreshed_at'))['last']
+    if full or watermark is None:
+        return rebuild_facts()
+    return rebuild_facts(_dirty_days(watermark))
+
+
+def drilldown(group, start=None, end=None, product=None, salesman=None, customer=None, limit=50):
+    """
+    Revenue, cost and margin from the stored facts grouped by one dimension
+    (see GROUPS), optionally narrowed to a date range and to one product,
+    salesman or customer. Time groups come in date order, the others by
+    margin, largest first. Returns {'rows': [...], 'totals': {...}}.
+    """
+    facts = MarginFact.objects.all()
+    if start:
+        facts = facts.filter(date__gte=start)
+    if end:
+        facts = facts.filter(date__lte=end)
+    if product:
+        facts = facts.filter(product_id=product)
+    if salesman:
+        facts = facts.filter(salesman_id=salesman)
+    if customer:
+        facts = facts.filter(customer_id=customer)
+
+    measures = {
+        'quantity': Sum('quantity'),
+        'estimated_quantity': Sum('estimated_quantity'),
+        'revenue': Sum('revenue'),
+        'cost': Sum('cost'),
+        'margin': Sum('margin'),
+    }
+    totals = facts.aggregate(**measures)
+
+    grouped = facts.annotate(month=TruncMonth('date')) if group == 'month' else facts
+    grouped = grouped.values(*GROUPS[group]).annotate(**measures)
+    grouped = grouped.order_by(*GROUPS[group][:1]) if group in ('day', 'month') else grouped.order_by('-margin')
+
+    def with_percent(row):
+        row = {key: float(value) if isinstance(value, Decimal) else value for key, value in row.items()}
+        row['margin_percent'] = round(row['margin'] / row['revenue'] * 100, 2) if row['revenue'] else None
+        return row
+
+    return {
+        'rows': [with_percent(row) for row in grouped[:limit]],
+        'totals': with_percent({k: v or 0 for k, v in totals.items()}),
+    }
@@ -0,0 +1,189 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.deconstruct import deconstructible
+from django.utils.http import http_date
+
+
+CAS_PREFIX = 'cas/'
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+CHUNK_SIZE = 64 * 1024
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each upload once, at cas/<aa>/<bb>/<sha256><ext>, whatever name
+    or folder the model's upload_to produced. Every save() adds a reference
+    and delete() only removes the file when the last reference goes, so two
+    rows pointing at the same image can be deleted independently.
+
+    Names already inside cas/ (e.g. "<hash>_thumb.webp" renditions derived
+    from a stored file) are written verbatim and share the parent's lifetime.
+    """
+    deduplicates = True
+
+    def _hash(self, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()
+
+    def get_available_name(self, name, max_length=None):
+        # Content-addressed names never collide with different content.
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        if name.startswith(CAS_PREFIX):
+            if self.exists(name):
+                return name
+            return super()._save(name, content)
+
+        sha = self._hash(content)
+        _, ext = os.path.splitext(name)
+        name = f"{CAS_PREFIX}{sha[:2]}/{sha[2:4]}/{sha}{ext.lower()}"
+
+        if not self.exists(name):
+            name = super()._save(name, content)
+
+        with transaction.atomic():
+            updated = MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        MediaBlob.objects.create(name=name, sha256=sha, size=content.size, ref_count=1)
+                except IntegrityError:
+                    MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+        return name
+
+    def delete(self, name):
+        from .models import MediaBlob
+
+        if not name or not name.startswith(CAS_PREFIX):
+            # Legacy uploads are not reference counted and may be shared;
+            # the dedupe_media command moves them into cas/ first.
+            return
+
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob and blob.ref_count > 1:
+                blob.ref_count -= 1
+                blob.save(update_fields=['ref_count'])
+                return
+            if blob:
+                blob.delete()
+
+        stem, _ = os.path.splitext(name)
+        directory, prefix = os.path.split(stem)
+        super().delete(name)
+        # Derived renditions ("<hash>_thumb.webp") go with the original.
+        if self.exists(directory):
+            for filename in self.listdir(directory)[1]:
+                if filename.startswith(prefix + '_'):
+                    super().delete(os.path.join(directory, filename))
+
+
+def _release_on_delete(field_name):
+    def handler(sender, instance, **kwargs):
+        fieldfile = getattr(instance, field_name)
+        name = fieldfile.name if fieldfile else None
+        if name and getattr(fieldfile.storage, 'deduplicates', False):
+            transaction.on_commit(lambda: fieldfile.storage.delete(name))
+    return handler
+
+
+# Queryset deletes (e.g. removed shop images in edit_customer) bypass
+# Model.delete() but still send post_delete, so references are dropped here.
+for _model, _field in [('App1.Product', 'product_picture'), ('App1.User', 'profile_picture'), ('App1.CustomerShopImage', 'image')]:
+    post_delete.connect(_release_on_delete(_field), sender=_model, weak=False, dispatch_uid=f'media-release-{_model}')
+
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _file_iterator(f, start, length):
+    f.seek(start)
+    remaining = length
+    try:
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def serve_media(request, path):
+    """
+    Local (DEBUG-only) media server with single-range support (HTTP 206) and validators.
+    Content-addressed files never change, so they get a one-year immutable
+    Cache-Control; legacy paths get a short revalidating cache.
+    """
+    from django.conf import settings
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except Exception:
+        raise Http404("Invalid path")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found")
+
+    stat = os.stat(full_path)
+    size = stat.st_size
+    immutable = path.startswith(CAS_PREFIX)
+    etag = f'"{os.path.splitext(os.path.basename(path))[0]}"' if immutable else f'"{int(stat.st_mtime)}-{size}"'
+
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    range_header = request.headers.get('Range', '')
+    match = _RANGE_RE.match(range_header.strip()) if range_header else None
+    if match and (match.group(1) or match.group(2)):
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start = max(size - int(last), 0)  # suffix range: last N bytes
+            end = size - 1
+        if start >= size or start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _file_iterator(open(full_path, 'rb'), start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = IMMUTABLE_CACHE if immutable else 'public, max-age=3600, must-revalidate'
+    return response
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:53
+
+import datetime
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesmanDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('visit_count', models.PositiveIntegerField(default=0)),
+                ('open_visits', models.PositiveIntegerField(default=0)),
+                ('distance_km', models.DecimalField(decimal_places=3, default=0, max_digits=10)),
+                ('dwell_time', models.DurationField(default=datetime.timedelta)),
+                ('orders_count', models.PositiveIntegerField(default=0)),
+                ('orders_total', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('route', models.JSONField(blank=True, default=list)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='salesmanvisit',
+            index=models.Index(fields=['salesman', 'check_in_time'], name='App1_salesm_salesma_729b8e_idx'),
+        ),
+        migrations.AddField(
+            model_name='salesmandailysummary',
+            name='salesman',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='App1.user'),
+        ),
+        migrations.AddIndex(
+            model_name='salesmandailysummary',
+            index=models.Index(fields=['refreshed_at'], name='App1_salesm_refresh_d2f6e4_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='salesmandailysummary',
+            unique_together={('salesman', 'date')},
+        ),
+    ]
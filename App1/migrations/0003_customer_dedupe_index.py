@@ -0,0 +1,99 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:55
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of App1.customer_dedupe's normalizers as they were when this
+# migration was written, so later changes there don't alter the backfill.
+NAME_STOPWORDS = {
+    'the', 'and', 'of', 'm/s', 'ms', 'pvt', 'private', 'ltd', 'limited', 'llp',
+    'co', 'company', 'corp', 'inc', 'shop', 'store', 'stores', 'enterprise', 'enterprises',
+}
+
+ADDRESS_ABBREVIATIONS = {
+    'rd': 'road', 'st': 'street', 'opp': 'opposite', 'nr': 'near', 'ngr': 'nagar',
+    'no': '', 'blr': 'bangalore', 'bengaluru': 'bangalore',
+}
+
+GRAM_SIZE = 3
+
+
+def _words(value):
+    value = (value or '').lower().replace('&', ' and ')
+    return re.findall(r'[a-z0-9]+', value)
+
+
+def normalize_name(value):
+    return ''.join(w for w in _words(value) if w not in NAME_STOPWORDS)[:255]
+
+
+def normalize_address(value):
+    words = (ADDRESS_ABBREVIATIONS.get(w, w) for w in _words(value))
+    return ' '.join(w for w in words if w)[:255]
+
+
+def normalize_gst(value):
+    return re.sub(r'[^A-Z0-9]', '', (value or '').upper())
+
+
+def trigrams(key):
+    if not key:
+        return set()
+    padded = f"  {key} "
+    return {padded[i:i + GRAM_SIZE] for i in range(len(padded) - GRAM_SIZE + 1)}
+
+
+def backfill_keys(apps, schema_editor):
+    Customer = apps.get_model('App1', 'Customer')
+    CustomerTrigram = apps.get_model('App1', 'CustomerTrigram')
+
+    customers = list(Customer.objects.only('id', 'shop_name', 'shop_address', 'gst_number'))
+    for c in customers:
+        c.name_key = normalize_name(c.shop_name)
+        c.address_key = normalize_address(c.shop_address)
+        c.gst_key = normalize_gst(c.gst_number)
+    Customer.objects.bulk_update(customers, ['name_key', 'address_key', 'gst_key'], batch_size=1000)
+    CustomerTrigram.objects.bulk_create(
+        [CustomerTrigram(customer_id=c.id, gram=g) for c in customers for g in trigrams(c.name_key)],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0002_salesman_daily_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='address_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='gst_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='name_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='CustomerTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_trigrams', to='App1.customer')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['gram', 'customer'], name='App1_custom_gram_2cf749_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+    ]
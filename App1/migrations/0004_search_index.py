@@ -0,0 +1,128 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE "App1_searchentry_fts" USING fts5(
+        title, subtitle, body,
+        content='App1_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER "App1_searchentry_ai" AFTER INSERT ON "App1_searchentry" BEGIN
+        INSERT INTO "App1_searchentry_fts"(rowid, title, subtitle, body)
+        VALUES (new.id, new.title, new.subtitle, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER "App1_searchentry_ad" AFTER DELETE ON "App1_searchentry" BEGIN
+        INSERT INTO "App1_searchentry_fts"("App1_searchentry_fts", rowid, title, subtitle, body)
+        VALUES ('delete', old.id, old.title, old.subtitle, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER "App1_searchentry_au" AFTER UPDATE ON "App1_searchentry" BEGIN
+        INSERT INTO "App1_searchentry_fts"("App1_searchentry_fts", rowid, title, subtitle, body)
+        VALUES ('delete', old.id, old.title, old.subtitle, old.body);
+        INSERT INTO "App1_searchentry_fts"(rowid, title, subtitle, body)
+        VALUES (new.id, new.title, new.subtitle, new.body);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS "App1_searchentry_au"',
+    'DROP TRIGGER IF EXISTS "App1_searchentry_ad"',
+    'DROP TRIGGER IF EXISTS "App1_searchentry_ai"',
+    'DROP TABLE IF EXISTS "App1_searchentry_fts"',
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE "App1_searchentry" ADD COLUMN "search_vector" tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce("title", '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce("subtitle", '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce("body", '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX "App1_searchentry_vector_idx" ON "App1_searchentry" USING GIN ("search_vector")',
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS "App1_searchentry_vector_idx"',
+    'ALTER TABLE "App1_searchentry" DROP COLUMN IF EXISTS "search_vector"',
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+create_fulltext_index = _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD})
+drop_fulltext_index = _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE})
+
+
+# Frozen copies of App1.search's document builders as they were when this
+# migration was written, so later changes there don't alter the backfill.
+def _join(*values):
+    return ' '.join(str(v) for v in values if v)
+
+
+DOCUMENTS = {
+    'customer': ('Customer', lambda c: (c.user_id, c.shop_name or '', _join(c.full_name, c.customer_name),
+                                        _join(c.phone_number, c.gst_number, c.email, c.shop_city, c.shop_district, c.shop_address))),
+    'product': ('Product', lambda p: (None, p.name, _join(p.brand_name, p.model_name), _join(p.hsn_code, p.product_type))),
+    'order': ('SalesOrder', lambda o: (o.created_by_id, f"Order #{o.id}", o.customer.shop_name, _join(f"ORD{o.id}", o.id, o.order_type))),
+    'vendor': ('Vendor', lambda v: (None, v.name, v.contact_person or '', _join(v.phone_number, v.gst_number, v.email, v.city))),
+}
+
+
+def backfill_index(apps, schema_editor):
+    """Index the rows that existed before the signal handlers did; the triggers fill the FTS table."""
+    SearchEntry = apps.get_model('App1', 'SearchEntry')
+    for entity, (model_name, build) in DOCUMENTS.items():
+        queryset = apps.get_model('App1', model_name).objects.all()
+        if entity == 'order':
+            queryset = queryset.select_related('customer')
+        entries = []
+        for obj in queryset.iterator(chunk_size=2000):
+            owner_id, title, subtitle, body = build(obj)
+            entries.append(SearchEntry(entity=entity, object_id=obj.pk, owner_id=owner_id,
+                                       title=title[:255], subtitle=subtitle[:255], body=body))
+        SearchEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0003_customer_dedupe_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('customer', 'Customer'), ('product', 'Product'), ('order', 'Sales Order'), ('vendor', 'Vendor')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, default='', max_length=255)),
+                ('body', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='App1.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['entity', 'owner'], name='App1_search_entity_7456a1_idx')],
+                'unique_together': {('entity', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(backfill_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0005_media_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoginAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=300)),
+                ('attempted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'attempted_at'], name='App1_logina_key_b17664_idx'), models.Index(fields=['attempted_at'], name='App1_logina_attempt_18ca90_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:05
+
+import datetime
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_days(apps, schema_editor):
+    """Fold repeated (user, date) rows into one: first check-in, last check-out."""
+    Attendance = apps.get_model('App1', 'Attendance')
+    duplicated = (
+        Attendance.objects.values('user_id', 'date')
+        .annotate(n=Count('id'))
+        .filter(n__gt=1)
+    )
+    for dup in duplicated:
+        rows = list(Attendance.objects.filter(user_id=dup['user_id'], date=dup['date']).order_by('id'))
+        keep = rows[0]
+        check_ins = [r.check_in for r in rows if r.check_in]
+        check_outs = [r.check_out for r in rows if r.check_out]
+        keep.check_in = min(check_ins) if check_ins else None
+        keep.check_out = max(check_outs) if check_outs else None
+        keep.working_hours = keep.check_out - keep.check_in if keep.check_in and keep.check_out else None
+        keep.save()
+        Attendance.objects.filter(id__in=[r.id for r in rows[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0006_login_attempt'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_days, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='attendance',
+            unique_together={('user', 'date')},
+        ),
+        migrations.CreateModel(
+            name='AttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Week'), ('month', 'Month')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('days_present', models.PositiveIntegerField(default=0)),
+                ('open_days', models.PositiveIntegerField(default=0)),
+                ('working_hours', models.DurationField(default=datetime.timedelta)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='App1.user')),
+            ],
+            options={
+                'ordering': ['-period_start'],
+                'indexes': [models.Index(fields=['period', 'period_start'], name='App1_attend_period_c4f329_idx')],
+                'unique_together': {('user', 'period', 'period_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0007_attendance_timesheets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesorder',
+            name='is_free_sample',
+            field=models.BooleanField(default=False),
+        ),
+    ]
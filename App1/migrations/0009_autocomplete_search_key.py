@@ -0,0 +1,64 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:41
+
+import re
+
+from django.db import migrations, models
+
+
+# Frozen copies of App1.autocomplete's key builders as they were when this
+# migration was written, so later changes there don't alter the backfill.
+CUSTOMER_KEY_FIELDS = ('shop_name', 'full_name', 'customer_name', 'shop_city', 'phone_number')
+PRODUCT_KEY_FIELDS = ('name', 'brand_name', 'model_name', 'hsn_code')
+
+
+def make_key(*values):
+    return ' '.join(w for value in values for w in re.findall(r'[a-z0-9]+', (value or '').lower()))[:255]
+
+
+def customer_key(customer):
+    phone = re.sub(r'\D', '', customer.phone_number or '')
+    return make_key(customer.shop_name, customer.full_name, customer.customer_name, customer.shop_city, phone)
+
+
+def product_key(product):
+    return make_key(product.name, product.brand_name, product.model_name, product.hsn_code)
+
+
+def refresh_keys(model, key, fields, connection):
+    stale = [
+        (key(obj), obj.id)
+        for obj in model.objects.only('id', *fields).iterator(chunk_size=2000)
+    ]
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.executemany(f"UPDATE {qn(model._meta.db_table)} SET {qn('search_key')} = %s WHERE {qn('id')} = %s", stale)
+
+
+def backfill_keys(apps, schema_editor):
+    refresh_keys(apps.get_model('App1', 'Customer'), customer_key, CUSTOMER_KEY_FIELDS, schema_editor.connection)
+    refresh_keys(apps.get_model('App1', 'Product'), product_key, PRODUCT_KEY_FIELDS, schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0008_salesorder_is_free_sample'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='search_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['user', 'search_key'], name='App1_custom_user_id_a89db2_idx'),
+        ),
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+    ]
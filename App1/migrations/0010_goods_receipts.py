@@ -0,0 +1,64 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_costs(apps, schema_editor):
+    """Stock on hand starts at the product's purchase price; orders already marked received count as fully received."""
+    Inventory = apps.get_model('App1', 'Inventory')
+    Product = apps.get_model('App1', 'Product')
+    PurchaseItem = apps.get_model('App1', 'PurchaseItem')
+
+    Inventory.objects.update(
+        average_cost=models.Subquery(Product.objects.filter(pk=models.OuterRef('product_id')).values('purchase_price')[:1])
+    )
+    PurchaseItem.objects.filter(purchase_order__is_received=True).update(received_quantity=models.F('quantity'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0009_autocomplete_search_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='average_cost',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Weighted-average cost of the units in stock', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='purchaseitem',
+            name='received_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='GoodsReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('remarks', models.TextField(blank=True, null=True)),
+                ('purchase_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='App1.purchaseorder')),
+                ('received_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='App1.user')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_type', models.CharField(choices=[('receipt', 'Goods Receipt')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('unit_cost', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='App1.product')),
+                ('purchase_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movements', to='App1.purchaseitem')),
+                ('receipt', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='App1.goodsreceipt')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'created_at'], name='App1_stockm_product_2552eb_idx')],
+            },
+        ),
+        migrations.RunPython(seed_costs, migrations.RunPython.noop),
+    ]
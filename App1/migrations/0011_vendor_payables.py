@@ -0,0 +1,79 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    """Amounts already paid on existing orders become one opening payment each; balances start from the orders."""
+    PurchaseOrder = apps.get_model('App1', 'PurchaseOrder')
+    VendorPayment = apps.get_model('App1', 'VendorPayment')
+    VendorBalance = apps.get_model('App1', 'VendorBalance')
+
+    VendorPayment.objects.bulk_create([
+        VendorPayment(purchase_order_id=order_id, paid_by_id=user_id, payment_date=order_date,
+                      amount_paid=paid, payment_mode='other', remarks='Opening balance')
+        for order_id, user_id, order_date, paid in PurchaseOrder.objects.filter(total_paid__gt=0)
+        .values_list('id', 'created_by_id', 'order_date', 'total_paid').iterator()
+    ], batch_size=500)
+
+    totals = PurchaseOrder.objects.values('vendor_id').annotate(
+        purchased=models.Sum('total_amount'), paid=models.Sum('total_paid'), due=models.Sum('balance_due'),
+        open=models.Count('id', filter=models.Q(balance_due__gt=0)),
+        last_paid=models.Max('order_date', filter=models.Q(total_paid__gt=0)),
+    )
+    VendorBalance.objects.bulk_create([
+        VendorBalance(vendor_id=t['vendor_id'], total_purchased=t['purchased'], total_paid=t['paid'],
+                      outstanding=t['due'], open_orders=t['open'], last_payment_at=t['last_paid'])
+        for t in totals
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0010_goods_receipts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorBalance',
+            fields=[
+                ('vendor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='App1.vendor')),
+                ('total_purchased', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('outstanding', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('open_orders', models.IntegerField(default=0)),
+                ('last_payment_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VendorPaymentRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('payment_mode', models.CharField(choices=[('cash', 'Cash'), ('upi', 'UPI'), ('bank_transfer', 'Bank Transfer'), ('cheque', 'Cheque'), ('other', 'Other')], max_length=50)),
+                ('reference', models.CharField(blank=True, default='', help_text='UTR / cheque number', max_length=100)),
+                ('remarks', models.TextField(blank=True, null=True)),
+                ('paid_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vendor_payment_runs', to='App1.user')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_runs', to='App1.vendor')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VendorPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('amount_paid', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('payment_mode', models.CharField(choices=[('cash', 'Cash'), ('upi', 'UPI'), ('bank_transfer', 'Bank Transfer'), ('cheque', 'Cheque'), ('other', 'Other')], max_length=50)),
+                ('remarks', models.TextField(blank=True, null=True)),
+                ('paid_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vendor_payments', to='App1.user')),
+                ('purchase_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='App1.purchaseorder')),
+                ('run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='App1.vendorpaymentrun')),
+            ],
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0011_vendor_payables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyproduction',
+            name='unit_cost',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Component cost per unit at production time', max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='BillOfMaterial',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('component', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bom_lines', to='App1.component')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bom_lines', to='App1.product')),
+            ],
+            options={
+                'unique_together': {('product', 'component')},
+            },
+        ),
+    ]
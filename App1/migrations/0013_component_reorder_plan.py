@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0012_bill_of_materials'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='component',
+            name='lead_time_days',
+            field=models.PositiveIntegerField(default=7, help_text='Days from ordering to the parts arriving'),
+        ),
+        migrations.AddField(
+            model_name='component',
+            name='vendor',
+            field=models.ForeignKey(blank=True, help_text='Usual supplier, for reorder suggestions', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='components', to='App1.vendor'),
+        ),
+        migrations.CreateModel(
+            name='ComponentReorderPlan',
+            fields=[
+                ('component', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reorder_plan', serialize=False, to='App1.component')),
+                ('stock_quantity', models.PositiveIntegerField(default=0)),
+                ('daily_usage', models.DecimalField(decimal_places=3, default=0, max_digits=10)),
+                ('days_of_cover', models.DecimalField(blank=True, decimal_places=1, help_text="Empty when the component isn't being used", max_digits=10, null=True)),
+                ('run_out_date', models.DateField(blank=True, null=True)),
+                ('suggested_quantity', models.PositiveIntegerField(default=0)),
+                ('suggested_cost', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('needs_reorder', models.BooleanField(db_index=True, default=False)),
+                ('planned_at', models.DateTimeField()),
+                ('vendor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='App1.vendor')),
+            ],
+        ),
+    ]
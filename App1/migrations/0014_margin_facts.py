@@ -0,0 +1,76 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def replay_fifo(apps, schema_editor):
+    """
+    Invoiced orders already drew from batches without saying which: replay FIFO
+    per product (invoices in order, batches oldest first, each batch holding
+    what its stock_out says was drawn) to record the SaleItemBatch rows.
+    """
+    DailyProduction = apps.get_model('App1', 'DailyProduction')
+    SaleItem = apps.get_model('App1', 'SaleItem')
+    SaleItemBatch = apps.get_model('App1', 'SaleItemBatch')
+
+    batches = {}
+    for batch_id, product_id, drawn, unit_cost, purchase_price in (
+        DailyProduction.objects.filter(stock_out__gt=0).order_by('id')
+        .values_list('id', 'product_id', 'stock_out', 'unit_cost', 'product__purchase_price')
+    ):
+        batches.setdefault(product_id, []).append([batch_id, drawn, unit_cost or purchase_price])
+
+    rows = []
+    items = (SaleItem.objects.filter(order__invoices__isnull=False).distinct()
+             .order_by('order__order_date', 'order_id', 'id').values_list('id', 'product_id', 'quantity'))
+    for item_id, product_id, required in items.iterator():
+        for batch in batches.get(product_id, []):
+            if required <= 0:
+                break
+            taken = min(required, batch[1])
+            if taken:
+                rows.append(SaleItemBatch(sale_item_id=item_id, batch_id=batch[0], quantity=taken, unit_cost=batch[2]))
+                batch[1] -= taken
+                required -= taken
+    SaleItemBatch.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0013_component_reorder_plan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleItemBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_cost', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sale_allocations', to='App1.dailyproduction')),
+                ('sale_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='App1.saleitem')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MarginFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('estimated_quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('margin', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refreshed_at', models.DateTimeField()),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='App1.customer')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='App1.product')),
+                ('salesman', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='App1.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'product'], name='App1_margin_date_831a32_idx'), models.Index(fields=['salesman', 'date'], name='App1_margin_salesma_0abaeb_idx'), models.Index(fields=['customer', 'date'], name='App1_margin_custome_402a42_idx')],
+            },
+        ),
+        migrations.RunPython(replay_fifo, migrations.RunPython.noop),
+    ]
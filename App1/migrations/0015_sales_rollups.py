@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0014_margin_facts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('dimension', models.CharField(choices=[('all', 'All sales'), ('order_type', 'Order type'), ('category', 'Category'), ('city', 'City'), ('salesman', 'Salesman')], max_length=20)),
+                ('key', models.CharField(blank=True, max_length=255)),
+                ('label', models.CharField(blank=True, max_length=255)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('cum_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('cum_orders', models.PositiveBigIntegerField(default=0)),
+                ('cum_units', models.PositiveBigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', 'date'], name='App1_salesr_dimensi_efd1b1_idx')],
+                'unique_together': {('dimension', 'key', 'date')},
+            },
+        ),
+    ]
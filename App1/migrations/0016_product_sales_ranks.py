@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0015_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_days', models.PositiveSmallIntegerField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue_rank', models.PositiveIntegerField(blank=True, null=True)),
+                ('units_rank', models.PositiveIntegerField(blank=True, null=True)),
+                ('revenue_class', models.CharField(choices=[('A', 'A - fast mover'), ('B', 'B - steady'), ('C', 'C - slow mover')], default='C', max_length=1)),
+                ('units_class', models.CharField(choices=[('A', 'A - fast mover'), ('B', 'B - steady'), ('C', 'C - slow mover')], default='C', max_length=1)),
+                ('revenue_share', models.DecimalField(decimal_places=2, default=0, help_text='Cumulative % of revenue down to this product', max_digits=6)),
+                ('ranked_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_ranks', to='App1.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['window_days', 'revenue_rank'], name='App1_produc_window__fb0001_idx')],
+                'unique_together': {('product', 'window_days')},
+            },
+        ),
+    ]
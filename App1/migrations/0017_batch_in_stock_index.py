@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0016_product_sales_ranks'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailyproduction',
+            index=models.Index(condition=models.Q(('current_stock__gt', 0)), fields=['refurbished_date', 'product'], name='batch_in_stock_idx'),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_main_store_room(apps, schema_editor):
+    """All stock so far sat in one place: hold every batch's remaining units at a default store room."""
+    Location = apps.get_model('App1', 'Location')
+    DailyProduction = apps.get_model('App1', 'DailyProduction')
+    BatchStock = apps.get_model('App1', 'BatchStock')
+
+    location = Location.objects.create(name='Main Store Room', is_default=True)
+    DailyProduction.objects.update(location=location)
+    rows = (
+        BatchStock(batch_id=batch_id, location=location, product_id=product_id, quantity=stock)
+        for batch_id, product_id, stock in DailyProduction.objects.filter(current_stock__gt=0)
+        .values_list('id', 'product_id', 'current_stock').iterator()
+    )
+    BatchStock.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App1', '0017_batch_in_stock_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('address', models.TextField(blank=True, default='')),
+                ('is_default', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('is_default',), name='single_default_location')],
+            },
+        ),
+        migrations.AddField(
+            model_name='dailyproduction',
+            name='location',
+            field=models.ForeignKey(blank=True, help_text='Store room the batch was stocked into', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='App1.location'),
+        ),
+        migrations.AddField(
+            model_name='saleitembatch',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='App1.location'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='home_location',
+            field=models.ForeignKey(blank=True, help_text="Store room invoices for this user's orders are served from first", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='home_users', to='App1.location'),
+        ),
+        migrations.CreateModel(
+            name='StockTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('remarks', models.TextField(blank=True, default='')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='App1.user')),
+                ('from_location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transfers_out', to='App1.location')),
+                ('to_location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transfers_in', to='App1.location')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockTransferLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='App1.dailyproduction')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='App1.product')),
+                ('transfer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='App1.stocktransfer')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BatchStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_stock', to='App1.dailyproduction')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='App1.product')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='batch_stock', to='App1.location')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['location', 'product', 'batch'], name='batch_stock_location_idx'), models.Index(fields=['product', 'location', 'batch'], name='batch_stock_product_idx')],
+                'unique_together': {('batch', 'location')},
+            },
+        ),
+        migrations.RunPython(open_main_store_room, migrations.RunPython.noop),
+    ]
@@ -6,29 +6,35 @@ from django.utils import timezone
 from django.db import transaction
 from django.core.exceptions import ValidationError
 
+from .images import optimize_image_field, schedule_renditions
+
 class Role(models.Model):
     name = models.CharField(max_length=255, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Granted when a non-admin role is created; admin always gets every permission.
+    DEFAULT_PERMISSIONS = ('dashboard_v', 'accounts_v', 'customer_v', 'customer_a', 'orders_v', 'orders_a')
+
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs) 
 
-        role_permissions, _ = RolePermissions.objects.get_or_create(role=self)
-
-        if self.name.lower() == "admin":
-            for field in RolePermissions._meta.fields:
-                if isinstance(field, models.BooleanField):
-                    setattr(role_permissions, field.name, True)
+        is_admin = self.name.lower() == "admin"
+        if is_admin:
+            granted = [f.name for f in RolePermissions._meta.fields if isinstance(f, models.BooleanField)]
         else:
-            role_permissions.dashboard_v = True
-            role_permissions.accounts_v = True
-            role_permissions.customer_v = True
-            role_permissions.customer_a = True
-            role_permissions.orders_v = True
-            role_permissions.orders_a = True
-
-        role_permissions.save()
+            granted = self.DEFAULT_PERMISSIONS
+
+        role_permissions, created = RolePermissions.objects.get_or_create(
+            role=self, defaults={name: True for name in granted}
+        )
+        # Renaming a role keeps whatever was set on the permissions page;
+        # only the admin row is topped up, and only when a grant is missing.
+        missing = [name for name in granted if not getattr(role_permissions, name)]
+        if not created and is_admin and missing:
+            for name in missing:
+                setattr(role_permissions, name, True)
+            role_permissions.save(update_fields=missing)
 
     def __str__(self):
         return f"{self.name}"
@@ -113,6 +119,7 @@ class User(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True)
+    home_location = models.ForeignKey('Location', on_delete=models.SET_NULL, null=True, blank=True, related_name='home_users', help_text="Store room invoices for this user's orders are served from first")
 
     def __str__(self):
         return f"{self.first_name} - {self.role}"
@@ -120,7 +127,9 @@ class User(models.Model):
     def save(self, *args, **kwargs):
         if self.password and not self.password.startswith('pbkdf2_'):
             self.password = make_password(self.password)
+        picture = optimize_image_field(self, 'profile_picture')
         super().save(*args, **kwargs)
+        schedule_renditions(picture, self.profile_picture.storage)
 
     def check_password(self, raw_password):
         return check_password(raw_password, self.password)
@@ -163,8 +172,48 @@ class Customer(models.Model):
     latitude = models.CharField(max_length=50, blank=True, null=True)
     longitude = models.CharField(max_length=50, blank=True, null=True)
 
+    # Normalized keys for duplicate detection (see customer_dedupe.py)
+    name_key = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)
+    address_key = models.CharField(max_length=255, blank=True, default='', editable=False)
+    gst_key = models.CharField(max_length=100, blank=True, default='', db_index=True, editable=False)
+    # Normalized words for the order form's autocomplete (see autocomplete.py)
+    search_key = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)
+
+    DEDUPE_SOURCE_FIELDS = {'shop_name', 'shop_address', 'gst_number'}
+
+    class Meta:
+        # A salesman's autocomplete is a range scan within their own customers
+        indexes = [models.Index(fields=['user', 'search_key'])]
+
+    def save(self, *args, **kwargs):
+        from .autocomplete import CUSTOMER_KEY_FIELDS, customer_key
+        from .customer_dedupe import set_customer_keys, index_customer
+
+        update_fields = kwargs.get('update_fields')
+        reindex = update_fields is None or bool(self.DEDUPE_SOURCE_FIELDS & set(update_fields))
+        if reindex:
+            set_customer_keys(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'name_key', 'address_key', 'gst_key'}
+        if update_fields is None or set(CUSTOMER_KEY_FIELDS) & set(update_fields):
+            self.search_key = customer_key(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'search_key'}
+        super().save(*args, **kwargs)
+        if reindex:
+            index_customer(self)
+
     def __str__(self):
         return f"{self.shop_name} ({self.full_name})"
+
+
+class CustomerTrigram(models.Model):
+    """Inverted index: one row per trigram of a customer's normalized shop name."""
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='name_trigrams')
+    gram = models.CharField(max_length=3)
+
+    class Meta:
+        indexes = [models.Index(fields=['gram', 'customer'])]
     
 
 
@@ -176,6 +225,11 @@ class CustomerShopImage(models.Model):
     image = models.ImageField(upload_to=shop_image_upload_path)
     description = models.CharField(max_length=255, blank=True, null=True)  # optional: e.g., "Front view", etc.
 
+    def save(self, *args, **kwargs):
+        image = optimize_image_field(self, 'image')
+        super().save(*args, **kwargs)
+        schedule_renditions(image, self.image.storage)
+
     def __str__(self):
         return f"{self.customer.full_name} ({self.customer.shop_name})"
     
@@ -249,6 +303,19 @@ class Product(models.Model):
     sale_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="Selling price or MRP for refurbished units")
 
     created_at = models.DateTimeField(auto_now_add=True)
+    search_key = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        from .autocomplete import PRODUCT_KEY_FIELDS, product_key
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(PRODUCT_KEY_FIELDS) & set(update_fields):
+            self.search_key = product_key(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'search_key'}
+        picture = optimize_image_field(self, 'product_picture')
+        super().save(*args, **kwargs)
+        schedule_renditions(picture, self.product_picture.storage)
 
     def __str__(self):
         return f"{self.name} ({self.product_type})"
@@ -282,16 +349,118 @@ class PurchaseItem(models.Model):
     quantity = models.PositiveIntegerField()
     cost_price = models.DecimalField(max_digits=10, decimal_places=2)
     total_price = models.DecimalField(max_digits=12, decimal_places=2)
+    received_quantity = models.PositiveIntegerField(default=0)
+
+    @property
+    def outstanding(self):
+        return self.quantity - self.received_quantity
 
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
-    
+
+
+class VendorPaymentRun(models.Model):
+    """One payment to a vendor that settles one or more of their purchase orders (see payables.py)."""
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='payment_runs')
+    paid_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='vendor_payment_runs')
+    payment_date = models.DateTimeField(default=timezone.now)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    payment_mode = models.CharField(
+        max_length=50,
+        choices=[
+            ('cash', 'Cash'),
+            ('upi', 'UPI'),
+            ('bank_transfer', 'Bank Transfer'),
+            ('cheque', 'Cheque'),
+            ('other', 'Other')
+        ]
+    )
+    reference = models.CharField(max_length=100, blank=True, default='', help_text="UTR / cheque number")
+    remarks = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Vendor payment {self.id} - ₹{self.amount}"
+
+
+class VendorPayment(models.Model):
+    """The part of a payment applied to one purchase order; the PaymentTransaction of the buying side."""
+    purchase_order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name='payments')
+    run = models.ForeignKey(VendorPaymentRun, on_delete=models.CASCADE, null=True, blank=True, related_name='payments')
+    paid_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='vendor_payments')
+    payment_date = models.DateTimeField(default=timezone.now)
+    amount_paid = models.DecimalField(max_digits=12, decimal_places=2)
+    payment_mode = models.CharField(
+        max_length=50,
+        choices=[
+            ('cash', 'Cash'),
+            ('upi', 'UPI'),
+            ('bank_transfer', 'Bank Transfer'),
+            ('cheque', 'Cheque'),
+            ('other', 'Other')
+        ]
+    )
+    remarks = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Payment {self.id} - ₹{self.amount_paid} (PO-{self.purchase_order_id})"
+
+
+class VendorBalance(models.Model):
+    """
+    Running payables totals for a vendor, moved by the same amounts as its
+    purchase orders so nothing has to add the orders up again.
+    """
+    vendor = models.OneToOneField(Vendor, on_delete=models.CASCADE, primary_key=True, related_name='balance')
+    total_purchased = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    outstanding = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    open_orders = models.IntegerField(default=0)
+    last_payment_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.vendor.name}: ₹{self.outstanding} outstanding"
+
+
+class GoodsReceipt(models.Model):
+    """One delivery against a purchase order; its stock movements say what arrived (see goods_receipt.py)."""
+    purchase_order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name='receipts')
+    received_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    received_at = models.DateTimeField(default=timezone.now)
+    remarks = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return f"GRN-{self.id} (PO-{self.purchase_order_id})"
+
+
+class StockMovement(models.Model):
+    """Signed change to a product's stock with the unit cost it moved at."""
+    MOVEMENT_TYPE_CHOICES = [
+        ('receipt', 'Goods Receipt'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPE_CHOICES)
+    quantity = models.IntegerField()
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    receipt = models.ForeignKey(GoodsReceipt, on_delete=models.CASCADE, null=True, blank=True, related_name='movements')
+    purchase_item = models.ForeignKey(PurchaseItem, on_delete=models.SET_NULL, null=True, blank=True, related_name='movements')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['product', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.product.name} {self.quantity:+d} ({self.movement_type})"
+
 class Component(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     unit = models.CharField(max_length=50, default='Pieces')
     purchase_price = models.DecimalField(max_digits=10, decimal_places=2)
     stock_quantity = models.PositiveIntegerField(default=0)
+    vendor = models.ForeignKey(Vendor, on_delete=models.SET_NULL, null=True, blank=True, related_name='components', help_text="Usual supplier, for reorder suggestions")
+    lead_time_days = models.PositiveIntegerField(default=7, help_text="Days from ordering to the parts arriving")
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -314,17 +483,52 @@ class ComponentUsage(models.Model):
     quantity_used = models.PositiveIntegerField(default=1)
 
     def save(self, *args, **kwargs):
-        # Deduct used components from stock
-        if self.component.stock_quantity < self.quantity_used:
-            raise ValidationError(f"Not enough stock for {self.component.name}")
-        self.component.stock_quantity -= self.quantity_used
-        self.component.save()
-        super().save(*args, **kwargs)
+        # Deduct used components from stock, once, in the same UPDATE that checks there is enough
+        # (work_orders.produce consumes a whole bill of materials in bulk instead)
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            deducted = Component.objects.filter(pk=self.component_id, stock_quantity__gte=self.quantity_used).update(
+                stock_quantity=models.F('stock_quantity') - self.quantity_used
+            )
+            if not deducted:
+                raise ValidationError(f"Not enough stock for {self.component.name}")
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.component.name} x {self.quantity_used} → {self.refurbished_product.serial_number}"
    
 
+class ComponentReorderPlan(models.Model):
+    """Latest reorder-planner result for a component (see reorder_planner.py); rebuilt by plan_component_reorders."""
+    component = models.OneToOneField(Component, on_delete=models.CASCADE, primary_key=True, related_name='reorder_plan')
+    vendor = models.ForeignKey(Vendor, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    stock_quantity = models.PositiveIntegerField(default=0)
+    daily_usage = models.DecimalField(max_digits=10, decimal_places=3, default=0)
+    days_of_cover = models.DecimalField(max_digits=10, decimal_places=1, null=True, blank=True, help_text="Empty when the component isn't being used")
+    run_out_date = models.DateField(null=True, blank=True)
+    suggested_quantity = models.PositiveIntegerField(default=0)
+    suggested_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    needs_reorder = models.BooleanField(default=False, db_index=True)
+    planned_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.component.name}: {self.days_of_cover} days of cover"
+
+
+class BillOfMaterial(models.Model):
+    """One component line of a refurbished product's recipe: `quantity` of the component per unit produced."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='bom_lines')
+    component = models.ForeignKey(Component, on_delete=models.CASCADE, related_name='bom_lines')
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('product', 'component')
+
+    def __str__(self):
+        return f"{self.product.name}: {self.component.name} x {self.quantity}"
+
+
 class DailyProduction(models.Model):
     refurbished_product = models.ForeignKey(RefurbishedProduct, on_delete=models.CASCADE, related_name='daily_productions')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -335,6 +539,19 @@ class DailyProduction(models.Model):
     sale_price = models.DecimalField(max_digits=10, decimal_places=2)
     mrp = models.DecimalField(max_digits=10, decimal_places=2)
     serial_number = models.CharField(max_length=100, blank=True, null=True)
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Component cost per unit at production time")
+    location = models.ForeignKey('Location', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', help_text="Store room the batch was stocked into")
+
+    class Meta:
+        indexes = [
+            # Only batches still holding stock: the ageing report and slow-stock lookups read these, not the history
+            models.Index(fields=['refurbished_date', 'product'], condition=models.Q(current_stock__gt=0),
+                         name='batch_in_stock_idx'),
+        ]
+
+    @property
+    def unit_margin(self):
+        return self.sale_price - self.unit_cost
 
     def save(self, *args, **kwargs):
         self.current_stock = self.stock_in - self.stock_out
@@ -344,12 +561,78 @@ class DailyProduction(models.Model):
         return f"{self.product.name} ({self.serial_number or self.refurbished_product.serial_number})"
 
 
+class Location(models.Model):
+    """A store room stock is held in. New production goes to the default one unless another is picked."""
+    name = models.CharField(max_length=255, unique=True)
+    address = models.TextField(blank=True, default='')
+    is_default = models.BooleanField(default=False)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['is_default'], condition=models.Q(is_default=True), name='single_default_location'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class BatchStock(models.Model):
+    """
+    Units of one production batch held at one location; a batch's rows add up
+    to its current_stock. Kept by App1.locations on stock-in, transfer and sale.
+    """
+    batch = models.ForeignKey(DailyProduction, on_delete=models.CASCADE, related_name='location_stock')
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='batch_stock')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')  # the batch's, so availability reads skip DailyProduction
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('batch', 'location')
+        indexes = [
+            # What's at a location / where a product is: each a range read on one index, in FIFO (batch) order
+            models.Index(fields=['location', 'product', 'batch'], name='batch_stock_location_idx'),
+            models.Index(fields=['product', 'location', 'batch'], name='batch_stock_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.batch} @ {self.location.name}: {self.quantity}"
+
+
+class StockTransfer(models.Model):
+    """A move of stock between two locations; its lines record which batches moved."""
+    from_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='transfers_out')
+    to_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='transfers_in')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    remarks = models.TextField(blank=True, default='')
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Transfer #{self.id}: {self.from_location.name} -> {self.to_location.name}"
+
+
+class StockTransferLine(models.Model):
+    transfer = models.ForeignKey(StockTransfer, on_delete=models.CASCADE, related_name='lines')
+    batch = models.ForeignKey(DailyProduction, on_delete=models.CASCADE, related_name='+')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.product.name} x {self.quantity} ({self.transfer})"
+
+
 class Inventory(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='inventories')
     opening_stock = models.PositiveIntegerField(default=0)
     stock_in = models.PositiveIntegerField(default=0)
     stock_out = models.PositiveIntegerField(default=0)
     current_stock = models.IntegerField(default=0)
+    average_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Weighted-average cost of the units in stock")
     last_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
@@ -397,6 +680,7 @@ class SalesOrder(models.Model):
 
     payment_status = models.CharField(max_length=50, choices=PAYMENT_STATUS_CHOICES, default='pending')
     delivery_status = models.CharField(max_length=50, choices=DELIVERY_STATUS_CHOICES, default='processing')
+    is_free_sample = models.BooleanField(default=False)
 
     def update_payment_status(self):
         self.total_paid = sum(t.amount_paid for t in self.transactions.all())
@@ -431,6 +715,113 @@ class SaleItem(models.Model):
     total = models.DecimalField(max_digits=12, decimal_places=2)
 
 
+class SaleItemBatch(models.Model):
+    """Units of a sale item taken from one DailyProduction batch when the order was invoiced, at that batch's cost."""
+    sale_item = models.ForeignKey(SaleItem, on_delete=models.CASCADE, related_name='batches')
+    batch = models.ForeignKey(DailyProduction, on_delete=models.CASCADE, related_name='sale_allocations')
+    location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    quantity = models.PositiveIntegerField()
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.quantity} from batch {self.batch_id} @ ₹{self.unit_cost}"
+
+
+class MarginFact(models.Model):
+    """
+    Sales revenue (taxable value) against FIFO cost for one day x product x
+    salesman x customer; rebuilt by margins.refresh_facts. Units not yet
+    invoiced are costed at the batch they would be served from next and
+    counted in estimated_quantity until they are.
+    """
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    salesman = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    customer = models.ForeignKey('Customer', on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField(default=0)
+    estimated_quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    margin = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'product']),
+            models.Index(fields=['salesman', 'date']),
+            models.Index(fields=['customer', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}: ₹{self.margin}"
+
+
+class SalesRollup(models.Model):
+    """
+    Sales for one day and one value of a trend dimension (order type,
+    category, city, salesman, or 'all'), with running totals since that
+    value's first sale; rebuilt by sales_trends.refresh_rollups. Rows are
+    dense, one per day, so any date range is two lookups of the cum_ columns.
+    """
+    DIMENSION_CHOICES = [
+        ('all', 'All sales'),
+        ('order_type', 'Order type'),
+        ('category', 'Category'),
+        ('city', 'City'),
+        ('salesman', 'Salesman'),
+    ]
+
+    date = models.DateField()
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=255, blank=True)
+    label = models.CharField(max_length=255, blank=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    cum_revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    cum_orders = models.PositiveBigIntegerField(default=0)
+    cum_units = models.PositiveBigIntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('dimension', 'key', 'date')
+        indexes = [models.Index(fields=['dimension', 'date'])]
+
+    def __str__(self):
+        return f"{self.date} {self.dimension}={self.key or '-'}: ₹{self.revenue}"
+
+
+class ProductSalesRank(models.Model):
+    """
+    A product's sales over the last `window_days`, its rank among all products
+    and its ABC (Pareto) class by revenue and by units; rebuilt by
+    product_ranking.rank_products. Unsold products have no rank and class C.
+    """
+    CLASS_CHOICES = [
+        ('A', 'A - fast mover'),
+        ('B', 'B - steady'),
+        ('C', 'C - slow mover'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_ranks')
+    window_days = models.PositiveSmallIntegerField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue_rank = models.PositiveIntegerField(null=True, blank=True)
+    units_rank = models.PositiveIntegerField(null=True, blank=True)
+    revenue_class = models.CharField(max_length=1, choices=CLASS_CHOICES, default='C')
+    units_class = models.CharField(max_length=1, choices=CLASS_CHOICES, default='C')
+    revenue_share = models.DecimalField(max_digits=6, decimal_places=2, default=0, help_text="Cumulative % of revenue down to this product")
+    ranked_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('product', 'window_days')
+        indexes = [models.Index(fields=['window_days', 'revenue_rank'])]
+
+    def __str__(self):
+        return f"{self.product.name} ({self.window_days}d): #{self.revenue_rank or '-'} {self.revenue_class}"
+
+
 
 
 
@@ -524,9 +915,36 @@ class Attendance(models.Model):
             self.working_hours = self.check_out - self.check_in
         super().save(*args, **kwargs)
 
+    class Meta:
+        unique_together = ('user', 'date')  # one row per user per day, written by upsert
+
     def __str__(self):
         return f"{self.user.username} - {self.date} ({self.working_hours or 'Not calculated'})"
 
+
+class AttendanceSummary(models.Model):
+    """Working hours rolled up per user per week/month, kept current by App1.timesheets."""
+    PERIOD_CHOICES = [
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+
+    user = models.ForeignKey("User", on_delete=models.CASCADE, related_name="attendance_summaries")
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    days_present = models.PositiveIntegerField(default=0)
+    open_days = models.PositiveIntegerField(default=0)  # checked in but never checked out
+    working_hours = models.DurationField(default=timedelta)
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('user', 'period', 'period_start')
+        ordering = ['-period_start']
+        indexes = [models.Index(fields=['period', 'period_start'])]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.period} of {self.period_start} ({self.working_hours})"
+
 from django.db import models
 from django.utils import timezone
 
@@ -561,5 +979,87 @@ class SalesmanVisit(models.Model):
     visit_description = models.TextField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['salesman', 'check_in_time'])]
+
+    def __str__(self):
+        return f"{self.salesman.username} - {self.customer} ({self.check_in_time})"
+
+class SalesmanDailySummary(models.Model):
+    salesman = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_summaries')
+    date = models.DateField()
+
+    visit_count = models.PositiveIntegerField(default=0)
+    open_visits = models.PositiveIntegerField(default=0)
+    distance_km = models.DecimalField(max_digits=10, decimal_places=3, default=0)
+    dwell_time = models.DurationField(default=timedelta)
+    orders_count = models.PositiveIntegerField(default=0)
+    orders_total = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+
+    # per-visit rows: sequence, customer, leg distance, dwell seconds, orders
+    route = models.JSONField(default=list, blank=True)
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('salesman', 'date')
+        ordering = ['-date']
+        indexes = [models.Index(fields=['refreshed_at'])]
+
+    def __str__(self):
+        return f"{self.salesman.username} - {self.date} ({self.visit_count} visits)"
+
+
+class SearchEntry(models.Model):
+    """
+    One searchable document per Customer / Product / SalesOrder / Vendor.
+    The full-text index over it (FTS5 on SQLite, tsvector on PostgreSQL) is
+    created in migration 0004 and kept in sync by the database.
+    """
+    ENTITY_CHOICES = [
+        ('customer', 'Customer'),
+        ('product', 'Product'),
+        ('order', 'Sales Order'),
+        ('vendor', 'Vendor'),
+    ]
+
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True, default='')
+    body = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('entity', 'object_id')
+        indexes = [models.Index(fields=['entity', 'owner'])]
+
+    def __str__(self):
+        return f"{self.entity} #{self.object_id} - {self.title}"
+
+
+class MediaBlob(models.Model):
+    """Reference count for a file kept by ContentAddressedStorage."""
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class LoginAttempt(models.Model):
+    """Failed login, kept for the login guard's database-backed sliding window."""
+    key = models.CharField(max_length=300)  # "user:<username>" or "ip:<address>"
+    attempted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key', 'attempted_at']),
+            models.Index(fields=['attempted_at']),
+        ]
+
     def __str__(self):
-        return f"{self.salesman.username} - {self.customer} ({self.check_in_time})"
\ No newline at end of file
+        return f"{self.key} at {self.attempted_at}"
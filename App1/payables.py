@@ -0,0 +1,143 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import PurchaseOrder, VendorBalance, VendorPayment, VendorPaymentRun
+
+
+ZERO = Decimal('0.00')
+
+
+def payment_status(total, paid):
+    """Same rule add_purchase_order uses when the order is created."""
+    return 'paid' if paid >= total else 'partial' if paid > 0 else 'pending'
+
+
+def adjust_balance(vendor_id, purchased=ZERO, paid=ZERO, open_orders=0, paid_at=None, create=True):
+    """Move the vendor's running totals by the given amounts (F() updates, so concurrent writers add up)."""
+    if create:
+        VendorBalance.objects.get_or_create(vendor_id=vendor_id)
+    changes = {
+        'total_purchased': F('total_purchased') + purchased,
+        'total_paid': F('total_paid') + paid,
+        'outstanding': F('outstanding') + purchased - paid,
+        'open_orders': F('open_orders') + open_orders,
+        'updated_at': timezone.now(),
+    }
+    if paid_at is not None:
+        changes['last_payment_at'] = paid_at
+    VendorBalance.objects.filter(vendor_id=vendor_id).update(**changes)
+
+
+def _order_saved(sender, instance, created, raw=False, **kwargs):
+    # Only creation moves the totals here; payments go through pay(), which
+    # adjusts the balance itself in the same transaction.
+    if created and not raw:
+        adjust_balance(instance.vendor_id, purchased=instance.total_amount, paid=instance.total_paid,
+                       open_orders=1 if instance.balance_due > 0 else 0,
+                       paid_at=instance.order_date if instance.total_paid > 0 else None)
+
+
+def _order_deleted(sender, instance, **kwargs):
+    # No new row here: when the vendor itself is being deleted its balance may already be gone
+    adjust_balance(instance.vendor_id, purchased=-instance.total_amount, paid=-instance.total_paid,
+                   open_orders=-1 if instance.balance_due > 0 else 0, create=False)
+
+
+post_save.connect(_order_saved, sender=PurchaseOrder, dispatch_uid='payables-order-saved')
+post_delete.connect(_order_deleted, sender=PurchaseOrder, dispatch_uid='payables-order-deleted')
+
+
+def open_orders(vendor):
+    """The vendor's purchase orders with something still to pay, oldest first."""
+    return PurchaseOrder.objects.filter(vendor=vendor, balance_due__gt=0).order_by('order_date', 'id')
+
+
+def allocate(vendor, amount):
+    """Split `amount` over the vendor's open orders, oldest first. Returns {order_id: amount}."""
+    amount = Decimal(amount)
+    allocations = {}
+    for order_id, due in open_orders(vendor).values_list('id', 'balance_due'):
+        if amount <= 0:
+            break
+        allocations[order_id] = min(due, amount)
+        amount -= allocations[order_id]
+    if amount > 0:
+        raise ValidationError(f"₹{amount} is more than the vendor's outstanding balance.")
+    return allocations
+
+
+def pay(vendor, allocations, user=None, payment_mode='bank_transfer', reference='', remarks=''):
+    """
+    Record one payment run settling several of the vendor's purchase orders.
+    `allocations` maps purchase order id -> amount (partial amounts are fine).
+
+    One transaction and a fixed number of queries however many orders it
+    covers: the orders are locked and read once, the run and its per-order
+    VendorPayment rows are inserted in bulk, the orders are bulk-updated and
+    the VendorBalance is moved by the total. Returns the VendorPaymentRun.
+    """
+    allocations = {int(order_id): Decimal(amount) for order_id, amount in allocations.items() if Decimal(amount) != 0}
+    if not allocations:
+        raise ValidationError("Enter an amount for at least one purchase order.")
+
+    with transaction.atomic():
+        orders = {o.id: o for o in PurchaseOrder.objects.select_for_update().filter(vendor=vendor, id__in=allocations)}
+        for order_id, amount in allocations.items():
+            order = orders.get(order_id)
+            if order is None:
+                raise ValidationError(f"PO-{order_id} is not a purchase order of {vendor.name}.")
+            if amount < 0:
+                raise ValidationError(f"Amount for PO-{order_id} can't be negative.")
+            if amount > order.balance_due:
+                raise ValidationError(f"Payment for PO-{order_id} exceeds its balance (₹{order.balance_due}).")
+
+        now = timezone.now()
+        total = sum(allocations.values(), ZERO)
+        run = VendorPaymentRun.objects.create(
+            vendor=vendor, paid_by=user, payment_date=now, amount=total,
+            payment_mode=payment_mode, reference=reference, remarks=remarks,
+        )
+        VendorPayment.objects.bulk_create([
+            VendorPayment(purchase_order_id=order_id, run=run, paid_by=user, payment_date=now,
+                          amount_paid=amount, payment_mode=payment_mode, remarks=remarks)
+            for order_id, amount in allocations.items()
+        ])
+
+        closed = 0
+        for order_id, amount in allocations.items():
+            order = orders[order_id]
+            order.total_paid += amount
+            order.balance_due -= amount
+            order.payment_status = payment_status(order.total_amount, order.total_paid)
+            closed += order.balance_due <= 0
+        PurchaseOrder.objects.bulk_update(orders.values(), ['total_paid', 'balance_due', 'payment_status'])
+
+        adjust_balance(vendor.id, paid=total, open_orders=-closed, paid_at=now)
+    return run
+
+
+def rebuild_balances():
+    """Recompute every VendorBalance from the purchase orders, e.g. after editing orders by hand."""
+    totals = PurchaseOrder.objects.values('vendor_id').annotate(
+        purchased=Sum('total_amount'), paid=Sum('total_paid'), due=Sum('balance_due'),
+        open=Count('id', filter=Q(balance_due__gt=0)),
+    )
+    last_paid = dict(
+        VendorPayment.objects.values('purchase_order__vendor_id').annotate(last=Max('payment_date'))
+        .values_list('purchase_order__vendor_id', 'last')
+    )
+    with transaction.atomic():
+        VendorBalance.objects.all().delete()
+        VendorBalance.objects.bulk_create([
+            VendorBalance(
+                vendor_id=t['vendor_id'], total_purchased=t['purchased'], total_paid=t['paid'],
+                outstanding=t['due'], open_orders=t['open'], last_payment_at=last_paid.get(t['vendor_id']),
+            )
+            for t in totals
+        ])
+    return len(totals)
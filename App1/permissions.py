@@ -0,0 +1,183 @@
+import time
+from functools import wraps
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+from .models import Role, RolePermissions, User
+
+
+# Bit i of a role's mask is PERMISSION_FIELDS[i]. Masks are never stored, so
+# adding a column to RolePermissions only needs a cache flush (a restart).
+PERMISSION_FIELDS = [f.name for f in RolePermissions._meta.fields if isinstance(f, models.BooleanField)]
+BITS = {name: 1 << i for i, name in enumerate(PERMISSION_FIELDS)}
+ALL_PERMISSIONS = (1 << len(PERMISSION_FIELDS)) - 1
+
+ACTIONS = ('v', 'a', 'e', 'd')
+
+# Every process keeps its own copy of the masks it has used, tagged with the
+# shared cache's version; any permission change bumps the version, so all
+# processes sharing the cache reload on their next request. With a per-process
+# backend (LocMemCache) that only holds within one process.
+VERSION_KEY = 'role-perms:version'
+
+# Masks of superseded versions are never read again; this lets them expire.
+MASK_TIMEOUT = 24 * 60 * 60
+
+_local = {}  # role_id -> (mask, version)
+
+
+def _cache_key(role_id, version):
+    return f'role-perms:{version}:{role_id}'
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # An evicted version restarts from a fresh value no process has seen.
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def compile_permissions(role_permissions):
+    """Fold a RolePermissions row into an int, one bit per boolean column."""
+    mask = 0
+    for name, bit in BITS.items():
+        if getattr(role_permissions, name):
+            mask |= bit
+    return mask
+
+
+def _load_mask(role_id):
+    row = RolePermissions.objects.filter(role_id=role_id).select_related('role').first()
+    if row is None:
+        return None
+    if row.role.name.lower() == "admin":
+        return ALL_PERMISSIONS  # same rule as Role.save: admin always gets everything
+    return compile_permissions(row)
+
+
+def mask_for_role(role_id):
+    """
+    The role's compiled mask (None when it has no permissions row), served from
+    process memory while the shared version is unchanged; the shared cache and
+    then the database are only hit on a miss.
+    """
+    if role_id is None:
+        return None
+    version = current_version()
+    entry = _local.get(role_id)
+    if entry and entry[1] == version:
+        return entry[0]
+
+    key = _cache_key(role_id, version)
+    mask = cache.get(key, -1)
+    if mask == -1:
+        mask = _load_mask(role_id)
+        cache.set(key, mask, MASK_TIMEOUT)
+    _local[role_id] = (mask, version)
+    return mask
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate(role_id=None):
+    """
+    Drop every process's cached masks once the current transaction commits (so
+    nobody reloads the old row in between). Masks are versioned together; the
+    role id only documents the caller's intent.
+    """
+    if role_id is None:
+        _local.clear()
+    else:
+        _local.pop(role_id, None)
+    transaction.on_commit(_bump)
+
+
+def _invalidate_role(sender, instance, **kwargs):
+    invalidate(instance.role_id if sender is RolePermissions else instance.pk)
+
+
+for _sender in (RolePermissions, Role):
+    post_save.connect(_invalidate_role, sender=_sender, dispatch_uid=f'role-perms-{_sender.__name__}')
+    post_delete.connect(_invalidate_role, sender=_sender, dispatch_uid=f'role-perms-delete-{_sender.__name__}')
+
+
+class PermissionSet:
+    """
+    Read-only view of a compiled mask. Exposes the RolePermissions column names
+    as attributes, so templates keep using role_permission.orders_a unchanged.
+    """
+    __slots__ = ('mask',)
+
+    def __init__(self, mask):
+        self.mask = mask
+
+    def has(self, module, action='v'):
+        return bool(self.mask & BITS.get(f'{module}_{action}', 0))
+
+    def __getattr__(self, name):
+        try:
+            return bool(self.mask & BITS[name])
+        except KeyError:
+            raise AttributeError(name)
+
+    def __repr__(self):
+        return f'<PermissionSet {[n for n, b in BITS.items() if self.mask & b]}>'
+
+
+def get_user_and_permissions(request):
+    """
+    (user, PermissionSet) for the session user, or (None, None). Memoized on the
+    request so a decorated view calling get_logged_in_user doesn't query twice.
+    """
+    cached = getattr(request, '_user_and_permissions', None)
+    if cached is not None:
+        return cached
+
+    result = (None, None)
+    username = request.session.get('current_user')
+    if username:
+        user = User.objects.select_related('role').filter(username=username).first()
+        if user:
+            mask = mask_for_role(user.role_id)
+            result = (user, PermissionSet(mask) if mask is not None else None)
+    request._user_and_permissions = result
+    return result
+
+
+def requires(module, action='v', json=False):
+    """
+    View decorator: the session user's role must have <module>_<action>,
+    e.g. @requires("orders", "a"). Anonymous users go to the login page and
+    denied users back to the dashboard with an error; json=True views get
+    401/403 JSON responses instead.
+    """
+    bit = BITS[f'{module}_{action}']  # unknown permission names fail at import time
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            user, permissions = get_user_and_permissions(request)
+            if not user:
+                if json:
+                    return JsonResponse({"error": "Login required"}, status=401)
+                return redirect('login')
+            if not permissions or not permissions.mask & bit:
+                if json:
+                    return JsonResponse({"error": "Permission denied"}, status=403)
+                messages.error(request, "You do not have permission to access that page.")
+                return redirect('dashboard')
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,112 @@
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F, FilteredRelation, Q, Sum
+from django.utils import timezone
+
+from .models import Product, ProductSalesRank, SaleItem
+
+
+# Rolling windows (days) a product is ranked over
+WINDOWS = tuple(getattr(settings, 'PRODUCT_RANK_WINDOWS', (30, 90, 365)))
+# The window the product list and order pickers sort by
+PRIMARY_WINDOW = getattr(settings, 'PRODUCT_RANK_WINDOW', 90)
+if PRIMARY_WINDOW not in WINDOWS:
+    # Nothing would be ranked over it, and every product would sort as unranked
+    raise ImproperlyConfigured(f"PRODUCT_RANK_WINDOW ({PRIMARY_WINDOW}) must be one of PRODUCT_RANK_WINDOWS {WINDOWS}.")
+# Cumulative share (%) of sales reached by the end of class A and of class B
+A_SHARE, B_SHARE = getattr(settings, 'PRODUCT_ABC_SHARES', (80, 95))
+
+
+def classify(values):
+    """
+    {product_id: (rank, class, cumulative share %)} for {product_id: value},
+    largest first. A product is classed by the share reached before it, so
+    the one that crosses the A line is still an A. Zero values are left out.
+    """
+    total = sum(values.values())
+    ranked = sorted(((value, pid) for pid, value in values.items() if value > 0), key=lambda v: (-v[0], v[1]))
+
+    result = {}
+    running = 0
+    for rank, (value, pid) in enumerate(ranked, start=1):
+        before = running * 100 / total
+        running += value
+        abc = 'A' if before < A_SHARE else 'B' if before < B_SHARE else 'C'
+        result[pid] = (rank, abc, running * 100 / total)
+    return result
+
+
+def window_sales(now=None):
+    """
+    {window_days: {product_id: (revenue, units)}} for every window in one
+    grouped pass over the longest window's sale items.
+    """
+    now = now or timezone.now()
+    measures = {}
+    for days in WINDOWS:
+        in_window = Q(order__order_date__gte=now - timedelta(days=days))
+        measures[f'revenue_{days}'] = Sum('total', filter=in_window)
+        measures[f'units_{days}'] = Sum('quantity', filter=in_window)
+
+    rows = (SaleItem.objects.filter(order__order_date__gte=now - timedelta(days=max(WINDOWS)))
+            .order_by().values('product_id').annotate(**measures))
+
+    sales = {days: {} for days in WINDOWS}
+    for row in rows:
+        for days in WINDOWS:
+            if row[f'units_{days}']:
+                sales[days][row['product_id']] = (row[f'revenue_{days}'] or Decimal('0'), row[f'units_{days}'])
+    return sales
+
+
+def rank_products(now=None):
+    """
+    Recompute every product's rank and ABC class for each window: one read of
+    the product ids, one grouped pass over the sales and one upsert.
+    Returns the number of rankings written.
+    """
+    now = now or timezone.now()
+    sales = window_sales(now)
+    product_ids = list(Product.objects.values_list('id', flat=True))
+
+    rankings = []
+    for days in WINDOWS:
+        by_revenue = classify({pid: revenue for pid, (revenue, units) in sales[days].items()})
+        by_units = classify({pid: units for pid, (revenue, units) in sales[days].items()})
+        for pid in product_ids:
+            revenue, units = sales[days].get(pid, (Decimal('0'), 0))
+            revenue_rank, revenue_class, share = by_revenue.get(pid, (None, 'C', 0))
+            units_rank, units_class, _ = by_units.get(pid, (None, 'C', 0))
+            rankings.append(ProductSalesRank(
+                product_id=pid, window_days=days, revenue=revenue, units=units,
+                revenue_rank=revenue_rank, units_rank=units_rank,
+                revenue_class=revenue_class, units_class=units_class,
+                revenue_share=Decimal(share).quantize(Decimal('0.01'), ROUND_HALF_UP),
+                ranked_at=now,
+            ))
+
+    ProductSalesRank.objects.bulk_create(
+        rankings,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['product', 'window_days'],
+        update_fields=['revenue', 'units', 'revenue_rank', 'units_rank', 'revenue_class', 'units_class',
+                       'revenue_share', 'ranked_at'],
+    )
+    # Windows dropped from PRODUCT_RANK_WINDOWS would otherwise linger
+    ProductSalesRank.objects.exclude(window_days__in=WINDOWS).delete()
+    return len(rankings)
+
+
+def with_rank(products):
+    """
+    `products` annotated with sales_rank and abc_class for PRIMARY_WINDOW
+    (one LEFT JOIN), fast movers first and unranked products last by name.
+    """
+    return (products
+            .annotate(primary_rank=FilteredRelation('sales_ranks', condition=Q(sales_ranks__window_days=PRIMARY_WINDOW)))
+            .annotate(sales_rank=F('primary_rank__revenue_rank'), abc_class=F('primary_rank__revenue_class'))
+            .order_by(F('sales_rank').asc(nulls_last=True), 'name'))
@@ -0,0 +1,286 @@
+import atexit
+import contextvars
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.template.backends.django import DjangoTemplates, Template
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+
+QUERY_COUNT_HEADER = 'X-DB-Queries'
+
+# X-DB-Queries and Server-Timing tell clients how the database is doing, so
+# they are only sent in development unless QUERY_METRICS_HEADERS says otherwise.
+SEND_HEADERS = getattr(settings, 'QUERY_METRICS_HEADERS', settings.DEBUG)
+
+# Where to append one JSON line per request (None = headers only), and the
+# fraction of requests written there.
+LOG_PATH = getattr(settings, 'QUERY_METRICS_LOG', None)
+SAMPLE_RATE = getattr(settings, 'QUERY_METRICS_SAMPLE', 1.0)
+
+# Query budgets per URL name, enforced by query_budget()/assert_view_budget()
+# and flagged in the metrics log. Only pages whose query count doesn't grow
+# with the data are listed; the order table and reports are still N+1.
+QUERY_BUDGETS = {
+    'login': 9,  # user, attendance upsert + rollup, new session, plus a BEGIN per write on SQLite
+    'dashboard': 6,
+    'dashboard_metrics': 12,
+    'add_order': 15,
+    'generate_invoice': 20,
+    'view_receipt': 10,
+    'inventory_table': 6,
+    'purchase_order_table': 6,
+    'attendance': 10,
+    'view_customer': 8,
+    'view_product': 8,
+    'autocomplete_customers': 5,
+    'autocomplete_products': 6,
+    **getattr(settings, 'QUERY_BUDGETS', {}),
+}
+
+_current = contextvars.ContextVar('query_metrics', default=None)
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (0.0 for none); shared by the reports and benchmarks."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def fingerprint(sql):
+    """Collapse IN (%s, %s, ...) so the same statement with a different list size matches."""
+    normalized = _IN_LIST.sub('(%s, ...)', sql)
+    return hashlib.md5(normalized.encode()).hexdigest()[:12], normalized
+
+
+class RequestMetrics:
+    """
+    Query count, SQL time and statement fingerprints for one request, collected
+    through connection.execute_wrapper(); render time comes from TimedDjangoTemplates.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.render_queries = 0
+        self.similar = Counter()      # fingerprint -> executions
+        self.exact = Counter()        # (sql, params) -> executions
+        self.statements = {}          # fingerprint -> normalized SQL
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            key, normalized = fingerprint(sql)
+            self.similar[key] += 1
+            self.statements.setdefault(key, normalized)
+            try:
+                self.exact[hash((sql, repr(params)))] += 1
+            except TypeError:
+                pass
+
+    @property
+    def duplicates(self):
+        """Executions repeating an earlier statement with the same parameters."""
+        return sum(n - 1 for n in self.exact.values() if n > 1)
+
+    def repeated(self, limit=5):
+        """The statements run more than once, most frequent first (N+1 candidates)."""
+        return [
+            {'fingerprint': key, 'count': n, 'sql': self.statements[key][:300]}
+            for key, n in self.similar.most_common(limit) if n > 1
+        ]
+
+    def describe(self, limit=5):
+        lines = [f"{self.queries} queries, {self.duplicates} exact duplicates"]
+        for entry in self.repeated(limit):
+            lines.append(f"  {entry['count']:>4} x {entry['sql']}")
+        return "\n".join(lines)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        start, queries = time.perf_counter(), metrics.queries
+        try:
+            return super().render(context, request)
+        finally:
+            # Nested {% include %}s render through the engine, not this wrapper,
+            # so each top-level render is counted once.
+            metrics.render_time += time.perf_counter() - start
+            metrics.render_queries += metrics.queries - queries
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend that reports render time and queries issued from templates."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class JsonlSink:
+    """
+    Append-only JSON lines file. Records are buffered and written with a single
+    O_APPEND write per batch, so several workers can share one file without
+    interleaving lines and requests never wait on disk.
+    """
+
+    def __init__(self, path, batch=50, interval=2.0):
+        self.path = path
+        self.batch = batch
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.pending = []
+        self.flushed_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def write(self, record):
+        line = json.dumps(record, separators=(',', ':'), default=str) + "\n"
+        with self.lock:
+            self.pending.append(line)
+            if len(self.pending) < self.batch and time.monotonic() - self.flushed_at < self.interval:
+                return
+            lines, self.pending = self.pending, []
+            self.flushed_at = time.monotonic()
+        self._append(lines)
+
+    def flush(self):
+        with self.lock:
+            lines, self.pending = self.pending, []
+        self._append(lines)
+
+    def _append(self, lines):
+        if not lines:
+            return
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, "".join(lines).encode())
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"❌ Could not write query metrics to {self.path}: {e}")
+
+
+def read_log(path):
+    """Yield the records of a metrics log, skipping lines cut short by a crash."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return request.path_info
+    return match.url_name or match.view_name
+
+
+class QueryMetricsMiddleware:
+    """
+    Times every request and its SQL. Sends X-DB-Queries and Server-Timing
+    headers when SEND_HEADERS is on and, when QUERY_METRICS_LOG is set, appends a record per request
+    for `manage.py query_report`. Streaming responses only count the queries
+    run before the first chunk.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sink = JsonlSink(LOG_PATH) if LOG_PATH else None
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+
+        if SEND_HEADERS:
+            response[QUERY_COUNT_HEADER] = str(metrics.queries)
+            response['Server-Timing'] = (
+                f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.queries} queries", '
+                f'render;dur={metrics.render_time * 1000:.1f}, total;dur={total * 1000:.1f}'
+            )
+
+        if self.sink and (SAMPLE_RATE >= 1 or random.random() < SAMPLE_RATE):
+            view = view_name(request)
+            budget = QUERY_BUDGETS.get(view)
+            self.sink.write({
+                'ts': timezone.now().isoformat(timespec='seconds'),
+                'method': request.method,
+                'path': request.path_info,
+                'view': view,
+                'status': response.status_code,
+                'queries': metrics.queries,
+                'duplicates': metrics.duplicates,
+                'db_ms': round(metrics.sql_time * 1000, 2),
+                'render_ms': round(metrics.render_time * 1000, 2),
+                'render_queries': metrics.render_queries,
+                'total_ms': round(total * 1000, 2),
+                'over_budget': budget is not None and metrics.queries > budget,
+                'repeated': metrics.repeated(3),
+            })
+        return response
+
+
+# --- test helpers ------------------------------------------------------------
+
+@contextmanager
+def query_budget(limit, label='block'):
+    """
+    Fail with AssertionError if the block runs more than `limit` queries; the
+    message lists the repeated statements so the N+1 is easy to find.
+    """
+    metrics = RequestMetrics()
+    with connection.execute_wrapper(metrics):
+        yield metrics
+    if metrics.queries > limit:
+        raise AssertionError(f"{label} exceeded its query budget of {limit}: {metrics.describe()}")
+
+
+def assert_view_budget(client, path, budget=None, method='get', data=None):
+    """
+    Request `path` with a test client and assert it stays within `budget`
+    queries (default: QUERY_BUDGETS for its URL name). Returns the response.
+    """
+    name = resolve(path.split('?')[0]).url_name
+    if budget is None:
+        if name not in QUERY_BUDGETS:
+            raise KeyError(f"No query budget for view '{name}'; pass budget= or add it to QUERY_BUDGETS.")
+        budget = QUERY_BUDGETS[name]
+    with query_budget(budget, label=f"{method.upper()} {path} ({name})"):
+        response = getattr(client, method)(path, data or {})
+    return response
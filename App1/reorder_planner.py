@@ -0,0 +1,128 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db.models import Min, Sum
+from django.utils import timezone
+
+from .models import Component, ComponentReorderPlan, ComponentUsage
+
+
+# Usage is averaged over this many days of history (None: since the first recorded usage)...
+VELOCITY_DAYS = getattr(settings, 'COMPONENT_VELOCITY_DAYS', 90)
+# ...or over the most recent RECENT_DAYS when that is faster, so a pickup shows at once
+RECENT_DAYS = getattr(settings, 'COMPONENT_RECENT_DAYS', 14)
+# Suggested orders cover the lead time plus this many days of usage
+COVER_DAYS = getattr(settings, 'COMPONENT_COVER_DAYS', 30)
+# Reorder once stock won't last the lead time plus this margin
+SAFETY_DAYS = getattr(settings, 'COMPONENT_SAFETY_DAYS', 7)
+
+
+def daily_buckets(since, until):
+    """
+    {component_id: [units used per day]} from `since` to `until` inclusive, index 0
+    being `since`. One GROUP BY over the usage history; work orders are dated by
+    their production_date.
+    """
+    length = (until - since).days + 1
+    buckets = defaultdict(lambda: [0] * length)
+    rows = (ComponentUsage.objects
+            .filter(refurbished_product__production_date__range=(since, until))
+            .values_list('component_id', 'refurbished_product__production_date')
+            .annotate(units=Sum('quantity_used')))
+    for component_id, day, units in rows:
+        buckets[component_id][(day - since).days] += units
+    return buckets
+
+
+def velocity(days):
+    """Units per day: the window average, or the recent average when usage is picking up."""
+    overall = sum(days) / len(days)
+    recent = days[-RECENT_DAYS:]
+    return max(overall, sum(recent) / len(recent))
+
+
+def plan_component(component, rate, today):
+    """The ComponentReorderPlan fields for one component used `rate` units a day."""
+    stock = component.stock_quantity
+    plan = {
+        'vendor_id': component.vendor_id,
+        'stock_quantity': stock,
+        'daily_usage': Decimal(rate).quantize(Decimal('0.001'), ROUND_HALF_UP),
+        'days_of_cover': None,
+        'run_out_date': None,
+        'suggested_quantity': 0,
+        'needs_reorder': False,
+    }
+    if rate > 0:
+        cover = stock / rate
+        plan['days_of_cover'] = Decimal(cover).quantize(Decimal('0.1'), ROUND_HALF_UP)
+        plan['run_out_date'] = today + timedelta(days=min(int(cover), 36500))
+        plan['needs_reorder'] = cover <= component.lead_time_days + SAFETY_DAYS
+        if plan['needs_reorder']:
+            plan['suggested_quantity'] = max(math.ceil(rate * (component.lead_time_days + COVER_DAYS)) - stock, 0)
+    plan['suggested_cost'] = (component.purchase_price * plan['suggested_quantity']).quantize(Decimal('0.01'))
+    return plan
+
+
+def history_start(today):
+    """First day the velocity is averaged over: VELOCITY_DAYS back, or the first recorded usage."""
+    if VELOCITY_DAYS:
+        return today - timedelta(days=VELOCITY_DAYS - 1)
+    first = ComponentUsage.objects.aggregate(first=Min('refurbished_product__production_date'))['first']
+    return min(first, today) if first else today
+
+
+def plan_reorders(today=None):
+    """
+    Recompute the reorder plan for every component: two reads (components and
+    the daily usage buckets) and one upsert. Over the default 90-day window
+    that takes well under a second; with COMPONENT_VELOCITY_DAYS = None it
+    averages over the whole history in the same single pass.
+    Returns the number of components planned.
+    """
+    today = today or timezone.localdate()
+    since = history_start(today)
+    buckets = daily_buckets(since, today)
+    now = timezone.now()
+
+    components = Component.objects.only('id', 'stock_quantity', 'purchase_price', 'vendor_id', 'lead_time_days')
+    plans = [
+        ComponentReorderPlan(
+            component_id=component.id,
+            planned_at=now,
+            **plan_component(component, velocity(buckets[component.id]) if component.id in buckets else 0, today),
+        )
+        for component in components.iterator(chunk_size=2000)
+    ]
+    ComponentReorderPlan.objects.bulk_create(
+        plans,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['component'],
+        update_fields=[
+            'vendor', 'stock_quantity', 'daily_usage', 'days_of_cover', 'run_out_date',
+            'suggested_quantity', 'suggested_cost', 'needs_reorder', 'planned_at',
+        ],
+    )
+    return len(plans)
+
+
+def suggested_orders():
+    """
+    The latest plan's reorders grouped by vendor, most urgent first:
+    [{'vendor': Vendor or None, 'lines': [plans], 'total': Decimal}].
+    Reads only the stored plan.
+    """
+    groups = {}
+    plans = (ComponentReorderPlan.objects.filter(needs_reorder=True)
+             .select_related('component', 'vendor')
+             .order_by('days_of_cover', 'component__name'))
+    for plan in plans:
+        group = groups.setdefault(plan.vendor_id, {'vendor': plan.vendor, 'lines': [], 'total': Decimal('0.00')})
+        group['lines'].append(plan)
+        group['total'] += plan.suggested_cost
+    # Vendors in order of their most urgent line; parts with no usual vendor last
+    return sorted(groups.values(), key=lambda g: g['vendor'] is None)
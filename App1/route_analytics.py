@@ -0,0 +1,208 @@
+import math
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import SalesmanVisit, SalesOrder, SalesmanDailySummary
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Days whose summary still shows a visit open are re-checked for this long; a
+# visit left open longer is only picked up again when it is checked out.
+OPEN_VISIT_DAYS = getattr(settings, 'ROUTE_OPEN_VISIT_DAYS', 2)
+
+
+def haversine_legs(lats, lngs):
+    """
+    Great-circle distance (km) between each consecutive pair of points.
+    Returns a list the same length as the input; the first leg is 0.
+    Points with a missing coordinate contribute a 0 leg on either side.
+    """
+    rad = [
+        (math.radians(float(lat)), math.radians(float(lng))) if lat is not None and lng is not None else None
+        for lat, lng in zip(lats, lngs)
+    ]
+
+    legs = [0.0] * len(rad)
+    for i, (a, b) in enumerate(zip(rad, rad[1:]), start=1):
+        if a is None or b is None:
+            continue
+        dlat = b[0] - a[0]
+        dlng = b[1] - a[1]
+        h = math.sin(dlat / 2) ** 2 + math.cos(a[0]) * math.cos(b[0]) * math.sin(dlng / 2) ** 2
+        legs[i] = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+    return legs
+
+
+def build_day_summary(visits, orders):
+    """
+    visits: list of dicts (id, customer_id, customer__shop_name, check_in_time,
+            check_out_time, latitude, longitude) ordered by check_in_time.
+    orders: list of (order_date, grand_total) for the same salesman and day.
+
+    An order belongs to the latest visit checked in before it was placed.
+    """
+    check_ins = [v['check_in_time'] for v in visits]
+    legs = haversine_legs([v['latitude'] for v in visits], [v['longitude'] for v in visits])
+
+    per_visit_orders = [0] * len(visits)
+    orders_total = Decimal('0.00')
+    for order_date, grand_total in orders:
+        orders_total += grand_total or 0
+        idx = bisect_right(check_ins, order_date) - 1
+        if idx >= 0:
+            per_visit_orders[idx] += 1
+
+    route = []
+    dwell_total = timedelta()
+    open_visits = 0
+    for seq, (visit, leg, order_count) in enumerate(zip(visits, legs, per_visit_orders), start=1):
+        if visit['check_out_time']:
+            dwell = visit['check_out_time'] - visit['check_in_time']
+            dwell_total += dwell
+            dwell_seconds = int(dwell.total_seconds())
+        else:
+            open_visits += 1
+            dwell_seconds = None
+
+        route.append({
+            'sequence': seq,
+            'visit_id': visit['id'],
+            'customer_id': visit['customer_id'],
+            'shop_name': visit['customer__shop_name'],
+            'check_in_time': visit['check_in_time'].isoformat(),
+            'distance_km': round(leg, 3),
+            'dwell_seconds': dwell_seconds,
+            'orders': order_count,
+        })
+
+    return {
+        'visit_count': len(visits),
+        'open_visits': open_visits,
+        'distance_km': Decimal(str(round(sum(legs), 3))),
+        'dwell_time': dwell_total,
+        'orders_count': len(orders),
+        'orders_total': orders_total,
+        'route': route,
+    }
+
+
+def _dirty_days(since):
+    """
+    (salesman_id, date) pairs touched after `since`: new check-ins, check-outs
+    (including the bulk check-out done on the next check-in), new orders, and
+    the last OPEN_VISIT_DAYS days whose stored summary still had a visit open.
+    """
+    pairs = set()
+
+    visits = (
+        SalesmanVisit.objects
+        .filter(Q(check_in_time__gte=since) | Q(check_out_time__gte=since))
+        .annotate(day=TruncDate('check_in_time'))
+        .values_list('salesman_id', 'day')
+        .distinct()
+    )
+    pairs.update(visits)
+
+    orders = (
+        SalesOrder.objects
+        .filter(order_date__gte=since, created_by__isnull=False)
+        .annotate(day=TruncDate('order_date'))
+        .values_list('created_by_id', 'day')
+        .distinct()
+    )
+    pairs.update(orders)
+
+    pairs.update(
+        SalesmanDailySummary.objects
+        .filter(open_visits__gt=0, date__gte=timezone.localdate() - timedelta(days=OPEN_VISIT_DAYS))
+        .values_list('salesman_id', 'date')
+    )
+    return pairs
+
+
+def _days_filter(pairs, salesman_field, date_field, lookup='date__in'):
+    by_salesman = defaultdict(list)
+    for salesman_id, day in pairs:
+        by_salesman[salesman_id].append(day)
+
+    condition = Q()
+    for salesman_id, days in by_salesman.items():
+        condition |= Q(**{salesman_field: salesman_id, f'{date_field}__{lookup}': days})
+    return condition
+
+
+def rebuild_summaries(pairs=None):
+    """
+    Recompute and upsert the daily summaries for the given (salesman_id, date)
+    pairs, or for the whole visit history when `pairs` is None.
+    Uses one query for visits, one for orders and one bulk upsert.
+    """
+    now = timezone.now()
+    visits = SalesmanVisit.objects.annotate(day=TruncDate('check_in_time'))
+    orders = SalesOrder.objects.filter(created_by__isnull=False).annotate(day=TruncDate('order_date'))
+
+    if pairs is not None:
+        if not pairs:
+            return 0
+        visits = visits.filter(_days_filter(pairs, 'salesman_id', 'check_in_time'))
+        orders = orders.filter(_days_filter(pairs, 'created_by_id', 'order_date'))
+
+    visits_by_day = defaultdict(list)
+    for v in visits.order_by('salesman_id', 'check_in_time').values(
+        'id', 'salesman_id', 'day', 'customer_id', 'customer__shop_name',
+        'check_in_time', 'check_out_time', 'latitude', 'longitude',
+    ):
+        visits_by_day[(v['salesman_id'], v['day'])].append(v)
+
+    orders_by_day = defaultdict(list)
+    for salesman_id, day, order_date, grand_total in orders.values_list(
+        'created_by_id', 'day', 'order_date', 'grand_total'
+    ):
+        orders_by_day[(salesman_id, day)].append((order_date, grand_total))
+
+    keys = set(visits_by_day) | set(orders_by_day)
+    rows = [
+        SalesmanDailySummary(
+            salesman_id=salesman_id,
+            date=day,
+            refreshed_at=now,
+            **build_day_summary(visits_by_day.get((salesman_id, day), []), orders_by_day.get((salesman_id, day), [])),
+        )
+        for salesman_id, day in keys
+    ]
+
+    SalesmanDailySummary.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['salesman', 'date'],
+        update_fields=[
+            'visit_count', 'open_visits', 'distance_km', 'dwell_time',
+            'orders_count', 'orders_total', 'route', 'refreshed_at',
+        ],
+    )
+
+    if pairs is not None:
+        stale = set(pairs) - keys
+        if stale:
+            SalesmanDailySummary.objects.filter(_days_filter(stale, 'salesman_id', 'date', lookup='in')).delete()
+    return len(rows)
+
+
+def refresh_summaries(full=False):
+    """
+    Incremental refresh: only days touched since the last refresh are rebuilt.
+    Falls back to a full rebuild when the summary table is empty.
+    """
+    watermark = SalesmanDailySummary.objects.aggregate(last=Max('refreshed_at'))['last']
+    if full or watermark is None:
+        return rebuild_summaries()
+    return rebuild_summaries(_dirty_days(watermark))
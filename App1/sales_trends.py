@@ -0,0 +1,296 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Category, SaleItem, SalesOrder, SalesRollup, User
+
+
+ZERO = Decimal('0.00')
+ONE_DAY = timedelta(days=1)
+
+DIMENSIONS = tuple(name for name, _ in SalesRollup.DIMENSION_CHOICES)
+BUCKETS = ('day', 'week', 'month')
+# Every bucket edge is one date__in parameter; keeps a request under SQLite's cap
+MAX_BUCKETS = 400
+# Requests outside these years are refused before any date arithmetic, which
+# would overflow near date.min/date.max (the previous period, month ends)
+MIN_YEAR, MAX_YEAR = 1900, 9998
+
+ROLLUP_COLUMNS = ('date', 'dimension', 'key', 'label', 'revenue', 'orders', 'units',
+                  'cum_revenue', 'cum_orders', 'cum_units', 'refreshed_at')
+
+
+def _city(name):
+    return ' '.join((name or '').split()).title()
+
+
+def daily_sales(since=None):
+    """
+    {(dimension, key): {day: [revenue, orders, units]}} for order dates from
+    `since` on, or every date when None. Two grouped reads at the finest grain
+    (order type x city x salesman, and the same per category for items), rolled
+    up to each dimension here. Order-level series count grand_total; category
+    series count the line totals of that category's items and the orders
+    holding any of them.
+    """
+    orders = SalesOrder.objects.annotate(day=TruncDate('order_date'))
+    items = SaleItem.objects.annotate(day=TruncDate('order__order_date'))
+    if since is not None:
+        # Compared on the raw timestamp rather than truncating every row's date first
+        since_start = timezone.make_aware(datetime.combine(since, datetime.min.time()))
+        orders = orders.filter(order_date__gte=since_start)
+        items = items.filter(order__order_date__gte=since_start)
+
+    order_rows = (orders.order_by()
+                  .values_list('day', 'order_type', 'customer__shop_city', 'created_by_id')
+                  .annotate(amount=Sum('grand_total'), n=Count('id')))
+    item_rows = (items.order_by()
+                 .values_list('day', 'order__order_type', 'order__customer__shop_city', 'order__created_by_id',
+                              'product__category_id')
+                 .annotate(units=Sum('quantity'), amount=Sum('total'), n=Count('order_id', distinct=True)))
+
+    def order_keys(order_type, city, salesman_id):
+        return (('all', ''), ('order_type', order_type), ('city', _city(city)), ('salesman', str(salesman_id or '')))
+
+    series = defaultdict(lambda: defaultdict(lambda: [ZERO, 0, 0]))
+    for day, order_type, city, salesman_id, amount, n in order_rows:
+        for series_key in order_keys(order_type, city, salesman_id):
+            totals = series[series_key][day]
+            totals[0] += amount or ZERO
+            totals[1] += n
+    for day, order_type, city, salesman_id, category_id, units, amount, n in item_rows:
+        for series_key in order_keys(order_type, city, salesman_id):
+            series[series_key][day][2] += units
+        totals = series[('category', str(category_id))][day]
+        totals[0] += amount or ZERO
+        totals[1] += n
+        totals[2] += units
+    return series
+
+
+def _labels(series_keys):
+    """Display names for (dimension, key) pairs: two reads, for categories and salesmen."""
+    keys = defaultdict(set)
+    for dimension, key in series_keys:
+        keys[dimension].add(key)
+
+    categories = dict(Category.objects.filter(id__in=[k for k in keys['category'] if k]).values_list('id', 'name'))
+    salesmen = {
+        user_id: f"{first} {last}".strip()
+        for user_id, first, last in User.objects.filter(id__in=[k for k in keys['salesman'] if k])
+        .values_list('id', 'first_name', 'last_name')
+    }
+    order_types = dict(SalesOrder.ORDER_TYPE_CHOICES)
+
+    labels = {}
+    for dimension, key in series_keys:
+        if dimension == 'all':
+            label = 'All sales'
+        elif dimension == 'order_type':
+            label = order_types.get(key, key)
+        elif dimension == 'category':
+            label = categories.get(int(key), key)
+        elif dimension == 'salesman':
+            label = salesmen.get(int(key), key) if key else 'Unassigned'
+        else:
+            label = key or 'Unknown'
+        labels[(dimension, key)] = label
+    return labels
+
+
+def _write(rows):
+    """Insert rollup tuples (in ROLLUP_COLUMNS order) with one executemany, as margins._write does."""
+    qn = connection.ops.quote_name
+    table = qn(SalesRollup._meta.db_table)
+    columns = ', '.join(qn(SalesRollup._meta.get_field(name).column) for name in ROLLUP_COLUMNS)
+    placeholders = ', '.join(['%s'] * len(ROLLUP_COLUMNS))
+    ops = connection.ops
+    rows = (
+        (ops.adapt_datefield_value(day), *values, ops.adapt_datetimefield_value(refreshed_at))
+        for day, *values, refreshed_at in rows
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+
+
+def rebuild_rollups(since=None):
+    """
+    Rewrite the rollups from `since` to today (the whole history when None).
+    Running totals carry on from the rows of the day before `since`, so only
+    the rewritten days are read from the orders. Every series gets a row per
+    day from its first sale on, sales or not. Returns the number of rows written.
+    """
+    series = daily_sales(since)
+    seeds = {}
+    if since is not None:
+        seeds = {
+            (dimension, key): (label, [cum_revenue, cum_orders, cum_units])
+            for dimension, key, label, cum_revenue, cum_orders, cum_units in SalesRollup.objects
+            .filter(date=since - ONE_DAY)
+            .values_list('dimension', 'key', 'label', 'cum_revenue', 'cum_orders', 'cum_units')
+        }
+    until = max([timezone.localdate(), *(max(days) for days in series.values())])
+    labels = _labels(series)
+    now = timezone.now()
+
+    rows = []
+    for series_key in set(series) | set(seeds):
+        dimension, key = series_key
+        days = series.get(series_key, {})
+        if series_key in seeds:
+            label, cum = seeds[series_key]
+            day = since
+        else:
+            label, cum = None, [ZERO, 0, 0]
+            day = min(days)
+        label = labels.get(series_key, label)
+
+        while day <= until:
+            revenue, orders, units = days.get(day, (ZERO, 0, 0))
+            cum = [cum[0] + revenue, cum[1] + orders, cum[2] + units]
+            rows.append((day, dimension, key, label, revenue, orders, units, *cum, now))
+            day += ONE_DAY
+
+    with transaction.atomic():
+        stale = SalesRollup.objects.all() if since is None else SalesRollup.objects.filter(date__gte=since)
+        stale.delete()
+        _write(rows)
+    return len(rows)
+
+
+def refresh_rollups(full=False):
+    """
+    Incremental refresh: orders are dated when they are placed, so only the
+    days from the last refresh on can have changed. Falls back to a full
+    rebuild when there are no rollups yet. Deleted orders are only dropped
+    by a full rebuild.
+    """
+    watermark = SalesRollup.objects.aggregate(last=Max('refreshed_at'))['last']
+    if full or watermark is None:
+        return rebuild_rollups()
+    return rebuild_rollups(timezone.localdate(watermark))
+
+
+def buckets(start, end, size):
+    """(first, last) day of each day/week/month bucket covering start..end, clipped to the range."""
+    spans = []
+    first = start
+    while first <= end:
+        if size == 'day':
+            last = first
+        elif size == 'week':
+            last = first + timedelta(days=6 - first.weekday())
+        else:
+            last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - ONE_DAY
+        last = min(last, end)
+        spans.append((first, last))
+        first = last + ONE_DAY
+    return spans
+
+
+def bucket_count(start, end, size):
+    """len(buckets(start, end, size)), without building them."""
+    if size == 'day':
+        return (end - start).days + 1
+    if size == 'week':
+        return ((end - timedelta(days=end.weekday())) - (start - timedelta(days=start.weekday()))).days // 7 + 1
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+
+def range_error(start, end, size):
+    """Why trend() can't serve start..end in `size` buckets, or None. Constant time."""
+    if start.year < MIN_YEAR or end.year > MAX_YEAR:
+        return f"start/end must fall between {MIN_YEAR} and {MAX_YEAR}"
+    if start > end:
+        return "start must not be after end"
+    if bucket_count(start, end, size) > MAX_BUCKETS:
+        return f"More than {MAX_BUCKETS} buckets; use a wider bucket or a shorter range"
+    return None
+
+
+def _measures(revenue, orders, units):
+    revenue = float(revenue)
+    return {
+        'revenue': revenue,
+        'orders': orders,
+        'units': units,
+        'average_order_value': round(revenue / orders, 2) if orders else None,
+    }
+
+
+def _change(current, previous):
+    return {
+        name: round((current[name] - previous[name]) / previous[name] * 100, 2) if previous[name] else None
+        for name in current
+    }
+
+
+def trend(start, end, bucket='month', dimension='all', key=None, limit=10):
+    """
+    Revenue, orders, units and average order value per `bucket` from `start`
+    to `end`, one series per value of `dimension` (or just `key`), each with
+    its range total and the same for the equally long period before it.
+
+    Each figure is the difference of two running totals, so this is one read
+    of the rollup rows on the bucket edges, however long the range. Series
+    come largest first by revenue, at most `limit` of them.
+    """
+    spans = buckets(start, end, bucket)
+    previous_end = start - ONE_DAY
+    previous_start = previous_end - (end - start)
+    edges = {previous_start - ONE_DAY, previous_end, *(last for _, last in spans)}
+
+    rows = SalesRollup.objects.filter(dimension=dimension)
+    if key is not None:
+        rows = rows.filter(key=key)
+    # Edges past the last rolled-up day read that day's totals: nothing was sold since
+    latest = SalesRollup.objects.filter(dimension=dimension).order_by('-date').values('date')[:1]
+    rows = rows.filter(Q(date__in=edges) | Q(date=Subquery(latest))).values_list(
+        'key', 'label', 'date', 'cum_revenue', 'cum_orders', 'cum_units', 'refreshed_at')
+
+    cums = defaultdict(dict)
+    labels = {}
+    last_day = refreshed_at = None
+    for row_key, label, day, *cum, row_refreshed in rows:
+        cums[row_key][day] = cum
+        labels[row_key] = label
+        last_day = max(last_day or day, day)
+        refreshed_at = max(refreshed_at or row_refreshed, row_refreshed)
+
+    zero = (ZERO, 0, 0)
+
+    def between(totals, first, last):
+        """Sales from `first` to `last` of one series; before its first row, its totals are zero."""
+        upper = totals.get(min(last, last_day), zero)
+        lower = totals.get(min(first - ONE_DAY, last_day), zero) if first - ONE_DAY < last_day else upper
+        return _measures(*(u - l for u, l in zip(upper, lower)))
+
+    series = []
+    for row_key, totals in cums.items():
+        current = between(totals, start, end)
+        previous = between(totals, previous_start, previous_end)
+        series.append({
+            'key': row_key,
+            'label': labels[row_key],
+            'points': [dict(between(totals, first, last), start=first, end=last) for first, last in spans],
+            'total': current,
+            'previous': previous,
+            'change': _change(current, previous),
+        })
+    series.sort(key=lambda s: s['total']['revenue'], reverse=True)
+
+    return {
+        'dimension': dimension,
+        'bucket': bucket,
+        'start': start,
+        'end': end,
+        'previous_start': previous_start,
+        'previous_end': previous_end,
+        'refreshed_at': refreshed_at,
+        'series': series[:limit],
+    }
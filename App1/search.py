@@ -0,0 +1,267 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.urls import reverse
+
+from .models import Customer, Invoice, Product, SalesOrder, SearchEntry, Vendor
+
+
+def _join(*values):
+    return ' '.join(str(v) for v in values if v)
+
+
+def customer_document(c):
+    return {
+        'owner_id': c.user_id,
+        'title': c.shop_name or '',
+        'subtitle': _join(c.full_name, c.customer_name),
+        'body': _join(c.phone_number, c.gst_number, c.email, c.shop_city, c.shop_district, c.shop_address),
+    }
+
+
+def product_document(p):
+    return {
+        'owner_id': None,
+        'title': p.name,
+        'subtitle': _join(p.brand_name, p.model_name),
+        'body': _join(p.hsn_code, p.product_type),
+    }
+
+
+def order_document(o):
+    return {
+        'owner_id': o.created_by_id,
+        'title': f"Order #{o.id}",
+        'subtitle': o.customer.shop_name,
+        'body': _join(f"ORD{o.id}", o.id, o.order_type),
+    }
+
+
+def vendor_document(v):
+    return {
+        'owner_id': None,
+        'title': v.name,
+        'subtitle': v.contact_person or '',
+        'body': _join(v.phone_number, v.gst_number, v.email, v.city),
+    }
+
+
+# entity -> (model, document builder, fields the document is built from, detail url name)
+INDEXED = {
+    'customer': (Customer, customer_document, {'shop_name', 'full_name', 'customer_name', 'phone_number', 'gst_number', 'email', 'shop_city', 'shop_district', 'shop_address', 'user'}, 'view_customer'),
+    'product': (Product, product_document, {'name', 'brand_name', 'model_name', 'hsn_code', 'product_type'}, 'view_product'),
+    'order': (SalesOrder, order_document, {'customer', 'created_by', 'order_type'}, 'view_receipt'),
+    'vendor': (Vendor, vendor_document, {'name', 'contact_person', 'phone_number', 'gst_number', 'email', 'city'}, 'view_vendor'),
+}
+ENTITY_BY_MODEL = {model: entity for entity, (model, *_rest) in INDEXED.items()}
+
+UPSERT_FIELDS = ['owner', 'title', 'subtitle', 'body', 'updated_at']
+
+
+def _entries(entity, objects):
+    _, build, _, _ = INDEXED[entity]
+    entries = []
+    for obj in objects:
+        doc = build(obj)
+        entries.append(SearchEntry(
+            entity=entity,
+            object_id=obj.pk,
+            owner_id=doc['owner_id'],
+            title=doc['title'][:255],
+            subtitle=doc['subtitle'][:255],
+            body=doc['body'],
+        ))
+    return entries
+
+
+def _upsert(entries):
+    SearchEntry.objects.bulk_create(
+        entries,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['entity', 'object_id'],
+        update_fields=UPSERT_FIELDS,
+    )
+
+
+def index_on_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    entity = ENTITY_BY_MODEL.get(sender)
+    if entity is None or raw:
+        return
+    # Status/total updates (e.g. update_payment_status) don't change the document.
+    if update_fields is not None and not (INDEXED[entity][2] & set(update_fields)):
+        return
+    if entity == 'customer':
+        # Order documents carry the shop name; re-index them when it changes.
+        old_title = SearchEntry.objects.filter(entity=entity, object_id=instance.pk).values_list('title', flat=True).first()
+        if old_title is not None and old_title != (instance.shop_name or '')[:255]:
+            _upsert(_entries('order', instance.orders.select_related('customer')))
+    _upsert(_entries(entity, [instance]))
+
+
+def unindex_on_delete(sender, instance, **kwargs):
+    entity = ENTITY_BY_MODEL.get(sender)
+    if entity is not None:
+        SearchEntry.objects.filter(entity=entity, object_id=instance.pk).delete()
+
+
+# Connected per indexed model: a receiver for every sender would also push
+# unrelated models (order items, payments, visits) off Django's fast-delete
+# path, loading each cascaded row just to send it a signal.
+def _connect(connect=True):
+    for model in ENTITY_BY_MODEL:
+        for signal, handler, prefix in ((post_save, index_on_save, 'index'), (post_delete, unindex_on_delete, 'unindex')):
+            uid = f'search-{prefix}-{model.__name__}'
+            if connect:
+                signal.connect(handler, sender=model, dispatch_uid=uid)
+            else:
+                signal.disconnect(sender=model, dispatch_uid=uid)
+
+
+_connect()
+
+
+@contextmanager
+def indexing_paused():
+    """
+    Stop per-row index updates for a bulk job (process-wide) that fixes the
+    index up itself afterwards, e.g. with rebuild_index().
+    """
+    _connect(False)
+    try:
+        yield
+    finally:
+        _connect()
+
+
+def rebuild_index():
+    """Re-create every search document in bulk. Returns the number indexed."""
+    querysets = {
+        'customer': Customer.objects.all(),
+        'product': Product.objects.all(),
+        'order': SalesOrder.objects.select_related('customer'),
+        'vendor': Vendor.objects.all(),
+    }
+    total = 0
+    for entity, queryset in querysets.items():
+        _upsert(_entries(entity, queryset.iterator(chunk_size=2000)))
+        SearchEntry.objects.filter(entity=entity).exclude(
+            object_id__in=queryset.model.objects.values('pk')
+        ).delete()
+        total += queryset.count()
+    return total
+
+
+def allowed_scope(current_user, role_permission):
+    """
+    Entities the user may search, split into those visible in full and those
+    limited to rows the user owns (a salesman sees only their customers/orders).
+    """
+    if current_user.role and current_user.role.name.lower() == "admin":
+        return set(INDEXED), set()
+
+    everything, own = set(), set()
+    if role_permission:
+        if role_permission.customer_v:
+            own.add('customer')
+        if role_permission.orders_v:
+            own.add('order')
+        if role_permission.products_v or role_permission.all_products_v:
+            everything.add('product')
+        if role_permission.users_v:
+            everything.add('vendor')
+    return everything, own
+
+
+def _tokens(query):
+    return re.findall(r'\w+', query or '')[:8]
+
+
+def _scope_sql(everything, own, user_id):
+    clauses, params = [], []
+    if everything:
+        clauses.append(f"e.entity IN ({', '.join(['%s'] * len(everything))})")
+        params.extend(sorted(everything))
+    if own:
+        clauses.append(f"(e.entity IN ({', '.join(['%s'] * len(own))}) AND e.owner_id = %s)")
+        params.extend(sorted(own))
+        params.append(user_id)
+    return ' OR '.join(clauses), params
+
+
+def _search_sqlite(tokens, scope_sql, scope_params, limit):
+    match = ' '.join(f'"{t}"*' for t in tokens)
+    sql = f"""
+        SELECT e.entity, e.object_id, e.title, e.subtitle, bm25("App1_searchentry_fts", 10.0, 5.0, 1.0) AS rank
+        FROM "App1_searchentry_fts"
+        JOIN "App1_searchentry" e ON e.id = "App1_searchentry_fts".rowid
+        WHERE "App1_searchentry_fts" MATCH %s AND ({scope_sql})
+        ORDER BY rank
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, *scope_params, limit])
+        return cursor.fetchall()
+
+
+def _search_postgresql(tokens, scope_sql, scope_params, limit):
+    tsquery = ' & '.join(f'{t}:*' for t in tokens)
+    sql = f"""
+        SELECT e.entity, e.object_id, e.title, e.subtitle, -ts_rank(e.search_vector, q) AS rank
+        FROM "App1_searchentry" e, to_tsquery('simple', %s) q
+        WHERE e.search_vector @@ q AND ({scope_sql})
+        ORDER BY rank
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [tsquery, *scope_params, limit])
+        return cursor.fetchall()
+
+
+def _search_fallback(tokens, everything, own, user_id, limit):
+    scope = Q(entity__in=everything) | Q(entity__in=own, owner_id=user_id)
+    qs = SearchEntry.objects.filter(scope)
+    for t in tokens:
+        qs = qs.filter(Q(title__icontains=t) | Q(subtitle__icontains=t) | Q(body__icontains=t))
+    return [(e, oid, title, sub, 0) for e, oid, title, sub in qs.values_list('entity', 'object_id', 'title', 'subtitle')[:limit]]
+
+
+def search(current_user, role_permission, query, limit=20):
+    """
+    Ranked, role-scoped search across customers, products, orders and vendors.
+    Every token is matched as a prefix ("sri ele" finds "Sri Ram Electronics").
+    """
+    tokens = _tokens(query)
+    everything, own = allowed_scope(current_user, role_permission)
+    if not tokens or not (everything or own):
+        return []
+
+    scope_sql, scope_params = _scope_sql(everything, own, current_user.id)
+    if connection.vendor == 'sqlite':
+        rows = _search_sqlite(tokens, scope_sql, scope_params, limit)
+    elif connection.vendor == 'postgresql':
+        rows = _search_postgresql(tokens, scope_sql, scope_params, limit)
+    else:
+        rows = _search_fallback(tokens, everything, own, current_user.id, limit)
+
+    # Only invoiced orders have a receipt; the rest link to their row in the order table.
+    order_ids = [object_id for entity, object_id, *_ in rows if entity == 'order']
+    invoiced = set(Invoice.objects.filter(order_id__in=order_ids).values_list('order_id', flat=True)) if order_ids else set()
+
+    results = []
+    for entity, object_id, title, subtitle, rank in rows:
+        if entity == 'order' and object_id not in invoiced:
+            url = f"{reverse('order_table')}#order-{object_id}"
+        else:
+            url = reverse(INDEXED[entity][3], args=[object_id])
+        results.append({
+            'type': entity,
+            'id': object_id,
+            'title': title,
+            'subtitle': subtitle,
+            'url': url,
+        })
+    return results
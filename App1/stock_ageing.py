@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import DecimalField, ExpressionWrapper, F, Min, Q, Sum
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+from .models import DailyProduction
+
+
+# Upper edges (days) of the age buckets; stock older than the last edge goes in an open-ended bucket
+AGE_EDGES = tuple(getattr(settings, 'STOCK_AGE_EDGES', (30, 60, 90, 180)))
+
+GROUPS = {
+    'product': ('product_id', 'product__name', 'product__category__name'),
+    'category': ('product__category_id', 'product__category__name'),
+}
+
+
+def bucket_labels():
+    """'0-30', '31-60', ... '181+' for AGE_EDGES: ages in days, both ends included."""
+    lows = (0,) + tuple(edge + 1 for edge in AGE_EDGES[:-1])
+    return [f"{low}-{high}" for low, high in zip(lows, AGE_EDGES)] + [f"{AGE_EDGES[-1] + 1}+"]
+
+
+def in_stock(older_than=None, today=None):
+    """
+    Batches still holding stock, read through batch_in_stock_idx, optionally
+    only those made more than `older_than` days ago.
+    """
+    batches = DailyProduction.objects.filter(current_stock__gt=0)
+    if older_than:
+        batches = batches.filter(refurbished_date__lt=(today or timezone.localdate()) - timedelta(days=older_than))
+    return batches
+
+
+def _stock_value():
+    """Units x unit cost, falling back to the purchase price for batches made without a bill of materials (as margins.batch_cost does)."""
+    return ExpressionWrapper(
+        F('current_stock') * Coalesce(NullIf('unit_cost', 0), 'product__purchase_price'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def ageing(group='product', older_than=None, today=None, limit=None):
+    """
+    Units in stock per age bucket (see bucket_labels), with their total, cost
+    value and oldest batch date, per product or per category. One grouped
+    query over the in-stock batches; oldest stock first.
+    """
+    today = today or timezone.localdate()
+    labels = bucket_labels()
+    buckets = {}
+    newer_than = None
+    for label, edge in zip(labels, AGE_EDGES + (None,)):
+        window = Q()
+        if edge is not None:
+            window &= Q(refurbished_date__gte=today - timedelta(days=edge))
+        if newer_than is not None:
+            window &= Q(refurbished_date__lt=newer_than)
+        buckets[label] = Coalesce(Sum('current_stock', filter=window), 0)
+        newer_than = today - timedelta(days=edge) if edge is not None else None
+
+    rows = (in_stock(older_than, today)
+            .values(*GROUPS[group])
+            .annotate(total=Sum('current_stock'), value=Sum(_stock_value()), oldest=Min('refurbished_date'), **{
+                f'age_{i}': expression for i, expression in enumerate(buckets.values())
+            })
+            .order_by('oldest', *GROUPS[group][:1]))
+    if limit:
+        rows = rows[:limit]
+
+    report = []
+    for row in rows:
+        row['buckets'] = [row.pop(f'age_{i}') for i in range(len(labels))]
+        row['age_days'] = (today - row['oldest']).days
+        report.append(row)
+    return report
+
+
+def fifo_batches(product_id, location_id=None, today=None):
+    """
+    A product's batches with stock left, oldest (lowest id) first, with their
+    age. With `location_id`, only the units held at that location. That is the
+    order generate_invoice takes stock in for a salesman based there, before
+    it falls back to the other locations.
+    """
+    today = today or timezone.localdate()
+    batches = DailyProduction.objects.filter(product_id=product_id, current_stock__gt=0)
+    if location_id:
+        batches = (batches.filter(location_stock__location_id=location_id, location_stock__quantity__gt=0)
+                   .annotate(available=F('location_stock__quantity')))
+    else:
+        batches = batches.annotate(available=F('current_stock'))
+    batches = batches.select_related('refurbished_product').order_by('id')
+    return [
+        {
+            'id': b.id,
+            'serial_number': b.serial_number or b.refurbished_product.serial_number,
+            'refurbished_date': b.refurbished_date,
+            'age_days': (today - b.refurbished_date).days,
+            'sale_price': float(b.sale_price),
+            'mrp': float(b.mrp),
+            'unit_cost': float(b.unit_cost),
+            'available_qty': b.available,
+        }
+        for b in batches
+    ]
@@ -0,0 +1,465 @@
+import random
+import string
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.duration import duration_microseconds
+
+from .models import (
+    Attendance, BatchStock, Category, Customer, DailyProduction, Inventory, PaymentTransaction, Product,
+    RefurbishedProduct, Role, SaleItem, SalesmanVisit, SalesOrder, SearchEntry, User,
+)
+
+
+# Every generated row can be told apart from real data by these markers.
+EMAIL_DOMAIN = 'synthetic.test'
+PRODUCT_MARKER = 'synthetic'
+PASSWORD = 'loadtest123'
+
+CITIES = [
+    # city, district, state, GST state code, pincode prefix, lat, lng
+    ('Bengaluru', 'Bengaluru Urban', 'Karnataka', '29', '560', 12.9716, 77.5946),
+    ('Mysuru', 'Mysuru', 'Karnataka', '29', '570', 12.2958, 76.6394),
+    ('Chennai', 'Chennai', 'Tamil Nadu', '33', '600', 13.0827, 80.2707),
+    ('Hyderabad', 'Hyderabad', 'Telangana', '36', '500', 17.3850, 78.4867),
+    ('Pune', 'Pune', 'Maharashtra', '27', '411', 18.5204, 73.8567),
+    ('Kochi', 'Ernakulam', 'Kerala', '32', '682', 9.9312, 76.2673),
+]
+SHOP_PREFIXES = ['Sri', 'Sree', 'New', 'Royal', 'Star', 'Galaxy', 'Metro', 'City', 'Smart', 'Digital', 'Balaji', 'Ganesh', 'Laxmi', 'Sai']
+SHOP_NAMES = ['Ram', 'Krishna', 'Vinayaka', 'Techno', 'Infotech', 'Computer', 'Mobile', 'Micro', 'Byte', 'Link', 'Care', 'World']
+SHOP_SUFFIXES = ['Electronics', 'Computers', 'Systems', 'Traders', 'Solutions', 'Enterprises', 'Infotech', 'Store']
+STREETS = ['MG Road', 'Main Road', 'Station Road', '1st Cross', '4th Main', 'Market Street', 'Temple Road', 'Ring Road']
+FIRST_NAMES = ['Arjun', 'Priya', 'Ravi', 'Anita', 'Suresh', 'Kavya', 'Manoj', 'Deepa', 'Vikram', 'Meera', 'Rahul', 'Lakshmi']
+LAST_NAMES = ['Kumar', 'Reddy', 'Nair', 'Rao', 'Sharma', 'Iyer', 'Patil', 'Shetty', 'Menon', 'Gowda']
+CATEGORY_NAMES = ['Business Laptops', 'Student Laptops', 'Gaming Laptops', 'Workstations', 'Ultrabooks', 'Components']
+BRANDS = ['Dell', 'Lenovo', 'HP', 'Apple', 'Asus', 'Acer']
+MODELS = ['Latitude', 'ThinkPad', 'EliteBook', 'MacBook', 'VivoBook', 'Aspire', 'Inspiron', 'IdeaPad', 'ProBook']
+
+
+def zipf_weights(n, s=1.1):
+    """Cumulative weights where item i is picked ~1/(i+1)^s as often: a few hot customers/products."""
+    return list(accumulate(1 / (i + 1) ** s for i in range(n)))
+
+
+def gstin(rng, state_code):
+    pan = ''.join(rng.choices(string.ascii_uppercase, k=5)) + f"{rng.randrange(10000):04d}" + rng.choice(string.ascii_uppercase)
+    return f"{state_code}{pan}1Z{rng.choice(string.digits + string.ascii_uppercase)}"
+
+
+@contextmanager
+def historic_timestamps(*fields):
+    """Let bulk_create keep the generated dates on auto_now/auto_now_add fields."""
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def exists():
+    return User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').exists()
+
+
+def flush():
+    """Delete everything a previous generate() created."""
+    from .search import indexing_paused
+
+    customers = Customer.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+    products = Product.objects.filter(description=PRODUCT_MARKER)
+    orders = SalesOrder.objects.filter(customer__in=customers)
+    # Without the per-row search receivers the big tables go in one DELETE each
+    # instead of one signal (and one index query) per row.
+    with indexing_paused(), transaction.atomic():
+        for entity, queryset in (('order', orders), ('customer', customers), ('product', products)):
+            SearchEntry.objects.filter(entity=entity, object_id__in=queryset.values('pk')).delete()
+        PaymentTransaction.objects.filter(order__in=orders).delete()
+        SaleItem.objects.filter(order__in=orders).delete()
+        SalesmanVisit.objects.filter(customer__in=customers).delete()
+        Attendance.objects.filter(user__email__endswith=f'@{EMAIL_DOMAIN}').delete()
+        customers.delete()  # cascades the orders
+        products.delete()  # cascades batches, stock and inventory
+        Category.objects.filter(name__in=CATEGORY_NAMES, product__isnull=True).delete()
+        User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+
+
+# Rows per unit of scale; generate() multiplies these and takes per-entity overrides.
+SIZES = {'salesmen': 10, 'customers': 500, 'products': 100, 'orders': 2000}
+MINIMUM_SIZES = {'salesmen': 2, 'customers': 10, 'products': 5, 'orders': 20}
+
+# Orders are generated and inserted this many at a time, which bounds memory.
+ORDER_CHUNK = 20000
+
+# Shop hours and how busy each one is: a late-morning and an early-evening peak.
+ORDER_HOURS = list(range(9, 21))
+ORDER_HOUR_WEIGHTS = list(accumulate([2, 6, 9, 8, 5, 4, 5, 7, 8, 6, 3, 1]))
+LINES_PER_ORDER = [1, 1, 1, 2, 2, 3, 4]
+QUANTITIES = [1, 1, 1, 2, 3, 5]
+ORDER_TYPES = ['location', 'location', 'telephone', 'email']
+PAYMENT_MODES = ['cash', 'upi', 'upi', 'bank_transfer', 'cheque']
+DELIVERY_STATUSES = ['processing', 'shipped', 'delivered']
+
+
+def _adapter(field):
+    kind = field.get_internal_type()
+    if kind == 'DateTimeField':
+        adapt = connection.ops.adapt_datetimefield_value
+        if connection.vendor == 'sqlite' and connection.timezone_name == 'UTC':
+            # SQLite stores naive UTC text; values already in UTC only need their tzinfo dropped.
+            return lambda value: str(value.replace(tzinfo=None)) if value is not None and value.tzinfo is dt_timezone.utc else adapt(value)
+        return adapt
+    if kind == 'DurationField' and not connection.features.has_native_duration_field:
+        return lambda value: None if value is None else duration_microseconds(value)
+    return None
+
+
+def bulk_insert(model, fields, rows, batch_size=10000):
+    """
+    INSERT plain tuples (values in `fields` order, primary key included) with
+    executemany. This skips model instances and per-value field preparation,
+    which is where bulk_create spends its time at this volume. Columns not
+    listed get their field default; no signals are sent. Returns the row count.
+    """
+    meta = model._meta
+    named = [meta.get_field(name) for name in fields]
+    rest = [f for f in meta.concrete_fields if f.name not in fields and not f.primary_key]
+    now = timezone.now()
+    tail = tuple(
+        f.get_db_prep_save(now if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False) else f.get_default(), connection)
+        for f in rest
+    )
+    adapters = [(i, adapt) for i, adapt in ((i, _adapter(f)) for i, f in enumerate(named)) if adapt]
+
+    def prepare(row):
+        if adapters:
+            row = list(row)
+            for i, adapt in adapters:
+                row[i] = adapt(row[i])
+        return (*row, *tail)
+
+    qn = connection.ops.quote_name
+    columns = [qn(f.column) for f in named + rest]
+    sql = f"INSERT INTO {qn(meta.db_table)} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), batch_size):
+            chunk = rows[i:i + batch_size]
+            if adapters or tail:
+                chunk = [prepare(row) for row in chunk]
+            cursor.executemany(sql, chunk)
+    return len(rows)
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+# Field types whose Python values the database drivers take as they are;
+# bulk_insert() adapts datetimes and durations, anything else goes through the field.
+_PLAIN_FIELDS = {
+    'AutoField', 'BigAutoField', 'BigIntegerField', 'BooleanField', 'CharField', 'DateField', 'DateTimeField',
+    'DecimalField', 'DurationField', 'FloatField', 'ForeignKey', 'IntegerField', 'OneToOneField',
+    'PositiveIntegerField', 'PositiveSmallIntegerField', 'SlugField', 'SmallIntegerField', 'TextField',
+}
+
+
+def insert_instances(model, objs):
+    """bulk_insert() for unsaved model instances: assigns their ids and writes every concrete field."""
+    next_id = _next_id(model)
+    for i, obj in enumerate(objs):
+        obj.pk = next_id + i
+    fields = model._meta.concrete_fields
+    for f in fields:
+        if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False):
+            for obj in objs:
+                if getattr(obj, f.attname) is None:
+                    f.pre_save(obj, add=True)
+
+    def value(obj, f):
+        if f.get_internal_type() in _PLAIN_FIELDS:
+            return getattr(obj, f.attname)
+        return f.get_db_prep_save(f.pre_save(obj, add=True), connection)
+
+    bulk_insert(model, [f.name for f in fields], [tuple(value(obj, f) for f in fields) for obj in objs])
+    return objs
+
+
+def _reset_sequences(*models):
+    """Move PostgreSQL sequences past the explicit ids bulk_insert wrote (a no-op on SQLite)."""
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+def generate(scale=1.0, seed=42, days=90, log=print, rebuild=True, **sizes):
+    """
+    Create a reproducible dataset: salesmen with customers, products with stock
+    batches, orders with items and payments, salesman visits and attendance.
+    Row counts are SIZES times `scale`, overridable per entity (orders=1_000_000).
+    Popularity is skewed (Zipf) across customers and products, orders cluster in
+    shop hours, avoid Sundays and grow towards the present. Returns the row
+    counts per table; with rebuild=False the derived indexes are left to
+    rebuild_derived().
+    """
+    unknown = set(sizes) - set(SIZES)
+    if unknown:
+        raise ValueError(f"Unknown sizes: {', '.join(sorted(unknown))}")
+    size = {name: sizes.get(name) or max(MINIMUM_SIZES[name], int(per_unit * scale)) for name, per_unit in SIZES.items()}
+
+    rng = random.Random(seed)
+    tz = timezone.get_current_timezone()
+    now = timezone.now()
+    start = now - timedelta(days=days)
+    counts = {}
+
+    password = make_password(PASSWORD)  # hashed once; every synthetic user shares it
+    admin_role, _ = Role.objects.get_or_create(name='Admin')  # Role.save() creates the RolePermissions row
+    salesman_role, _ = Role.objects.get_or_create(name='Salesman')
+    counts['roles'] = 2
+
+    with transaction.atomic():
+        # --- users ---------------------------------------------------------
+        users = [User(
+            role=admin_role, username='syn_admin', password=password, first_name='Synthetic',
+            last_name='Admin', email=f'admin@{EMAIL_DOMAIN}', phone_number='7000000000',
+        )]
+        for i in range(size['salesmen']):
+            users.append(User(
+                role=salesman_role, username=f'syn_salesman_{i}', password=password,
+                first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                email=f'salesman{i}@{EMAIL_DOMAIN}', phone_number=f'71{i:08d}',
+                city=CITIES[i % len(CITIES)][0],
+            ))
+        users = insert_instances(User, users)
+        salesmen = users[1:]
+        counts['users'] = len(users)
+
+        # --- catalogue and stock -------------------------------------------
+        categories = {name: Category.objects.get_or_create(name=name)[0] for name in CATEGORY_NAMES}
+        products = []
+        for i in range(size['products']):
+            brand = rng.choice(BRANDS)
+            price = Decimal(rng.randrange(12000, 90000, 500))
+            products.append(Product(
+                name=f"{brand} {rng.choice(MODELS)} {rng.randrange(3, 15)}{rng.choice('0579')}0 #{i}",
+                category=categories[rng.choice(CATEGORY_NAMES[:-1])],
+                product_type='REFURBISHED', description=PRODUCT_MARKER, hsn_code='84713010',
+                gstpercentage=Decimal('18.00'), brand_name=brand, model_name=rng.choice(MODELS),
+                purchase_price=(price * Decimal('0.7')).quantize(Decimal('1')), sale_price=price,
+            ))
+        products = insert_instances(Product, products)
+        counts['products'] = len(products)
+
+        batches, productions, inventories = [], [], []
+        for p in products:
+            total = 0
+            for b in range(3):
+                qty = rng.randrange(200, 2000)
+                total += qty
+                batches.append(RefurbishedProduct(
+                    product=p, serial_number=f'SYN{seed}-{p.id}-{b}', produced_quantity=qty,
+                    production_date=(start + timedelta(days=b * days // 3)).date(), created_by=users[0],
+                ))
+            inventories.append(Inventory(product=p, opening_stock=0, stock_in=total, current_stock=total))
+        batches = insert_instances(RefurbishedProduct, batches)
+        from .locations import default_location
+
+        store_room = default_location()
+        for batch in batches:
+            productions.append(DailyProduction(
+                refurbished_product=batch, product=batch.product, refurbished_date=batch.production_date,
+                stock_in=batch.produced_quantity, stock_out=0, current_stock=batch.produced_quantity,
+                sale_price=batch.product.sale_price, mrp=(batch.product.sale_price * Decimal('1.2')).quantize(Decimal('1')),
+                serial_number=batch.serial_number, location=store_room,
+            ))
+        productions = insert_instances(DailyProduction, productions)
+        insert_instances(BatchStock, [
+            BatchStock(batch=p, location=store_room, product=p.product, quantity=p.current_stock) for p in productions
+        ])
+        insert_instances(Inventory, inventories)
+        counts['production_batches'] = len(batches)
+        counts['daily_productions'] = len(productions)
+        counts['inventory'] = len(inventories)
+
+        # --- customers -----------------------------------------------------
+        from .customer_dedupe import set_customer_keys
+
+        customers = []
+        for i in range(size['customers']):
+            city, district, state, state_code, pin, lat, lng = rng.choice(CITIES)
+            c = Customer(
+                user=salesmen[i % len(salesmen)],
+                customer_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                full_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                email=f'customer{i}@{EMAIL_DOMAIN}', phone_number=f'80{i:08d}',
+                shop_type=rng.choice(['GT', 'GT', 'GT', 'SMT', 'MT']),
+                gst_number=gstin(rng, state_code) if rng.random() < 0.8 else None,
+                shop_name=f"{rng.choice(SHOP_PREFIXES)} {rng.choice(SHOP_NAMES)} {rng.choice(SHOP_SUFFIXES)}",
+                shop_address=f"{rng.randrange(1, 400)}, {rng.choice(STREETS)}, {city}",
+                shop_city=city, shop_district=district, shop_state=state,
+                shop_pincode=f"{pin}{rng.randrange(1, 100):03d}",
+                discount=Decimal(rng.choice([0, 0, 0, 2, 5])),
+                latitude=f"{lat + rng.uniform(-0.08, 0.08):.6f}", longitude=f"{lng + rng.uniform(-0.08, 0.08):.6f}",
+            )
+            c.is_gst_registered = bool(c.gst_number)
+            set_customer_keys(c)
+            customers.append(c)
+        customers = insert_instances(Customer, customers)
+        counts['customers'] = len(customers)
+
+        # --- orders, items, payments, visits ---------------------------------
+        # From here on rows are plain tuples with explicit ids, written by bulk_insert().
+        shoppers = [(c.id, c.user_id, c.discount, Decimal(c.latitude), Decimal(c.longitude)) for c in customers]
+        catalogue = [(p.id, p.sale_price) for p in products]
+        customer_weights = zipf_weights(len(shoppers))
+        product_weights = zipf_weights(len(catalogue))
+
+        # Busier towards the present and quiet on Sundays.
+        # Kept in UTC so the SQLite adapter doesn't convert every timestamp.
+        day_starts = [
+            datetime.combine((start + timedelta(days=d)).date(), time(0), tzinfo=tz).astimezone(dt_timezone.utc)
+            for d in range(days + 1)
+        ]
+        day_weights = list(accumulate(
+            (0.5 + d / days) * (0.15 if day.weekday() == 6 else 1.0) for d, day in enumerate(day_starts)
+        ))
+
+        lines_cache = {}
+
+        def line_values(product, qty, discount_pct):
+            key = (product[0], qty, discount_pct)
+            if key not in lines_cache:
+                price = product[1]
+                sub_total = price * qty
+                discount = (sub_total * discount_pct / 100).quantize(Decimal('0.01'))
+                taxable = sub_total - discount
+                gst = (taxable * Decimal('0.18')).quantize(Decimal('0.01'))
+                lines_cache[key] = (qty, price, sub_total, discount_pct, discount, taxable, Decimal('18.00'), gst, taxable + gst)
+            return lines_cache[key]
+
+        order_id, item_id = _next_id(SalesOrder), _next_id(SaleItem)
+        payment_id, visit_id = _next_id(PaymentTransaction), _next_id(SalesmanVisit)
+        counts.update(orders=0, sale_items=0, payments=0, visits=0)
+        half, cent, zero = Decimal('0.5'), Decimal('0.01'), Decimal('0')
+        week = timedelta(days=7)
+
+        # random() plus index/bisect lookups: rng.choice()/choices() cost several times more per call.
+        rand = rng.random
+
+        def pick(seq):
+            return seq[int(rand() * len(seq))]
+
+        def weighted(seq, cum_weights):
+            return seq[bisect(cum_weights, rand() * cum_weights[-1], 0, len(seq) - 1)]
+
+        for chunk_start in range(0, size['orders'], ORDER_CHUNK):
+            orders, items, payments, visits = [], [], [], []
+            for _ in range(min(ORDER_CHUNK, size['orders'] - chunk_start)):
+                customer_id, salesman_id, discount_pct, lat, lng = weighted(shoppers, customer_weights)
+                hour = weighted(ORDER_HOURS, ORDER_HOUR_WEIGHTS)
+                order_date = min(now, weighted(day_starts, day_weights) + timedelta(seconds=hour * 3600 + int(rand() * 3600)))
+                subtotal = discount = taxable = tax = total = zero
+                for product in {weighted(catalogue, product_weights) for _ in range(pick(LINES_PER_ORDER))}:
+                    values = line_values(product, pick(QUANTITIES), discount_pct)
+                    items.append((item_id, order_id, product[0], *values))
+                    item_id += 1
+                    subtotal += values[2]
+                    discount += values[4]
+                    taxable += values[5]
+                    tax += values[7]
+                    total += values[8]
+
+                roll = rand()
+                paid = total if roll < 0.6 else (total * half).quantize(cent) if roll < 0.85 else zero
+                if paid:
+                    payments.append((
+                        payment_id, order_id, salesman_id, min(now, order_date + timedelta(days=int(rand() * 15))),
+                        paid, pick(PAYMENT_MODES),
+                    ))
+                    payment_id += 1
+                order_type = pick(ORDER_TYPES)
+                orders.append((
+                    order_id, customer_id, salesman_id, order_date, order_type,
+                    subtotal, discount, taxable, tax, total, paid, total - paid,
+                    'paid' if paid >= total else 'partial' if paid else 'pending',
+                    'delivered' if now - order_date > week else pick(DELIVERY_STATUSES),
+                ))
+                if order_type == 'location':
+                    visits.append((
+                        visit_id, salesman_id, customer_id, order_date - timedelta(seconds=300 + int(rand() * 2100)),
+                        order_date + timedelta(seconds=120 + int(rand() * 1080)), lat, lng, False,
+                    ))
+                    visit_id += 1
+                    if rand() < 0.33:  # a visit that did not end in an order
+                        visit_start = min(now, weighted(day_starts, day_weights) + timedelta(seconds=9 * 3600 + int(rand() * 36000)))
+                        visits.append((
+                            visit_id, salesman_id, customer_id, visit_start,
+                            min(now, visit_start + timedelta(seconds=300 + int(rand() * 2400))), lat, lng, False,
+                        ))
+                        visit_id += 1
+                order_id += 1
+
+            counts['orders'] += bulk_insert(SalesOrder, [
+                'id', 'customer', 'created_by', 'order_date', 'order_type', 'subtotal', 'discount_amount',
+                'taxable_amount', 'tax_amount', 'grand_total', 'total_paid', 'balance_due', 'payment_status', 'delivery_status',
+            ], orders)
+            counts['sale_items'] += bulk_insert(SaleItem, [
+                'id', 'order', 'product', 'quantity', 'price', 'sub_total', 'discount_percentage', 'discount_amount',
+                'taxable_amount', 'gst_percentage', 'gst_amount', 'total',
+            ], items)
+            counts['payments'] += bulk_insert(PaymentTransaction, [
+                'id', 'order', 'received_by', 'payment_date', 'amount_paid', 'payment_mode',
+            ], payments)
+            counts['visits'] += bulk_insert(SalesmanVisit, [
+                'id', 'salesman', 'customer', 'check_in_time', 'check_out_time', 'latitude', 'longitude', 'is_active',
+            ], visits)
+            log(f"  {counts['orders']}/{size['orders']} orders")
+
+        # --- attendance ----------------------------------------------------
+        attendance, attendance_id = [], _next_id(Attendance)
+        for salesman in salesmen:
+            for d in range(days):
+                day = (start + timedelta(days=d)).date()
+                if day.weekday() == 6 or rng.random() < 0.1:
+                    continue  # Sundays and leave
+                check_in = datetime.combine(day, time(9), tzinfo=tz) + timedelta(minutes=rng.randrange(0, 90))
+                check_out = check_in + timedelta(minutes=rng.randrange(7 * 60, 10 * 60))
+                attendance.append((attendance_id, salesman.id, day, check_in, check_out, check_out - check_in))
+                attendance_id += 1
+        counts['attendance'] = bulk_insert(Attendance, ['id', 'user', 'date', 'check_in', 'check_out', 'working_hours'], attendance)
+
+        _reset_sequences(
+            User, Product, RefurbishedProduct, DailyProduction, BatchStock, Inventory, Customer,
+            SalesOrder, SaleItem, PaymentTransaction, SalesmanVisit, Attendance,
+        )
+
+    if rebuild:
+        rebuild_derived(log)
+    return counts
+
+
+def rebuild_derived(log=print):
+    """bulk inserts skip save() and signals, so derived tables are rebuilt once afterwards."""
+    from .autocomplete import rebuild_keys as rebuild_autocomplete_keys
+    from .customer_dedupe import rebuild_index as rebuild_customer_index
+    from .fragments import bump as expire_dropdowns
+    from .route_analytics import refresh_summaries
+    from .search import rebuild_index as rebuild_search_index
+    from .timesheets import rebuild_timesheets
+
+    log("Rebuilding duplicate-detection, search, autocomplete, route and timesheet indexes...")
+    rebuild_customer_index()
+    rebuild_search_index()
+    rebuild_autocomplete_keys()
+    refresh_summaries(full=True)
+    rebuild_timesheets()
+    expire_dropdowns()
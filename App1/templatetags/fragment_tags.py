@@ -0,0 +1,20 @@
+from django import template
+
+from App1 import fragments
+
+register = template.Library()
+
+
+@register.simple_tag
+def fragment_version(name=None):
+    """
+    Version to pass to {% cache %} so the fragment is dropped when the
+    templates change or, with a name, when that model's rows change.
+    Usage: {% fragment_version 'product' as v %}{% cache timeout product_options v %}
+    """
+    return fragments.version(name)
+
+
+@register.simple_tag
+def fragment_timeout(kind):
+    return fragments.SIDEBAR_TIMEOUT if kind == 'sidebar' else fragments.DROPDOWN_TIMEOUT
@@ -0,0 +1,14 @@
+from django import template
+
+from App1.images import rendition_url
+
+register = template.Library()
+
+
+@register.filter
+def rendition(fieldfile, width):
+    """
+    Smallest stored rendition that is at least `width` px wide.
+    Usage: <img src="{{ product.product_picture|rendition:160 }}">
+    """
+    return rendition_url(fieldfile, int(width))
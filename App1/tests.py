@@ -1,3 +1,1296 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, identify_hasher
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.db.models import F, Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from . import (
+    customer_dedupe, goods_receipt, images, login_guard, margins, payables, permissions, product_ranking,
+    query_metrics, reorder_planner, route_analytics, sales_trends, stock_ageing, synthetic, timesheets,
+)
+from .locations import allocate_order, available, default_location, transfer
+from .models import (
+    Attendance, AttendanceSummary, BatchStock, BillOfMaterial, Category, Component, ComponentReorderPlan,
+    ComponentUsage, Customer, DailyProduction, GoodsReceipt, Inventory, Invoice, Location, LoginAttempt, MarginFact,
+    MediaBlob, Product, ProductSalesRank, PurchaseItem, PurchaseOrder, RefurbishedProduct, Role, RolePermissions,
+    SaleItem, SaleItemBatch, SalesmanVisit, SalesOrder, SearchEntry, StockMovement, StockTransfer, User, Vendor,
+    VendorBalance, VendorPayment,
+)
+from .query_metrics import QUERY_COUNT_HEADER, assert_view_budget
+from .sales_trends import trend
+from .stock_ageing import fifo_batches
+from .work_orders import produce
+
+
+# Tests never touch the shared file cache of a running server.
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'oms-tests'}}
+
+
+def quiet(*args, **kwargs):
+    pass
+
+
+def log_in(client, username):
+    """Start a session for `username` without going through the password hasher."""
+    session = client.session
+    session['current_user'] = username
+    session.save()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryBudgetTests(TestCase):
+    """
+    The hot pages stay within QUERY_BUDGETS. Each page is requested once to
+    warm the fragment and permission caches, then measured, so a budget
+    regression (usually a new N+1) fails here instead of in production.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.generate(scale=0.05, days=30, log=quiet)
+        cls.customer = Customer.objects.filter(email__endswith=f'@{synthetic.EMAIL_DOMAIN}').first()
+        cls.product = Product.objects.filter(description=synthetic.PRODUCT_MARKER).first()
+        cls.order = SalesOrder.objects.filter(invoices__isnull=True).first()
+        cls.salesman = User.objects.filter(role__name='Salesman').first()
+        # A salesman can only open add_order while checked in at a shop.
+        SalesmanVisit.objects.create(
+            salesman=cls.salesman, customer=Customer.objects.filter(user=cls.salesman).first(),
+            check_in_time=timezone.now(), is_active=True,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertWithinBudget(self, path):
+        self.client.get(path)
+        response = assert_view_budget(self.client, path)
+        self.assertEqual(response.status_code, 200, path)
+
+    def test_admin_pages(self):
+        log_in(self.client, 'syn_admin')
+        for path in [
+            '/dashboard/',
+            '/dashboard/metrics/',
+            '/add/order/',
+            '/inventory/',
+            '/purchase/order/list/',
+            f'/customer/view/{self.customer.id}/',
+            f'/product/view/{self.product.id}/',
+            '/autocomplete/customers/?q=s',
+            '/autocomplete/products/?q=d',
+        ]:
+            with self.subTest(path=path):
+                self.assertWithinBudget(path)
+
+    def test_salesman_pages(self):
+        log_in(self.client, self.salesman.username)
+        for path in ['/dashboard/', '/dashboard/metrics/', '/add/order/', '/attendance/', '/autocomplete/customers/?q=s']:
+            with self.subTest(path=path):
+                self.assertWithinBudget(path)
+
+    def test_invoice_and_receipt(self):
+        log_in(self.client, 'syn_admin')
+        # The first request allocates stock and creates the invoice; that is the path under budget.
+        response = assert_view_budget(self.client, f'/generate_invoice/{self.order.id}/')
+        self.assertIn(response.status_code, (200, 302))
+        self.assertWithinBudget(f'/receipt/{self.order.id}/')
+
+    def test_login(self):
+        credentials = {'username': 'syn_admin', 'password': synthetic.PASSWORD}
+        for attempt in ('first of the day', 'again'):
+            with self.subTest(attempt=attempt):
+                self.client.logout()
+                response = assert_view_budget(self.client, '/', method='post', data=credentials)
+                self.assertRedirects(response, '/dashboard/', fetch_redirect_response=False)
+        response = assert_view_budget(self.client, '/', method='post', data={**credentials, 'password': 'wrong'})
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+
+    def test_metrics_headers_follow_the_setting(self):
+        log_in(self.client, 'syn_admin')
+        with mock.patch.object(query_metrics, 'SEND_HEADERS', False):
+            response = self.client.get('/inventory/')
+        self.assertNotIn(QUERY_COUNT_HEADER, response)
+        self.assertNotIn('Server-Timing', response)
+        with mock.patch.object(query_metrics, 'SEND_HEADERS', True):
+            response = self.client.get('/inventory/')
+        self.assertIn(QUERY_COUNT_HEADER, response)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DashboardMetricsAccessTests(TestCase):
+    """Company-wide figures are for admins only; every other role (or none) is refused."""
+
+    def setUp(self):
+        cache.clear()
+
+    def user(self, username, role_name=None):
+        role = Role.objects.get_or_create(name=role_name)[0] if role_name else None
+        return User.objects.create(role=role, username=username, password='pbkdf2_unused', first_name=username,
+                                   email=f'{username}@example.test', phone_number=username)
+
+    def metrics(self, user):
+        log_in(self.client, user.username)
+        return self.client.get('/dashboard/metrics/')
+
+    def test_admin_gets_company_metrics(self):
+        response = self.metrics(self.user('boss', 'Admin'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('total_revenue', response.json())
+
+    def test_other_roles_are_refused(self):
+        self.assertEqual(self.metrics(self.user('keeper', 'Storekeeper')).status_code, 403)  # has dashboard_v
+        self.assertEqual(self.metrics(self.user('orphan')).status_code, 403)  # role deleted
+        self.client.logout()
+        self.assertEqual(self.client.get('/dashboard/metrics/').status_code, 401)
+
+
+class PayablesTests(TestCase):
+    """pay()/allocate() move money correctly and the running VendorBalance never drifts from rebuild_balances()."""
+
+    def setUp(self):
+        self.vendor = Vendor.objects.create(name='Acme Components')
+        self.orders = [
+            PurchaseOrder.objects.create(vendor=self.vendor, total_amount=Decimal(total), balance_due=Decimal(total))
+            for total in ('100.00', '250.00', '400.00')
+        ]
+
+    def reload(self, order):
+        return PurchaseOrder.objects.get(pk=order.pk)
+
+    def assertBalanceMatchesRebuild(self):
+        fields = ('total_purchased', 'total_paid', 'outstanding', 'open_orders')
+        running = VendorBalance.objects.filter(vendor=self.vendor).values(*fields).get()
+        payables.rebuild_balances()
+        self.assertEqual(running, VendorBalance.objects.filter(vendor=self.vendor).values(*fields).get())
+
+    def test_partial_payment(self):
+        payables.pay(self.vendor, {self.orders[1].id: '100.00'})
+        order = self.reload(self.orders[1])
+        self.assertEqual((order.total_paid, order.balance_due, order.payment_status), (Decimal('100.00'), Decimal('150.00'), 'partial'))
+        balance = VendorBalance.objects.get(vendor=self.vendor)
+        self.assertEqual((balance.outstanding, balance.open_orders), (Decimal('650.00'), 3))
+        self.assertBalanceMatchesRebuild()
+
+    def test_lump_sum_settles_oldest_orders_first(self):
+        allocations = payables.allocate(self.vendor, '300.00')
+        self.assertEqual(allocations, {self.orders[0].id: Decimal('100.00'), self.orders[1].id: Decimal('200.00')})
+
+        run = payables.pay(self.vendor, allocations, reference='UTR123')
+        self.assertEqual(run.amount, Decimal('300.00'))
+        self.assertEqual(VendorPayment.objects.filter(run=run).count(), 2)
+        self.assertEqual(
+            [self.reload(o).payment_status for o in self.orders], ['paid', 'partial', 'pending'],
+        )
+        self.assertEqual(VendorBalance.objects.get(vendor=self.vendor).open_orders, 2)
+        self.assertBalanceMatchesRebuild()
+
+    def test_overpayment_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            payables.allocate(self.vendor, '750.01')
+        with self.assertRaises(ValidationError):
+            payables.pay(self.vendor, {self.orders[0].id: '60.00', self.orders[1].id: '250.01'})
+        # Nothing from the rejected run was kept
+        self.assertFalse(VendorPayment.objects.exists())
+        self.assertEqual(self.reload(self.orders[0]).total_paid, Decimal('0.00'))
+        self.assertBalanceMatchesRebuild()
+
+    def test_other_vendors_orders_are_rejected(self):
+        other = Vendor.objects.create(name='Other Vendor')
+        with self.assertRaises(ValidationError):
+            payables.pay(other, {self.orders[0].id: '10.00'})
+
+    def test_balance_follows_create_pay_and_delete(self):
+        self.assertBalanceMatchesRebuild()
+        payables.pay(self.vendor, payables.allocate(self.vendor, '350.00'))
+        self.assertBalanceMatchesRebuild()
+        PurchaseOrder.objects.create(vendor=self.vendor, total_amount=Decimal('80.00'), total_paid=Decimal('30.00'),
+                                     balance_due=Decimal('50.00'), payment_status='partial')
+        self.assertBalanceMatchesRebuild()
+        self.reload(self.orders[0]).delete()  # fully paid
+        self.reload(self.orders[2]).delete()  # still open
+        self.assertBalanceMatchesRebuild()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StoreLocationTests(TestCase):
+    """
+    Transfers and invoice allocation move per-location stock without ever
+    letting it drift from each batch's current_stock.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name='ThinkPad T480', category=Category.objects.create(name='Laptops'),
+                                              purchase_price=Decimal('100.00'))
+        self.main = default_location()
+        self.annex = Location.objects.create(name='Annex')
+        self.first = produce(self.product, 5, 500, 600)
+        self.second = produce(self.product, 4, 500, 600, location=self.annex)
+        self.third = produce(self.product, 3, 500, 600)
+
+    def held(self, location):
+        return available(location.id, [self.product.id]).get(self.product.id, 0)
+
+    def assertStockConsistent(self):
+        for batch in DailyProduction.objects.filter(product=self.product):
+            located = BatchStock.objects.filter(batch=batch).aggregate(units=Sum('quantity'))['units'] or 0
+            self.assertEqual(located, batch.current_stock, f"batch {batch.id}")
+
+    def test_transfer_moves_oldest_batches_first(self):
+        move = transfer(self.main, self.annex, self.product, 6, remarks='restock annex')
+        self.assertEqual(
+            sorted(move.lines.values_list('batch_id', 'quantity')), [(self.first.id, 5), (self.third.id, 1)],
+        )
+        self.assertEqual((self.held(self.main), self.held(self.annex)), (2, 10))
+        self.assertStockConsistent()
+
+    def test_short_or_invalid_transfer_changes_nothing(self):
+        for source, target, quantity in [(self.main, self.annex, 9), (self.main, self.main, 1), (self.main, self.annex, 0)]:
+            with self.subTest(quantity=quantity), self.assertRaises(ValidationError):
+                transfer(source, target, self.product, quantity)
+        self.assertFalse(StockTransfer.objects.exists())
+        self.assertEqual((self.held(self.main), self.held(self.annex)), (8, 4))
+
+    def test_allocation_serves_home_location_first(self):
+        item = SaleItem(product=self.product, quantity=6)
+        allocations = allocate_order([item], home_location_id=self.annex.id)
+        self.assertEqual(
+            [(a.batch_id, a.location_id, a.quantity) for a in allocations],
+            [(self.second.id, self.annex.id, 4), (self.first.id, self.main.id, 2)],
+        )
+        self.assertEqual(allocations[0].unit_cost, Decimal('100.00'))  # no bill of materials: purchase price
+        self.assertEqual((self.held(self.main), self.held(self.annex)), (6, 0))
+        self.assertStockConsistent()
+
+    def test_allocation_without_home_is_fifo(self):
+        allocations = allocate_order([SaleItem(product=self.product, quantity=6)])
+        self.assertEqual([(a.batch_id, a.quantity) for a in allocations], [(self.first.id, 5), (self.second.id, 1)])
+        self.assertStockConsistent()
+
+    def test_allocation_short_of_stock_raises(self):
+        with self.assertRaises(ValueError):
+            allocate_order([SaleItem(product=self.product, quantity=13)])
+
+    def test_fifo_batches_at_a_location(self):
+        self.assertEqual([(b['id'], b['available_qty']) for b in fifo_batches(self.product.id)],
+                         [(self.first.id, 5), (self.second.id, 4), (self.third.id, 3)])
+        self.assertEqual([(b['id'], b['available_qty']) for b in fifo_batches(self.product.id, self.annex.id)],
+                         [(self.second.id, 4)])
+
+    def test_failed_production_edit_rolls_back_location_stock(self):
+        admin = User.objects.create(role=Role.objects.create(name='Admin'), username='boss', password='pbkdf2_unused',
+                                    first_name='Boss', last_name='Admin', email='boss@example.test', phone_number='boss')
+        log_in(self.client, admin.username)
+        with mock.patch.object(Inventory, 'update_stock', side_effect=IntegrityError('CHECK constraint failed')):
+            self.client.post(f'/production/edit/{self.first.id}/', {
+                'product': self.product.id, 'stock_in': 8, 'serial_number': self.first.serial_number or '',
+                'refurbished_date': self.first.refurbished_date, 'mrp': 600, 'sale_price': 500, 'weight': 1,
+            })
+        self.assertEqual(BatchStock.objects.get(batch=self.first).quantity, 5)
+        self.assertEqual(DailyProduction.objects.get(pk=self.first.pk).stock_in, 5)
+        self.assertStockConsistent()
+
+
+class RouteSummaryTests(SimpleTestCase):
+    """Distances, dwell time and order attribution of one salesman day."""
+
+    def visit(self, id, minute, lat, lng, out_after=None):
+        check_in = datetime(2026, 3, 2, 10, 0, tzinfo=dt_timezone.utc) + timedelta(minutes=minute)
+        return {
+            'id': id, 'customer_id': id, 'customer__shop_name': f'Shop {id}', 'check_in_time': check_in,
+            'check_out_time': check_in + timedelta(minutes=out_after) if out_after is not None else None,
+            'latitude': lat, 'longitude': lng,
+        }
+
+    def test_haversine_legs(self):
+        # Bengaluru -> Mysuru is ~128 km as the crow flies; a missing point zeroes both of its legs
+        legs = route_analytics.haversine_legs([12.9716, 12.2958, None, 12.2958], [77.5946, 76.6394, None, 76.6394])
+        self.assertEqual(legs[0], 0.0)
+        self.assertAlmostEqual(legs[1], 128.0, delta=2)
+        self.assertEqual(legs[2:], [0.0, 0.0])
+        self.assertEqual(route_analytics.haversine_legs([12.9716, 12.9716], [77.5946, 77.5946]), [0.0, 0.0])
+
+    def test_build_day_summary(self):
+        visits = [self.visit(1, 0, 12.9716, 77.5946, out_after=30), self.visit(2, 60, 12.2958, 76.6394)]
+        start = visits[0]['check_in_time']
+        orders = [
+            (start - timedelta(minutes=5), Decimal('50.00')),     # before the first check-in: no visit
+            (start + timedelta(minutes=10), Decimal('100.00')),
+            (start + timedelta(minutes=90), Decimal('250.00')),
+        ]
+        summary = route_analytics.build_day_summary(visits, orders)
+        self.assertEqual((summary['visit_count'], summary['open_visits'], summary['orders_count']), (2, 1, 3))
+        self.assertEqual(summary['orders_total'], Decimal('400.00'))
+        self.assertEqual(summary['dwell_time'], timedelta(minutes=30))
+        self.assertAlmostEqual(float(summary['distance_km']), 128.0, delta=2)
+        self.assertEqual([(r['visit_id'], r['orders'], r['dwell_seconds']) for r in summary['route']],
+                         [(1, 1, 1800), (2, 1, None)])
+
+    def test_empty_day(self):
+        summary = route_analytics.build_day_summary([], [])
+        self.assertEqual((summary['visit_count'], summary['distance_km'], summary['route']), (0, Decimal('0.0'), []))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CustomerDedupeTests(TestCase):
+    """The normalized keys and trigram index catch the same shop typed two different ways."""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create(role=Role.objects.create(name='Admin'), username='clerk', password='pbkdf2_unused',
+                            first_name='Desk', last_name='Clerk', email='clerk@example.test', phone_number='clerk')
+        log_in(self.client, 'clerk')
+        self.shop = Customer.objects.create(
+            shop_name='Sri Ram Electronics Pvt. Ltd.', shop_address='12, M.G. Rd, Opp. Bus Stand',
+            shop_city='Bengaluru', shop_district='Bangalore Urban', shop_pincode='560001', shop_state='Karnataka',
+            gst_number='29abcde1234f1z5',
+        )
+
+    def check(self, **body):
+        response = self.client.post('/check_customer_exists/', json.dumps(body), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_normalizers(self):
+        self.assertEqual(customer_dedupe.normalize_name('Ms. Sri Ram Electronics Pvt Ltd'), 'sriramelectronics')
+        self.assertEqual(customer_dedupe.normalize_name('Sriram  Electronics'), 'sriramelectronics')
+        self.assertEqual(customer_dedupe.normalize_name('A & B Stores'), 'ab')
+        self.assertEqual(customer_dedupe.normalize_address('12, M.G. Rd, Opp. Bus Stand'), '12 m g road opposite bus stand')
+        self.assertEqual(customer_dedupe.normalize_gst(' 29abcde-1234 f1z5 '), '29ABCDE1234F1Z5')
+        self.assertEqual(customer_dedupe.normalize_gst(None), '')
+
+    def test_save_sets_keys_and_trigrams(self):
+        self.assertEqual((self.shop.name_key, self.shop.gst_key), ('sriramelectronics', '29ABCDE1234F1Z5'))
+        self.assertEqual(
+            set(self.shop.name_trigrams.values_list('gram', flat=True)), customer_dedupe.trigrams('sriramelectronics'),
+        )
+
+    def test_exact_matches(self):
+        self.assertTrue(self.check(gst_number='29ABCDE1234F1Z5')['exists'])
+        self.assertFalse(self.check(shop_name='Sriram Electronics', shop_address='12 MG Road opposite bus stand')['exists'])
+        self.assertTrue(self.check(shop_name='sri ram electronics', shop_address='12, M.G. Road, Opp Bus Stand')['exists'])
+
+    def test_near_duplicates(self):
+        result = self.check(shop_name='Sree Ram Electronics', shop_address='12 MG Road')
+        self.assertFalse(result['exists'])
+        self.assertEqual([d['id'] for d in result['duplicates']], [self.shop.id])
+        self.assertGreaterEqual(result['duplicates'][0]['score'], customer_dedupe.DEFAULT_THRESHOLD)
+
+        self.assertEqual(self.check(gst_number='29abcde1234f1z5')['duplicates'][0]['score'], 1.0)
+        self.assertEqual(self.check(shop_name='Kaveri Mobiles', shop_address='Jayanagar')['duplicates'], [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class GlobalSearchTests(TestCase):
+    """The search index follows every save/delete, and each role only finds what it may open."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = self.user('owner', 'Admin')
+        self.salesman = self.user('ravi', 'Salesman')
+        self.other = self.user('kiran', 'Salesman')
+        self.mine = self.shop('Sri Ram Electronics', self.salesman)
+        self.theirs = self.shop('Sri Krishna Electronics', self.other)
+        self.product = Product.objects.create(name='Latitude 5490', brand_name='Dell', category=Category.objects.create(name='Laptops'))
+        self.vendor = Vendor.objects.create(name='Sri Sai Traders', city='Hubli')
+        self.order = SalesOrder.objects.create(customer=self.mine, created_by=self.salesman)
+
+    def user(self, username, role_name):
+        return User.objects.create(role=Role.objects.get_or_create(name=role_name)[0], username=username, password='pbkdf2_unused',
+                                   first_name=username, last_name='Test', email=f'{username}@example.test', phone_number=username)
+
+    def shop(self, name, salesman):
+        return Customer.objects.create(user=salesman, shop_name=name, shop_address='MG Road', shop_city='Hubli',
+                                       shop_district='Dharwad', shop_pincode='580020', shop_state='Karnataka')
+
+    def search(self, user, q):
+        log_in(self.client, user.username)
+        response = self.client.get('/search/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return {(r['type'], r['id']): r for r in response.json()['results']}
+
+    def test_prefix_tokens_across_entities(self):
+        self.assertEqual(set(self.search(self.admin, 'sri ele')), {
+            ('customer', self.mine.id), ('customer', self.theirs.id), ('order', self.order.id),
+        })
+        self.assertEqual(set(self.search(self.admin, 'sri')), {
+            ('customer', self.mine.id), ('customer', self.theirs.id), ('order', self.order.id), ('vendor', self.vendor.id),
+        })
+        self.assertEqual(set(self.search(self.admin, 'dell lat')), {('product', self.product.id)})
+        self.assertEqual(self.search(self.admin, '!!'), {})
+
+    def test_salesman_only_finds_own_customers_and_orders(self):
+        self.assertEqual(set(self.search(self.salesman, 'sri')), {('customer', self.mine.id), ('order', self.order.id)})
+        self.assertEqual(set(self.search(self.other, 'sri')), {('customer', self.theirs.id)})
+        self.assertEqual(self.search(self.salesman, 'latitude'), {})  # no products_v by default
+
+    def test_index_follows_updates_and_deletes(self):
+        self.mine.shop_name = 'Ganesh Mobiles'
+        self.mine.save()
+        self.assertNotIn(('customer', self.mine.id), self.search(self.admin, 'ram'))
+        self.assertIn(('customer', self.mine.id), self.search(self.admin, 'ganesh'))
+        self.assertIn(('order', self.order.id), self.search(self.admin, 'ganesh'))  # order documents carry the shop name
+
+        self.vendor.delete()
+        self.assertEqual(self.search(self.admin, 'traders'), {})
+        self.assertFalse(SearchEntry.objects.filter(entity='vendor').exists())
+
+    def test_order_hits_open_the_receipt_once_invoiced(self):
+        url = lambda: self.search(self.admin, f'ORD{self.order.id}')[('order', self.order.id)]['url']
+        self.assertEqual(url(), f'/order/#order-{self.order.id}')
+        Invoice.objects.create(order=self.order, invoice_number=f'INV001-ORD{self.order.id}')
+        self.assertEqual(url(), f'/receipt/{self.order.id}/')
+
+
+def use_temp_media(test):
+    """Point MEDIA_ROOT at a throwaway directory for the rest of `test`."""
+    media_root = tempfile.mkdtemp(prefix='oms-media-')
+    test.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    override = test.settings(MEDIA_ROOT=media_root)
+    override.enable()
+    test.addCleanup(override.disable)
+    return default_storage
+
+
+def jpeg_upload(size=(2400, 1200), color='navy', orientation=None, name='photo.jpg'):
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x0110] = 'Test Camera'  # Model
+    if orientation:
+        exif[0x0112] = orientation
+    Image.new('RGB', size, color).save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImagePipelineTests(TestCase):
+    """Uploads are shrunk to WebP without EXIF, and anything Pillow can't read is left alone."""
+
+    def setUp(self):
+        self.storage = use_temp_media(self)
+        self.category = Category.objects.create(name='Laptops')
+
+    def product(self, upload):
+        with self.captureOnCommitCallbacks() as callbacks:
+            product = Product.objects.create(name='Latitude 5490', category=self.category, product_picture=upload)
+        return product, callbacks
+
+    def test_upload_is_downscaled_rotated_and_stripped(self):
+        product, callbacks = self.product(jpeg_upload(orientation=6))  # 6: rotate 90° clockwise to display
+        self.assertTrue(product.product_picture.name.endswith('.webp'))
+        self.assertEqual(len(callbacks), 1)  # renditions are queued for after the commit
+        with self.storage.open(product.product_picture.name) as f, Image.open(f) as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (images.MAX_DIMENSION // 2, images.MAX_DIMENSION)))
+            self.assertFalse(img.getexif())
+
+    def test_unreadable_upload_is_kept_untouched(self):
+        upload = SimpleUploadedFile('scan.jpg', b'not really a jpeg', content_type='image/jpeg')
+        product, callbacks = self.product(upload)
+        self.assertFalse(product.product_picture.name.endswith('.webp'))
+        self.assertEqual(callbacks, [])
+        with self.storage.open(product.product_picture.name) as f:
+            self.assertEqual(f.read(), b'not really a jpeg')
+        # Without renditions the page falls back to the original.
+        self.assertEqual(images.rendition_url(product.product_picture, 160), product.product_picture.url)
+
+    def test_failed_rendition_job_is_logged_and_can_run_again(self):
+        name = self.storage.save('cas/00/00/broken.webp', ContentFile(b'truncated'))
+        with mock.patch.object(images._executor, 'submit', side_effect=lambda job: job()), \
+                mock.patch('builtins.print') as log:
+            images._submit(name, self.storage)
+            images._submit(name, self.storage)
+        self.assertEqual(log.call_count, 2)  # the first failure didn't leave the name stuck in _pending
+        self.assertEqual(images._pending, set())
+        self.assertFalse(self.storage.exists(images.rendition_name(name, 'thumb')))
+
+    def test_renditions_and_rendition_url(self):
+        product, callbacks = self.product(jpeg_upload())
+        name = product.product_picture.name
+        with mock.patch.object(images._executor, 'submit', side_effect=lambda job: job()):
+            callbacks[0]()
+        with self.storage.open(images.rendition_name(name, 'thumb')) as f, Image.open(f) as img:
+            self.assertEqual(img.size, (160, 80))
+        self.assertEqual(images.rendition_url(product.product_picture, 100), self.storage.url(images.rendition_name(name, 'thumb')))
+        self.assertEqual(images.rendition_url(product.product_picture, 400), self.storage.url(images.rendition_name(name, 'medium')))
+        self.assertEqual(images.rendition_url(product.product_picture, 1000), product.product_picture.url)
+
+
+class MediaReferenceTests(TestCase):
+    """Every row holds exactly one reference to its picture, whatever it was replaced with."""
+
+    def setUp(self):
+        self.storage = use_temp_media(self)
+        self.category = Category.objects.create(name='Laptops')
+        # Renditions are written inline, inside the temporary MEDIA_ROOT.
+        inline = mock.patch.object(images._executor, 'submit', side_effect=lambda job: job())
+        inline.start()
+        self.addCleanup(inline.stop)
+
+    def refs(self):
+        return dict(MediaBlob.objects.values_list('name', 'ref_count'))
+
+    def product(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(name='Latitude 5490', category=self.category, product_picture=upload)
+
+    def replace(self, product, upload):
+        product.product_picture = upload
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        return product.product_picture.name
+
+    def test_replacing_releases_the_old_picture(self):
+        product = self.product(jpeg_upload(color='navy'))
+        old = product.product_picture.name
+        new = self.replace(product, jpeg_upload(color='maroon'))
+        self.assertEqual(self.refs(), {new: 1})
+        self.assertFalse(self.storage.exists(old))
+
+    def test_uploading_the_same_picture_again_keeps_one_reference(self):
+        product = self.product(jpeg_upload())
+        name = product.product_picture.name
+        self.assertEqual(self.replace(product, jpeg_upload(name='again.jpg')), name)
+        self.assertEqual(self.refs(), {name: 1})
+
+    def test_unreadable_replacement_still_releases_the_old_picture(self):
+        first = self.product(jpeg_upload())
+        second = self.product(jpeg_upload())
+        shared = first.product_picture.name
+        self.assertEqual(self.refs(), {shared: 2})
+
+        raw = self.replace(second, SimpleUploadedFile('scan.jpg', b'not really a jpeg'))
+        self.assertEqual(self.refs(), {shared: 1, raw: 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+            first.delete()
+        self.assertEqual(self.refs(), {})
+
+    def test_generating_renditions_twice_adds_no_references(self):
+        product = self.product(jpeg_upload())
+        legacy = self.product(None)
+        legacy_name = 'product_images/old.jpg'
+        os.makedirs(os.path.dirname(self.storage.path(legacy_name)))
+        Image.new('RGB', (800, 600)).save(self.storage.path(legacy_name), 'JPEG')
+        Product.objects.filter(pk=legacy.pk).update(product_picture=legacy_name)
+
+        before = self.refs()
+        for _ in range(2):
+            err = io.StringIO()
+            call_command('generate_image_renditions', stdout=io.StringIO(), stderr=err)
+            self.assertEqual(self.refs(), before)
+        self.assertIn('Skipped 1 legacy uploads', err.getvalue())
+        self.assertTrue(self.storage.exists(images.rendition_name(product.product_picture.name, 'thumb')))
+        self.assertFalse(self.storage.exists(images.rendition_name(legacy_name, 'thumb')))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PermissionTests(TestCase):
+    """Compiled role masks gate views, and a permission change reaches every process via the cache version."""
+
+    def setUp(self):
+        cache.clear()
+        permissions._local.clear()
+        self.clerk_role = Role.objects.create(name='Order Clerk')  # gets Role.DEFAULT_PERMISSIONS
+        self.clerk = User.objects.create(role=self.clerk_role, username='clerk', password='pbkdf2_unused',
+                                         first_name='Order', last_name='Clerk', email='clerk@example.test', phone_number='clerk')
+        customer = Customer.objects.create(shop_name='Sri Ram Electronics', shop_address='MG Road', shop_city='Hubli',
+                                           shop_district='Dharwad', shop_pincode='580020', shop_state='Karnataka')
+        self.order = SalesOrder.objects.create(customer=customer, created_by=self.clerk)
+
+    def grant(self, **columns):
+        with self.captureOnCommitCallbacks(execute=True):
+            RolePermissions.objects.filter(role=self.clerk_role).update(**columns)
+            RolePermissions.objects.get(role=self.clerk_role).save()  # update() sends no signal
+
+    def test_masks(self):
+        clerk = permissions.PermissionSet(permissions.mask_for_role(self.clerk_role.id))
+        self.assertTrue(clerk.orders_a and clerk.has('customer', 'v'))
+        self.assertFalse(clerk.orders_d or clerk.has('inventory', 'v'))
+        with self.assertRaises(AttributeError):
+            clerk.no_such_permission
+        self.assertEqual(permissions.mask_for_role(Role.objects.create(name='Admin').id), permissions.ALL_PERMISSIONS)
+        self.assertIsNone(permissions.mask_for_role(None))
+
+    def test_masks_are_served_from_memory_until_the_version_moves(self):
+        mask = permissions.mask_for_role(self.clerk_role.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(permissions.mask_for_role(self.clerk_role.id), mask)
+
+        # Another process changed the row and bumped the shared version.
+        RolePermissions.objects.filter(role=self.clerk_role).update(orders_d=True)
+        self.assertEqual(permissions.mask_for_role(self.clerk_role.id), mask)
+        cache.incr(permissions.VERSION_KEY)
+        self.assertEqual(permissions.mask_for_role(self.clerk_role.id), mask | permissions.BITS['orders_d'])
+
+    def test_saving_permissions_invalidates_on_commit(self):
+        version = permissions.current_version()
+        permissions.mask_for_role(self.clerk_role.id)
+        self.grant(orders_a=False)
+        self.assertNotEqual(permissions.current_version(), version)
+        self.assertFalse(permissions.mask_for_role(self.clerk_role.id) & permissions.BITS['orders_a'])
+
+    def test_invoicing_needs_orders_add(self):
+        log_in(self.client, 'clerk')
+        self.grant(orders_a=False)
+        self.assertRedirects(self.client.get(f'/generate_invoice/{self.order.id}/'), '/dashboard/', fetch_redirect_response=False)
+        self.assertFalse(Invoice.objects.exists())
+        self.assertEqual(self.client.get(f'/get-customer-details/{self.order.customer_id}/').status_code, 403)
+
+        self.client.logout()
+        self.assertRedirects(self.client.get(f'/generate_invoice/{self.order.id}/'), '/', fetch_redirect_response=False)
+        self.assertEqual(self.client.get(f'/get-customer-details/{self.order.customer_id}/').status_code, 401)
+
+    def test_invoicing_with_orders_add(self):
+        log_in(self.client, 'clerk')
+        self.assertRedirects(self.client.get(f'/generate_invoice/{self.order.id}/'), f'/receipt/{self.order.id}/',
+                             fetch_redirect_response=False)
+        self.assertTrue(Invoice.objects.filter(order=self.order).exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LoginGuardTests(TestCase):
+    """Failed logins lock a username out for the sliding window, in the cache or (per-process caches) the database."""
+
+    def setUp(self):
+        cache.clear()
+        self.now = 1_700_000_000.0
+        clock = mock.patch.object(login_guard.time, 'time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def fail(self, times, username='ravi', ip='10.0.0.1'):
+        for _ in range(times):
+            login_guard.record_failure(username, ip)
+
+    def assertWindow(self):
+        self.fail(login_guard.MAX_PER_USERNAME - 1)
+        self.assertEqual(login_guard.retry_after('ravi', '10.0.0.2'), 0)
+        self.fail(1)
+        wait = login_guard.retry_after('ravi', '10.0.0.2')  # another IP doesn't help
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, login_guard.WINDOW_SECONDS)
+        self.assertEqual(login_guard.retry_after('kiran', '10.0.0.2'), 0)
+        return wait
+
+    @mock.patch.object(login_guard, 'USE_CACHE', True)
+    def test_cache_buckets_expire_with_the_window(self):
+        wait = self.assertWindow()
+        self.now += wait
+        self.assertEqual(login_guard.retry_after('ravi', '10.0.0.2'), 0)
+
+        self.fail(login_guard.MAX_PER_USERNAME)
+        self.assertGreater(login_guard.retry_after('ravi', None), 0)
+        login_guard.reset('ravi')
+        self.assertEqual(login_guard.retry_after('ravi', None), 0)
+
+    @mock.patch.object(login_guard, 'USE_CACHE', False)
+    def test_database_window(self):
+        self.assertWindow()
+        self.assertEqual(LoginAttempt.objects.filter(key='user:ravi').count(), login_guard.MAX_PER_USERNAME)
+        LoginAttempt.objects.update(attempted_at=timezone.now() - timedelta(seconds=login_guard.WINDOW_SECONDS + 1))
+        self.assertEqual(login_guard.retry_after('ravi', None), 0)
+
+    @mock.patch.object(login_guard, 'USE_CACHE', True)
+    def test_falls_back_to_the_database_when_the_cache_fails(self):
+        with mock.patch.object(login_guard.cache, 'add', side_effect=ConnectionError), \
+                mock.patch.object(login_guard.cache, 'get_many', side_effect=ConnectionError), \
+                mock.patch('builtins.print'):
+            self.assertWindow()
+        self.assertTrue(LoginAttempt.objects.filter(key='ip:10.0.0.1').exists())
+
+    def test_old_hashes_are_upgraded_on_login(self):
+        old_hash = PBKDF2PasswordHasher().encode('s3cret!', 'oldsalt', iterations=1000)
+        user = User.objects.create(username='ravi', password=old_hash, first_name='Ravi', last_name='K',
+                                   email='ravi@example.test', phone_number='ravi')
+        self.assertIsNone(login_guard.authenticate('ravi', 'wrong'))
+        self.assertIsNone(login_guard.authenticate('nobody', 's3cret!'))
+        self.assertEqual(User.objects.get(pk=user.pk).password, old_hash)
+
+        self.assertEqual(login_guard.authenticate('ravi', 's3cret!'), user)
+        new_hash = User.objects.get(pk=user.pk).password
+        self.assertNotEqual(new_hash, old_hash)
+        self.assertFalse(identify_hasher(new_hash).must_update(new_hash))
+
+    @mock.patch.object(login_guard, 'USE_CACHE', True)
+    def test_locked_out_login_is_refused_before_checking_the_password(self):
+        User.objects.create(username='ravi', password='s3cret!', first_name='Ravi', last_name='K',
+                            email='ravi@example.test', phone_number='ravi')
+        self.fail(login_guard.MAX_PER_USERNAME)
+        with mock.patch.object(login_guard, 'authenticate') as authenticate:
+            response = self.client.post('/', {'username': 'Ravi ', 'password': 's3cret!'}, follow=True)
+        authenticate.assert_not_called()
+        self.assertNotIn('current_user', self.client.session)
+        self.assertContains(response, 'Too many login attempts')
+
+
+class TimesheetTests(TestCase):
+    """Check-in/out are idempotent upserts, and the week/month rollups match a full rebuild."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='ravi', password='pbkdf2_unused', first_name='Ravi', last_name='K',
+                                        email='ravi@example.test', phone_number='ravi')
+        self.monday = datetime(2026, 3, 2, 9, 0, tzinfo=dt_timezone.utc)
+
+    def summary(self, period):
+        return AttendanceSummary.objects.values_list('days_present', 'open_days', 'working_hours').get(
+            user=self.user, period=period, period_start=timesheets.period_start(self.monday.date(), period),
+        )
+
+    def assertMatchesRebuild(self):
+        fields = ('user_id', 'period', 'period_start', 'days_present', 'open_days', 'working_hours')
+        incremental = set(AttendanceSummary.objects.values_list(*fields))
+        timesheets.rebuild_timesheets()
+        self.assertEqual(incremental, set(AttendanceSummary.objects.values_list(*fields)))
+
+    def test_repeated_check_in_and_out_keep_the_first(self):
+        timesheets.record_check_in(self.user, self.monday)
+        timesheets.record_check_in(self.user, self.monday + timedelta(hours=2))
+        self.assertEqual(self.summary('week'), (1, 1, timedelta()))
+
+        timesheets.record_check_out(self.user, self.monday + timedelta(hours=8))
+        timesheets.record_check_out(self.user, self.monday + timedelta(hours=10))
+        attendance = Attendance.objects.get(user=self.user)
+        self.assertEqual((attendance.check_in, attendance.working_hours), (self.monday, timedelta(hours=8)))
+        self.assertEqual(self.summary('week'), (1, 0, timedelta(hours=8)))
+        self.assertMatchesRebuild()
+
+    def test_rollups_across_days(self):
+        for offset, hours in ((0, 8), (1, 6), (7, 5)):  # next Monday starts a new week
+            day = self.monday + timedelta(days=offset)
+            timesheets.record_check_in(self.user, day)
+            timesheets.record_check_out(self.user, day + timedelta(hours=hours))
+        timesheets.record_check_in(self.user, self.monday + timedelta(days=2))  # never checked out
+        self.assertEqual(self.summary('week'), (3, 1, timedelta(hours=14)))
+        self.assertEqual(self.summary('month'), (4, 1, timedelta(hours=19)))
+        self.assertMatchesRebuild()
+
+    def test_check_out_without_check_in_is_ignored(self):
+        timesheets.record_check_out(self.user, self.monday)
+        self.assertFalse(Attendance.objects.exists())
+        self.assertFalse(AttendanceSummary.objects.exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AutocompleteTests(TestCase):
+    """Key-prefix matches come first, word-prefix matches fill the rest, and salesmen only see their shops."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = self.user('owner', 'Admin')
+        self.salesman = self.user('ravi', 'Salesman')
+        self.electronics = self.shop('Sri Ram Electronics', 'Ravi Kumar', '98450 12345', self.salesman)
+        self.traders = self.shop('Sri Ramana Traders', 'Anil', '98450-67890', self.salesman)
+        self.mobiles = self.shop('Kumar Mobiles', 'Sri Ram', None, self.admin)
+
+    def user(self, username, role_name):
+        return User.objects.create(role=Role.objects.get_or_create(name=role_name)[0], username=username, password='pbkdf2_unused',
+                                   first_name=username, last_name='Test', email=f'{username}@example.test', phone_number=username)
+
+    def shop(self, name, owner_name, phone, salesman):
+        return Customer.objects.create(user=salesman, shop_name=name, full_name=owner_name, phone_number=phone,
+                                       shop_address='MG Road', shop_city='Hubli', shop_district='Dharwad',
+                                       shop_pincode='580020', shop_state='Karnataka')
+
+    def ids(self, user, q, **params):
+        log_in(self.client, user.username)
+        response = self.client.get('/autocomplete/customers/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [r['id'] for r in response.json()['results']]
+
+    def test_prefix_matches_come_first_in_key_order(self):
+        self.assertEqual(self.ids(self.admin, 'sri ram'), [self.electronics.id, self.traders.id, self.mobiles.id])
+        self.assertEqual(self.ids(self.admin, 'SRI  Ram.'), [self.electronics.id, self.traders.id, self.mobiles.id])
+        self.assertEqual(self.ids(self.admin, 'sri ram', limit=1), [self.electronics.id])
+
+    def test_every_token_must_start_a_word(self):
+        self.assertEqual(self.ids(self.admin, 'kumar ram'), [self.mobiles.id, self.electronics.id])
+        self.assertEqual(self.ids(self.admin, 'ana'), [])  # inside "ramana", not at a word start
+        self.assertEqual(self.ids(self.admin, '9845067'), [self.traders.id])  # phones are keyed without separators
+
+    def test_salesmen_only_see_their_customers(self):
+        self.assertEqual(self.ids(self.salesman, 'sri ram'), [self.electronics.id, self.traders.id])
+        self.assertEqual(self.ids(self.salesman, 'kumar'), [self.electronics.id])
+
+    def test_keys_follow_renames(self):
+        self.traders.shop_name = 'Ganesh Traders'
+        self.traders.save()
+        self.assertEqual(self.ids(self.admin, 'ganesh'), [self.traders.id])
+        self.assertNotIn(self.traders.id, self.ids(self.admin, 'sri'))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class GoodsReceiptTests(TestCase):
+    """Receipts post stock movements, raise inventory, re-weight average cost and close the order once complete."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Components')
+        self.ram = Product.objects.create(name='8GB DDR4', category=category, product_type='COMPONENT')
+        self.ssd = Product.objects.create(name='256GB SSD', category=category, product_type='COMPONENT')
+        Inventory.objects.create(product=self.ram, opening_stock=5, current_stock=5, average_cost=Decimal('80.00'))
+        self.vendor = Vendor.objects.create(name='Acme Components')
+        self.order, (self.ram_line, self.ssd_line) = self.purchase((self.ram, 10, '100.00'), (self.ssd, 4, '250.00'))
+
+    def purchase(self, *lines):
+        order = PurchaseOrder.objects.create(vendor=self.vendor, total_amount=Decimal('0.00'))
+        items = [
+            PurchaseItem.objects.create(purchase_order=order, product=product, quantity=quantity,
+                                        cost_price=Decimal(cost), total_price=quantity * Decimal(cost))
+            for product, quantity, cost in lines
+        ]
+        return order, items
+
+    def inventory(self, product):
+        return Inventory.objects.values_list('stock_in', 'current_stock', 'average_cost').get(product=product)
+
+    def test_partial_receipt(self):
+        receipt = goods_receipt.receive(self.order.id, {self.ram_line.id: '4'}, remarks='first box')
+        self.assertEqual(self.inventory(self.ram), (4, 9, Decimal('88.89')))  # (5 x 80 + 4 x 100) / 9
+        self.assertFalse(Inventory.objects.filter(product=self.ssd).exists())
+        self.assertEqual(
+            list(receipt.movements.values_list('product_id', 'movement_type', 'quantity', 'unit_cost', 'purchase_item_id')),
+            [(self.ram.id, 'receipt', 4, Decimal('100.00'), self.ram_line.id)],
+        )
+        self.ram_line.refresh_from_db()
+        self.assertEqual((self.ram_line.received_quantity, self.ram_line.outstanding), (4, 6))
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.is_received)
+
+        goods_receipt.receive(self.order.id)  # everything still outstanding
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.is_received)
+        self.assertEqual(self.inventory(self.ssd), (4, 4, Decimal('250.00')))
+        self.assertEqual(StockMovement.objects.filter(product=self.ram).aggregate(n=Sum('quantity'))['n'], 10)
+        self.assertIsNone(goods_receipt.receive(self.order.id))
+
+    def test_rejected_receipts_change_nothing(self):
+        goods_receipt.receive(self.order.id, {self.ram_line.id: 4})
+        for quantities in ({self.ram_line.id: 7}, {self.ram_line.id: -1}, {self.ram_line.id: 'two'}, {999: 1},
+                           {self.ssd_line.id: 1, self.ram_line.id: 7}):
+            with self.subTest(quantities=quantities), self.assertRaises(ValidationError):
+                goods_receipt.receive(self.order.id, quantities)
+        self.assertEqual(self.inventory(self.ram), (4, 9, Decimal('88.89')))
+        self.assertEqual(GoodsReceipt.objects.count(), 1)
+        self.assertFalse(Inventory.objects.filter(product=self.ssd).exists())
+
+    def test_average_cost_across_receipts_at_different_prices(self):
+        dearer, (line,) = self.purchase((self.ram, 5, '130.00'))
+        goods_receipt.receive(self.order.id, {self.ram_line.id: 10})
+        self.assertEqual(self.inventory(self.ram), (10, 15, Decimal('93.33')))  # (5 x 80 + 10 x 100) / 15
+        goods_receipt.receive(dearer.id)
+        self.assertEqual(self.inventory(self.ram), (15, 20, Decimal('102.50')))  # (15 x 93.33 + 5 x 130) / 20
+        self.assertEqual(
+            list(StockMovement.objects.filter(product=self.ram).order_by('id').values_list('quantity', 'unit_cost')),
+            [(10, Decimal('100.00')), (5, Decimal('130.00'))],
+        )
+
+    def test_receive_view(self):
+        User.objects.create(role=Role.objects.create(name='Admin'), username='keeper', password='pbkdf2_unused',
+                            first_name='Store', last_name='Keeper', email='keeper@example.test', phone_number='keeper')
+        log_in(self.client, 'keeper')
+        url = f'/purchase/order/{self.order.id}/receive/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        response = self.client.post(url, {f'received_{self.ram_line.id}': '11'})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertFalse(GoodsReceipt.objects.exists())
+
+        response = self.client.post(url, {f'received_{self.ram_line.id}': '3', f'received_{self.ssd_line.id}': ''})
+        self.assertRedirects(response, '/purchase/order/list/', fetch_redirect_response=False)
+        self.assertEqual(GoodsReceipt.objects.get().received_by.username, 'keeper')
+
+        self.client.post(url, {'receive_all': '1'})
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.is_received)
+
+
+class ComponentReorderTests(TestCase):
+    """Velocity, days of cover and reorder quantities come out of the usage history, grouped by vendor."""
+
+    def setUp(self):
+        self.today = date(2026, 3, 31)
+        self.vendor = Vendor.objects.create(name='Acme Components')
+        self.laptop = Product.objects.create(name='Latitude 5490', category=Category.objects.create(name='Laptops'))
+        self.steady = self.component('8GB DDR4', stock=10, vendor=self.vendor)
+        self.picking_up = self.component('256GB SSD', stock=40, vendor=None)
+        self.idle = self.component('Keyboard', stock=5, vendor=self.vendor)
+        for days_ago in range(5, 90, 10):
+            self.use(self.steady, days_ago, 10)  # 90 units over the 90-day window: 1 a day
+        self.use(self.picking_up, 1, 14)  # 1 a day over the last fortnight, nothing before
+        self.use(self.idle, 200, 100)  # before the window
+
+    def component(self, name, stock, vendor):
+        return Component.objects.create(name=name, purchase_price=Decimal('10.00'), stock_quantity=stock,
+                                        vendor=vendor, lead_time_days=7)
+
+    def use(self, component, days_ago, quantity):
+        batch = RefurbishedProduct.objects.create(product=self.laptop, serial_number=f'SN-{component.id}-{days_ago}',
+                                                  production_date=self.today - timedelta(days=days_ago))
+        # bulk_create: the history is already reflected in stock_quantity
+        ComponentUsage.objects.bulk_create([ComponentUsage(refurbished_product=batch, component=component, quantity_used=quantity)])
+
+    def plans(self):
+        reorder_planner.plan_reorders(today=self.today)
+        return {p.component_id: p for p in ComponentReorderPlan.objects.all()}
+
+    def test_plan(self):
+        plans = self.plans()
+        steady = plans[self.steady.id]
+        self.assertEqual((steady.daily_usage, steady.days_of_cover, steady.run_out_date),
+                         (Decimal('1.000'), Decimal('10.0'), self.today + timedelta(days=10)))
+        # 10 days of cover is inside lead time + safety (14): order lead time + 30 days of usage, less stock
+        self.assertEqual((steady.needs_reorder, steady.suggested_quantity, steady.suggested_cost), (True, 27, Decimal('270.00')))
+
+        picking_up = plans[self.picking_up.id]
+        self.assertEqual((picking_up.daily_usage, picking_up.days_of_cover, picking_up.needs_reorder),
+                         (Decimal('1.000'), Decimal('40.0'), False))  # the recent rate, not 14 / 90
+
+        idle = plans[self.idle.id]
+        self.assertEqual((idle.daily_usage, idle.days_of_cover, idle.needs_reorder), (Decimal('0.000'), None, False))
+
+        self.assertEqual([(g['vendor'], [p.component_id for p in g['lines']], g['total'])
+                          for g in reorder_planner.suggested_orders()],
+                         [(self.vendor, [self.steady.id], Decimal('270.00'))])
+
+    def test_whole_history_window(self):
+        with mock.patch.object(reorder_planner, 'VELOCITY_DAYS', None):
+            plans = self.plans()
+        # 100 units over the 201 days since the first usage
+        self.assertEqual(plans[self.idle.id].daily_usage, Decimal('0.498'))
+        self.assertEqual(plans[self.steady.id].daily_usage, Decimal('0.714'))  # recent 10 / 14 beats 90 / 201
+
+    def test_replanning_updates_in_place(self):
+        self.plans()
+        Component.objects.filter(pk=self.steady.pk).update(stock_quantity=100)
+        plans = self.plans()
+        self.assertEqual(len(plans), 3)
+        self.assertFalse(plans[self.steady.id].needs_reorder)
+        self.assertEqual(reorder_planner.suggested_orders(), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MarginTests(TestCase):
+    """
+    Margins cost served units at the batches FIFO drew them from and pending
+    units at the next batch's cost, and the facts follow an order from
+    estimate to invoice on an incremental refresh.
+    """
+
+    def setUp(self):
+        cache.clear()
+        permissions._local.clear()
+        self.laptop = Product.objects.create(name='Latitude 5490', category=Category.objects.create(name='Laptops'),
+                                             purchase_price=Decimal('300.00'))
+        ram = Component.objects.create(name='8GB DDR4', purchase_price=Decimal('50.00'), stock_quantity=10)
+        ssd = Component.objects.create(name='256GB SSD', purchase_price=Decimal('100.00'), stock_quantity=10)
+        BillOfMaterial.objects.create(product=self.laptop, component=ram, quantity=2)
+        BillOfMaterial.objects.create(product=self.laptop, component=ssd, quantity=1)
+        self.built = produce(self.laptop, 2, 1000, 1200)  # 2 x 50 + 100 a unit
+        BillOfMaterial.objects.filter(product=self.laptop).delete()
+        self.bought = produce(self.laptop, 2, 1000, 1200)  # no bill of materials: the purchase price
+
+        self.admin = self.user('boss', 'Admin')
+        self.ravi = self.user('ravi', 'Salesman')
+        self.suma = self.user('suma', 'Salesman')
+        with self.captureOnCommitCallbacks(execute=True):
+            permissions_row = RolePermissions.objects.get(role=self.ravi.role)
+            permissions_row.reports_v = True
+            permissions_row.save()
+        self.first = self.order(self.ravi, 'Sri Ram Electronics', quantity=3, revenue=Decimal('3000.00'), days_ago=3)
+        self.second = self.order(self.suma, 'Laxmi Computers', quantity=1, revenue=Decimal('1000.00'), days_ago=1)
+
+    def user(self, username, role_name):
+        return User.objects.create(role=Role.objects.get_or_create(name=role_name)[0], username=username, password='pbkdf2_unused',
+                                   first_name=username.title(), last_name='K', email=f'{username}@example.test', phone_number=username)
+
+    def order(self, salesman, shop_name, quantity, revenue, days_ago):
+        customer = Customer.objects.create(user=salesman, shop_name=shop_name, shop_address='MG Road', shop_city='Hubli',
+                                           shop_district='Dharwad', shop_pincode='580020', shop_state='Karnataka')
+        order = SalesOrder.objects.create(customer=customer, created_by=salesman)
+        SalesOrder.objects.filter(pk=order.pk).update(order_date=timezone.now() - timedelta(days=days_ago))
+        SaleItem.objects.create(order=order, product=self.laptop, quantity=quantity, price=revenue / quantity,
+                                sub_total=revenue, taxable_amount=revenue, gst_amount=0, total=revenue)
+        return order
+
+    def invoice(self, order):
+        log_in(self.client, self.admin.username)
+        self.assertEqual(self.client.get(f'/generate_invoice/{order.id}/').status_code, 302)
+
+    def facts(self):
+        return {
+            f.salesman_id: (f.quantity, f.estimated_quantity, f.cost, f.margin)
+            for f in MarginFact.objects.all()
+        }
+
+    def test_batch_costs(self):
+        self.assertEqual(self.built.unit_cost, Decimal('200.00'))
+        self.assertEqual(margins.batch_cost(self.built.unit_cost, self.laptop.purchase_price), Decimal('200.00'))
+        self.assertEqual(margins.batch_cost(self.bought.unit_cost, self.laptop.purchase_price), Decimal('300.00'))
+
+    def test_fifo_cost_across_two_batches(self):
+        self.invoice(self.first)
+        self.assertEqual(
+            sorted(SaleItemBatch.objects.values_list('batch_id', 'quantity', 'unit_cost')),
+            [(self.built.id, 2, Decimal('200.00')), (self.bought.id, 1, Decimal('300.00'))],
+        )
+        margins.refresh_facts()
+        self.assertEqual(self.facts()[self.ravi.id], (3, 0, Decimal('700.00'), Decimal('2300.00')))
+
+    def test_estimate_becomes_served_cost_on_incremental_refresh(self):
+        margins.refresh_facts()
+        # Nothing invoiced: every unit at the next batch's cost
+        self.assertEqual(self.facts(), {
+            self.ravi.id: (3, 3, Decimal('600.00'), Decimal('2400.00')),
+            self.suma.id: (1, 1, Decimal('200.00'), Decimal('800.00')),
+        })
+
+        self.invoice(self.first)
+        with mock.patch.object(margins, 'build_facts', wraps=margins.build_facts) as build:
+            margins.refresh_facts()
+        self.assertEqual(build.call_args.args[0], sorted({timezone.localdate() - timedelta(days=d) for d in (3, 1)}))
+        self.assertEqual(self.facts(), {
+            self.ravi.id: (3, 0, Decimal('700.00'), Decimal('2300.00')),
+            self.suma.id: (1, 1, Decimal('300.00'), Decimal('700.00')),  # the built batch is gone
+        })
+
+        self.invoice(self.second)
+        margins.refresh_facts()
+        self.assertEqual(self.facts()[self.suma.id], (1, 0, Decimal('300.00'), Decimal('700.00')))
+        self.assertEqual(MarginFact.objects.aggregate(cost=Sum('cost'))['cost'],
+                         SaleItemBatch.objects.aggregate(cost=Sum(F('quantity') * F('unit_cost')))['cost'])
+
+    def test_replayed_fifo_matches_live_allocation(self):
+        self.invoice(self.first)
+        self.invoice(self.second)
+        columns = ('sale_item_id', 'batch_id', 'quantity', 'unit_cost')
+        live = sorted(SaleItemBatch.objects.values_list(*columns))
+        SaleItemBatch.objects.all().delete()
+        importlib.import_module('App1.migrations.0014_margin_facts').replay_fifo(django_apps, None)
+        self.assertEqual(sorted(SaleItemBatch.objects.values_list(*columns)), live)
+
+    def test_drilldown_api(self):
+        self.invoice(self.first)
+        margins.refresh_facts()
+
+        log_in(self.client, self.admin.username)
+        report = self.client.get('/reports/margins/', {'group': 'salesman'}).json()
+        self.assertEqual([(r['salesman_id'], r['margin'], r['margin_percent']) for r in report['rows']],
+                         [(self.ravi.id, 2300.0, 76.67), (self.suma.id, 700.0, 70.0)])
+        self.assertEqual((report['totals']['revenue'], report['totals']['margin']), (4000.0, 3000.0))
+
+        days = self.client.get('/reports/margins/', {'group': 'day'}).json()['rows']
+        self.assertEqual([r['date'] for r in days],
+                         [str(timezone.localdate() - timedelta(days=d)) for d in (3, 1)])
+
+        narrowed = self.client.get('/reports/margins/', {'group': 'product', 'customer': self.second.customer_id,
+                                                         'start': str(timezone.localdate() - timedelta(days=2))}).json()
+        self.assertEqual([(r['product_id'], r['quantity']) for r in narrowed['rows']], [(self.laptop.id, 1)])
+
+        for params in ({'group': 'vendor'}, {'start': '31/03/2026'}, {'salesman': 'ravi'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/reports/margins/', params).status_code, 400)
+
+        # A salesman only sees their own sales, whoever they ask for
+        log_in(self.client, self.ravi.username)
+        report = self.client.get('/reports/margins/', {'group': 'salesman', 'salesman': self.suma.id}).json()
+        self.assertEqual([r['salesman_id'] for r in report['rows']], [self.ravi.id])
+        self.assertEqual(report['totals']['revenue'], 3000.0)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SalesTrendTests(TestCase):
+    """Range totals, buckets and the previous period read off the running totals agree with summing the orders."""
+
+    def setUp(self):
+        cache.clear()
+        permissions._local.clear()
+        self.admin = User.objects.create(role=Role.objects.create(name='Admin'), username='boss', password='pbkdf2_unused',
+                                         first_name='Boss', last_name='Admin', email='boss@example.test', phone_number='boss')
+        self.customer = Customer.objects.create(user=self.admin, shop_name='Sri Ram Electronics', shop_address='MG Road',
+                                                shop_city='Hubli', shop_district='Dharwad', shop_pincode='580020',
+                                                shop_state='Karnataka')
+        # Fri 30 Jan, Sun 1 Feb, Mon 2 Feb, Sat 28 Feb, Sun 1 Mar 2026
+        for day, amount in [((1, 30), 100), ((2, 1), 200), ((2, 2), 400), ((2, 28), 800), ((3, 1), 1600)]:
+            self.order(date(2026, *day), amount)
+        sales_trends.refresh_rollups()
+
+    def order(self, day, amount):
+        order = SalesOrder.objects.create(customer=self.customer, created_by=self.admin, grand_total=Decimal(amount))
+        placed = timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=12))
+        SalesOrder.objects.filter(pk=order.pk).update(order_date=placed)
+        return order
+
+    def summed(self, start, end):
+        """grand_total summed straight off the orders, local days start..end."""
+        orders = SalesOrder.objects.filter(
+            order_date__gte=timezone.make_aware(datetime.combine(start, datetime.min.time())),
+            order_date__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), datetime.min.time())),
+        )
+        return float(orders.aggregate(total=Sum('grand_total'))['total'] or 0)
+
+    def revenues(self, report):
+        (series,) = report['series']
+        return [(p['start'], p['end'], p['revenue']) for p in series['points']]
+
+    def test_range_total_matches_sum(self):
+        for start, end in [(date(2026, 2, 1), date(2026, 2, 28)), (date(2026, 1, 1), date(2026, 3, 31)),
+                           (date(2026, 1, 31), date(2026, 2, 27)), (date(2025, 12, 1), date(2026, 1, 29))]:
+            with self.subTest(start=start, end=end):
+                (series,) = trend(start, end, bucket='day')['series']
+                self.assertEqual(series['total']['revenue'], self.summed(start, end))
+                self.assertEqual(sum(p['revenue'] for p in series['points']), self.summed(start, end))
+
+    def test_bucket_edges(self):
+        # Weeks run Monday to Sunday, clipped to the range
+        self.assertEqual(self.revenues(trend(date(2026, 1, 28), date(2026, 2, 8), bucket='week')), [
+            (date(2026, 1, 28), date(2026, 2, 1), 300.0),
+            (date(2026, 2, 2), date(2026, 2, 8), 400.0),
+        ])
+        self.assertEqual(self.revenues(trend(date(2026, 1, 15), date(2026, 3, 10), bucket='month')), [
+            (date(2026, 1, 15), date(2026, 1, 31), 100.0),
+            (date(2026, 2, 1), date(2026, 2, 28), 1400.0),
+            (date(2026, 3, 1), date(2026, 3, 10), 1600.0),
+        ])
+        self.assertEqual(len(sales_trends.buckets(date(2024, 2, 1), date(2024, 2, 29), 'month')), 1)
+        for start, end in [(date(2026, 1, 28), date(2026, 2, 8)), (date(2025, 12, 29), date(2026, 3, 1))]:
+            for size in sales_trends.BUCKETS:
+                with self.subTest(start=start, size=size):
+                    self.assertEqual(sales_trends.bucket_count(start, end, size), len(sales_trends.buckets(start, end, size)))
+
+    def test_previous_period(self):
+        report = trend(date(2026, 2, 1), date(2026, 2, 28))
+        self.assertEqual((report['previous_start'], report['previous_end']), (date(2026, 1, 4), date(2026, 1, 31)))
+        (series,) = report['series']
+        self.assertEqual((series['total']['revenue'], series['previous']['revenue']), (1400.0, 100.0))
+        self.assertEqual((series['change']['revenue'], series['change']['orders']), (1300.0, 200.0))
+
+        (series,) = trend(date(2026, 1, 1), date(2026, 1, 29))['series']  # nothing sold yet, before or during
+        self.assertEqual((series['total']['revenue'], series['previous']['revenue'], series['change']['revenue']),
+                         (0.0, 0.0, None))
+
+    def test_incremental_refresh_after_new_order(self):
+        today = timezone.localdate()
+        self.order(today, 50)
+        with mock.patch.object(sales_trends, 'rebuild_rollups', wraps=sales_trends.rebuild_rollups) as rebuild:
+            sales_trends.refresh_rollups()
+        rebuild.assert_called_once_with(today)
+        (series,) = trend(today, today, bucket='day')['series']
+        self.assertEqual(series['total']['revenue'], 50.0)
+        (series,) = trend(date(2026, 1, 1), today)['series']
+        self.assertEqual(series['total']['revenue'], self.summed(date(2026, 1, 1), today))
+
+    def test_range_error(self):
+        self.assertIsNone(sales_trends.range_error(date(2026, 1, 1), date(2026, 12, 31), 'day'))
+        self.assertIn("after end", sales_trends.range_error(date(2026, 3, 1), date(2026, 2, 1), 'day'))
+        self.assertIn("between", sales_trends.range_error(date(1, 1, 1), date(2026, 2, 1), 'month'))
+        self.assertIn("buckets", sales_trends.range_error(date(2025, 1, 1), date(2026, 2, 5), 'day'))
+        self.assertIsNone(sales_trends.range_error(date(2025, 1, 1), date(2026, 2, 5), 'week'))
+
+        log_in(self.client, self.admin.username)
+        for params in ({'end': '9999-12-31'}, {'start': '2026-03-01', 'end': '2026-02-01'}, {'bucket': 'year'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/reports/trends/', params).status_code, 400)
+        report = self.client.get('/reports/trends/', {'start': '2026-02-01', 'end': '2026-02-28'}).json()
+        self.assertEqual(report['series'][0]['total']['revenue'], 1400.0)
+
+
+class ClassifyTests(SimpleTestCase):
+    """ABC classes go by the share reached before a product, so the one crossing a line stays in the class above it."""
+
+    def test_classes(self):
+        self.assertEqual(product_ranking.classify({1: 50, 2: 30, 3: 15, 4: 5}), {
+            1: (1, 'A', 50), 2: (2, 'A', 80), 3: (3, 'B', 95), 4: (4, 'C', 100),
+        })
+
+    def test_crossing_product_is_still_a(self):
+        ranks = product_ranking.classify({1: 70, 2: 20, 3: 10})
+        self.assertEqual(ranks[2], (2, 'A', 90))  # 70% before it, 90% after
+        self.assertEqual(ranks[3][1], 'B')
+
+    def test_zero_sales_left_out(self):
+        self.assertEqual(product_ranking.classify({1: Decimal('0'), 2: Decimal('40'), 3: Decimal('40')}),
+                         {2: (1, 'A', 50), 3: (2, 'A', 100)})  # ties by id
+        self.assertEqual(product_ranking.classify({1: 0, 2: 0}), {})
+        self.assertEqual(product_ranking.classify({}), {})
+
+    def test_primary_window_must_be_ranked(self):
+        try:
+            with override_settings(PRODUCT_RANK_WINDOWS=(30, 90), PRODUCT_RANK_WINDOW=7):
+                with self.assertRaises(ImproperlyConfigured):
+                    importlib.reload(product_ranking)
+        finally:
+            importlib.reload(product_ranking)
+
+
+class ProductRankingTests(TestCase):
+    """Each window ranks only the sales inside it; unsold products are stored unranked, class C."""
+
+    def setUp(self):
+        self.now = timezone.now()
+        category = Category.objects.create(name='Laptops')
+        self.recent, self.older, self.stale, self.unsold = (
+            Product.objects.create(name=name, category=category)
+            for name in ('Latitude 5490', 'EliteBook 840', 'ThinkPad T480', 'Inspiron 3520')
+        )
+        customer = Customer.objects.create(shop_name='Sri Ram Electronics', shop_address='MG Road', shop_city='Hubli',
+                                           shop_district='Dharwad', shop_pincode='580020', shop_state='Karnataka')
+        for product, days_ago, quantity, total in [(self.recent, 10, 1, 100), (self.older, 60, 5, 500), (self.stale, 400, 9, 900)]:
+            order = SalesOrder.objects.create(customer=customer)
+            SalesOrder.objects.filter(pk=order.pk).update(order_date=self.now - timedelta(days=days_ago))
+            SaleItem.objects.create(order=order, product=product, quantity=quantity, price=total / quantity,
+                                    sub_total=total, taxable_amount=total, gst_amount=0, total=total)
+
+    def test_rank_products(self):
+        self.assertEqual(product_ranking.rank_products(now=self.now), 12)
+        ranks = {(r.product_id, r.window_days): (r.revenue_rank, r.revenue_class, r.units, r.revenue_share)
+                 for r in ProductSalesRank.objects.all()}
+        self.assertEqual(ranks[(self.recent.id, 30)], (1, 'A', 1, Decimal('100.00')))
+        self.assertEqual(ranks[(self.older.id, 30)], (None, 'C', 0, Decimal('0.00')))
+        self.assertEqual(ranks[(self.older.id, 90)], (1, 'A', 5, Decimal('83.33')))
+        self.assertEqual(ranks[(self.recent.id, 90)], (2, 'B', 1, Decimal('100.00')))  # 83% before it
+        self.assertEqual(ranks[(self.older.id, 365)], ranks[(self.older.id, 90)])
+        for product in (self.stale, self.unsold):
+            self.assertEqual(ranks[(product.id, 365)], (None, 'C', 0, Decimal('0.00')))
+
+        self.assertEqual(product_ranking.rank_products(now=self.now), 12)  # upserted in place
+        self.assertEqual(ProductSalesRank.objects.count(), 12)
+        self.assertEqual([p.name for p in product_ranking.with_rank(Product.objects.all())],
+                         ['EliteBook 840', 'Latitude 5490', 'Inspiron 3520', 'ThinkPad T480'])
+
+
+class StockAgeingTests(TestCase):
+    """A batch exactly on a bucket edge counts in the younger bucket; the last bucket starts the day after the last edge."""
+
+    def setUp(self):
+        self.today = date(2026, 3, 31)
+        self.product = Product.objects.create(name='ThinkPad T480', category=Category.objects.create(name='Laptops'),
+                                              purchase_price=Decimal('100.00'))
+
+    def test_bucket_labels(self):
+        self.assertEqual(stock_ageing.bucket_labels(), ['0-30', '31-60', '61-90', '91-180', '181+'])
+
+    def test_bucket_edges(self):
+        for days_ago, quantity in [(0, 1), (30, 2), (31, 4), (180, 8), (181, 16)]:
+            produce(self.product, quantity, 500, 600, production_date=self.today - timedelta(days=days_ago))
+        (row,) = stock_ageing.ageing(today=self.today)
+        self.assertEqual(row['buckets'], [3, 4, 0, 8, 16])
+        self.assertEqual((row['total'], row['value'], row['age_days']), (31, Decimal('3100.00'), 181))
+        (row,) = stock_ageing.ageing(older_than=180, today=self.today)
+        self.assertEqual(row['buckets'], [0, 0, 0, 0, 16])
@@ -0,0 +1,175 @@
+import csv
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import DurationField, ExpressionWrapper, F, Q, Value
+from django.utils import timezone
+
+from .models import Attendance, AttendanceSummary
+
+
+PERIODS = ('week', 'month')
+
+
+def period_start(day, period):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())  # weeks start on Monday
+    return day.replace(day=1)
+
+
+def period_end(start, period):
+    """Last day of the period starting at `start`."""
+    if period == 'week':
+        return start + timedelta(days=6)
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+# --- attendance writes --------------------------------------------------------
+
+def record_check_in(user, when=None):
+    """
+    Open today's attendance in one INSERT ... ON CONFLICT DO NOTHING; a second
+    login on the same day keeps the first check-in.
+    """
+    when = when or timezone.now()
+    day = when.date()
+    Attendance.objects.bulk_create(
+        [Attendance(user=user, date=day, check_in=when)],
+        ignore_conflicts=True,
+    )
+    refresh_timesheet(user.id, day)
+
+
+def record_check_out(user, when=None):
+    """
+    Close today's attendance in one UPDATE, computing working_hours in SQL.
+    Only the first logout of the day is recorded, as before.
+    """
+    when = when or timezone.now()
+    day = when.date()
+    updated = Attendance.objects.filter(
+        user=user, date=day, check_in__isnull=False, check_out__isnull=True,
+    ).update(
+        check_out=when,
+        working_hours=ExpressionWrapper(Value(when) - F('check_in'), output_field=DurationField()),
+    )
+    if updated:
+        refresh_timesheet(user.id, day)
+
+
+# --- rollups -----------------------------------------------------------------
+
+def _summarize(rows, now):
+    """rows: (user_id, date, working_hours, check_out) -> AttendanceSummary objects."""
+    totals = defaultdict(lambda: [0, 0, timedelta()])
+    for user_id, day, working_hours, check_out in rows:
+        for period in PERIODS:
+            entry = totals[(user_id, period, period_start(day, period))]
+            entry[0] += 1
+            if check_out is None:
+                entry[1] += 1
+            entry[2] += working_hours or timedelta()
+
+    return [
+        AttendanceSummary(
+            user_id=user_id, period=period, period_start=start,
+            days_present=days, open_days=open_days, working_hours=hours, refreshed_at=now,
+        )
+        for (user_id, period, start), (days, open_days, hours) in totals.items()
+    ]
+
+
+def rebuild_timesheets(days=None):
+    """
+    Recompute the week and month rows touched by the given (user_id, date)
+    pairs, or every row when `days` is None. One attendance query, one upsert.
+    """
+    now = timezone.now()
+    attendance = Attendance.objects.all()
+
+    affected = None
+    if days is not None:
+        if not days:
+            return 0
+        affected = {(user_id, period, period_start(day, period)) for user_id, day in days for period in PERIODS}
+        condition = Q()
+        for user_id, period, start in affected:
+            condition |= Q(user_id=user_id, date__range=(start, period_end(start, period)))
+        attendance = attendance.filter(condition)
+
+    summaries = _summarize(attendance.values_list('user_id', 'date', 'working_hours', 'check_out').iterator(), now)
+    if affected is not None:
+        # Neighbouring periods pulled in by the date ranges are already correct.
+        summaries = [s for s in summaries if (s.user_id, s.period, s.period_start) in affected]
+
+    AttendanceSummary.objects.bulk_create(
+        summaries,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user', 'period', 'period_start'],
+        update_fields=['days_present', 'open_days', 'working_hours', 'refreshed_at'],
+    )
+    if days is None:
+        AttendanceSummary.objects.filter(refreshed_at__lt=now).delete()
+    return len(summaries)
+
+
+def refresh_timesheet(user_id, day):
+    rebuild_timesheets({(user_id, day)})
+
+
+def ensure_timesheets():
+    """Build the rollups once for installs that predate them."""
+    if not AttendanceSummary.objects.exists() and Attendance.objects.exists():
+        rebuild_timesheets()
+
+
+# --- CSV export --------------------------------------------------------------
+
+class _Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller."""
+    def write(self, value):
+        return value
+
+
+def _hours(duration):
+    return f"{duration.total_seconds() / 3600:.2f}" if duration else "0.00"
+
+
+def timesheet_rows(period, start, end, user_id=None):
+    """
+    Yield CSV rows (header first) for day/week/month totals between two dates,
+    streaming from the database in chunks.
+    """
+    if period == 'day':
+        qs = Attendance.objects.filter(date__range=(start, end))
+        if user_id:
+            qs = qs.filter(user_id=user_id)
+        yield ['Date', 'Username', 'Full Name', 'Check In', 'Check Out', 'Working Hours']
+        for row in qs.order_by('date', 'user__username').values_list(
+            'date', 'user__username', 'user__first_name', 'user__last_name', 'check_in', 'check_out', 'working_hours',
+        ).iterator(chunk_size=2000):
+            day, username, first, last, check_in, check_out, hours = row
+            yield [
+                day.isoformat(), username, f"{first} {last or ''}".strip(),
+                timezone.localtime(check_in).strftime('%H:%M:%S') if check_in else '',
+                timezone.localtime(check_out).strftime('%H:%M:%S') if check_out else '',
+                _hours(hours),
+            ]
+        return
+
+    qs = AttendanceSummary.objects.filter(period=period, period_start__range=(period_start(start, period), end))
+    if user_id:
+        qs = qs.filter(user_id=user_id)
+    yield ['Period Start', 'Username', 'Full Name', 'Days Present', 'Open Days', 'Working Hours']
+    for row in qs.order_by('period_start', 'user__username').values_list(
+        'period_start', 'user__username', 'user__first_name', 'user__last_name', 'days_present', 'open_days', 'working_hours',
+    ).iterator(chunk_size=2000):
+        start_day, username, first, last, days, open_days, hours = row
+        yield [start_day.isoformat(), username, f"{first} {last or ''}".strip(), days, open_days, _hours(hours)]
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    return (writer.writerow(row) for row in rows)
@@ -11,9 +11,11 @@ urlpatterns = [
     path('resend-otp/', resend_otp, name='resend_otp'),
     path('reset-password/', reset_password, name='reset_password'),
     path('attendance/',attendance,name='attendance'),
+    path('attendance/export/', attendance_export, name='attendance_export'),
    
     # admin
     path('dashboard/',dashboard,name='dashboard'),
+    path('dashboard/metrics/',dashboard_metrics_api,name='dashboard_metrics'),
     path('profile/',profile,name='profile'),
 
     path('role/table/', role_table, name='role_table'),
@@ -39,8 +41,15 @@ urlpatterns = [
     path('vendor/edit/<int:id>/', edit_vendor, name='edit_vendor'),
     path('vendor/delete/<int:id>/', delete_vendor, name='delete_vendor'),
     path('vendor/details/<int:vendor_id>/', view_vendor, name='view_vendor'),
+    path('vendor/<int:vendor_id>/pay/', pay_vendor, name='pay_vendor'),
 
     path('inventory/', inventory_table, name='inventory_table'),
+    path('inventory/reorder-plan/', component_reorder_plan, name='component_reorder_plan'),
+    path('inventory/ageing/', stock_ageing_report, name='stock_ageing_report'),
+    path('inventory/locations/', location_table, name='location_table'),
+    path('inventory/locations/add/', add_location, name='add_location'),
+    path('inventory/locations/transfer/', transfer_stock, name='transfer_stock'),
+    path('inventory/locations/<int:location_id>/stock/', location_stock_api, name='location_stock_api'),
     
     path('products/', product_table, name='product_table'),
     path('add/product/', add_product, name='add_product'),
@@ -68,12 +77,16 @@ urlpatterns = [
 
     path('purchase/order/list/',purchase_order_table,name='purchase_order_table'),
     path('add-purchase-order/', add_purchase_order, name='add_purchase_order'),
+    path('purchase/order/<int:order_id>/receive/', receive_purchase_order, name='receive_purchase_order'),
 
     path('get-product-details/<int:product_id>/', get_product_details, name='get_product_details'),
+    path('fifo-batches/<int:product_id>/', fifo_batches_api, name='fifo_batches_api'),
 
 
 
     path('get-customer-details/<int:customer_id>/', get_customer_details, name='get_customer_details'),
+    path('autocomplete/customers/', autocomplete_customers, name='autocomplete_customers'),
+    path('autocomplete/products/', autocomplete_products, name='autocomplete_products'),
 
     path("checkin-checkout/", checkin_checkout_list, name="checkin_checkout_list"),
     path("salesman/visits/", salesman_visit_list, name="salesman_visit_list"),
@@ -83,6 +96,10 @@ urlpatterns = [
     path('gstin-details/', gstin_details, name='gstin_details'),
     path('check_customer_exists/', check_customer_exists, name='check_customer_exists'),
 
+    path('search/', global_search, name='global_search'),
+    path('reports/margins/', margin_report_api, name='margin_report_api'),
+    path('reports/trends/', sales_trend_api, name='sales_trend_api'),
+
     path('reports/orders/', order_reports_view, name='order_reports'),
     path('reports/customers/', customer_reports , name='customer_reports'),
     path("customer/<int:customer_id>/report/", customer_report_view, name="customer_report"),
@@ -26,37 +26,44 @@ from num2words import num2words
 from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth.hashers import check_password
+from .permissions import PERMISSION_FIELDS, get_user_and_permissions, requires
+from . import login_guard
+import math
+from .timesheets import ensure_timesheets, period_end, record_check_in, record_check_out, stream_csv, timesheet_rows
+from django.http import StreamingHttpResponse
+from django.utils.crypto import constant_time_compare, salted_hmac
 
 def login(request):
     if request.method == 'POST':
-        username = request.POST.get('username')
-        password = request.POST.get('password')
+        username = request.POST.get('username', '').strip()
+        password = request.POST.get('password', '')
+        ip = login_guard.client_ip(request)
         print("Username entered:", username)
-        print("Password entered:", password)
 
-        try:
-            user = User.objects.get(username=username)
-            print("User:", user)
-
-            if check_password(password, user.password):
-                # ✅ Save session
-                request.session['current_user'] = user.username
-
-                # ✅ Create / update attendance record for today (check-in)
-                today = timezone.now().date()
-                attendance, created = Attendance.objects.get_or_create(user=user, date=today)
-                if not attendance.check_in:  # avoid duplicate check-in
-                    attendance.check_in = timezone.now()
-                    attendance.save()
-
-                messages.success(request, 'Login Success')
-                return redirect('dashboard')  # generic dashboard
-            else:
-                messages.error(request, 'Invalid username or password')
-        except User.DoesNotExist:
-            print("User does not exist with username:", username)
-            messages.error(request, 'User Does Not exist')
+        # ✅ Throttled attempts are refused before any DB lookup or password hashing
+        wait = login_guard.retry_after(username, ip)
+        if wait:
+            messages.error(request, f'Too many login attempts. Try again in {math.ceil(wait / 60)} minute(s).')
+            return redirect('login')
+
+        user = login_guard.authenticate(username, password)
+        if user:
+            login_guard.reset(username)
+
+            # ✅ Save session; an existing key is replaced (session fixation), a new one is created once on save
+            if request.session.session_key:
+                request.session.cycle_key()
+            request.session['current_user'] = user.username
+
+            # ✅ Create attendance record for today (check-in), one upsert
+            record_check_in(user)
+
+            messages.success(request, 'Login Success')
+            return redirect('dashboard')  # generic dashboard
 
+        # Same message for unknown users and wrong passwords
+        login_guard.record_failure(username, ip)
+        messages.error(request, 'Invalid username or password')
         return redirect('login')
 
     else:
@@ -70,18 +77,10 @@ def logout(request):
     current_user = request.session.get('current_user')
 
     if current_user:
-        try:
-            user = User.objects.get(username=current_user)
-
+        user = User.objects.filter(username=current_user).first()
+        if user:
             # ✅ Update today's attendance with checkout time
-            today = timezone.now().date()
-            attendance = Attendance.objects.filter(user=user, date=today).first()
-            if attendance and not attendance.check_out:
-                attendance.check_out = timezone.now()
-                attendance.save()
-
-        except User.DoesNotExist:
-            pass
+            record_check_out(user)
 
     # ✅ Clear session
     request.session.flush()
@@ -93,38 +92,76 @@ def attendance(request):
     if not current_user:
         return redirect('login')
 
-    # ✅ If Admin → show all attendance
-    if current_user.role.name.lower() == "admin":
-        attendance_records = Attendance.objects.select_related("user").order_by("-date", "-check_in")
-    else:
-        # ✅ Otherwise → show only current user's attendance
-        attendance_records = Attendance.objects.filter(user=current_user).order_by("-date", "-check_in")
+    is_admin = current_user.role and current_user.role.name.lower() == "admin"
+    month_start, month_end = _selected_month(request)
+    ensure_timesheets()
+
+    # ✅ One month at a time; admins see everyone, others only themselves
+    attendance_records = Attendance.objects.filter(date__range=(month_start, month_end)).select_related("user")
+    summaries = AttendanceSummary.objects.select_related("user")
+    if not is_admin:
+        attendance_records = attendance_records.filter(user=current_user)
+        summaries = summaries.filter(user=current_user)
 
     context = {
         'current_user': current_user,
         'role_permission': role_permission,
-        'attendance_records': attendance_records,
+        'attendance_records': attendance_records.order_by("-date", "-check_in"),
+        'monthly_summaries': summaries.filter(period='month', period_start=month_start).order_by("user__first_name"),
+        'weekly_summaries': summaries.filter(
+            period='week', period_start__range=(month_start - datetime.timedelta(days=6), month_end)
+        ).order_by("period_start", "user__first_name"),
+        'selected_month': month_start.strftime('%Y-%m'),
     }
     return render(request, 'company_admin/attendance.html', context)
 
 
+def _selected_month(request):
+    """(first day, last day) of ?month=YYYY-MM, defaulting to the current month."""
+    try:
+        month_start = dt.strptime(request.GET.get('month', ''), '%Y-%m').date()
+    except ValueError:
+        month_start = timezone.now().date().replace(day=1)
+    return month_start, period_end(month_start, 'month')
 
-def get_logged_in_user(request):
-    username = request.session.get('current_user')
-    if not username:
-        return None, None  # always return a tuple
 
+def attendance_export(request):
+    current_user, role_permission = get_logged_in_user(request)
+    if not current_user:
+        return redirect('login')
+
+    period = request.GET.get('period', 'day')
+    if period not in ('day', 'week', 'month'):
+        period = 'day'
+    month_start, month_end = _selected_month(request)
     try:
-        user = User.objects.get(username=username)
-        try:
-            role_permission = RolePermissions.objects.get(role=user.role)
-        except RolePermissions.DoesNotExist:
-            role_permission = None
-        return user, role_permission
-    except User.DoesNotExist:
-        return None, None 
+        start = dt.strptime(request.GET['from'], '%Y-%m-%d').date()
+        end = dt.strptime(request.GET['to'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        start, end = month_start, month_end
+
+    is_admin = current_user.role and current_user.role.name.lower() == "admin"
+    if period != 'day':
+        ensure_timesheets()
+    rows = timesheet_rows(period, start, end, user_id=None if is_admin else current_user.id)
+
+    # ✅ Streamed row by row, so large ranges never sit in memory
+    response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="timesheet_{period}_{start}_{end}.csv"'
+    return response
+
+
+def get_logged_in_user(request):
+    # ✅ One user query; permissions come from the compiled, cached role mask
+    return get_user_and_permissions(request)
+
 
 
+def _otp_digest(email, otp):
+    # Only a keyed digest of the OTP goes into the session: with signed-cookie
+    # sessions the session content is readable by the browser.
+    return salted_hmac('password-reset-otp', f"{email}:{otp}").hexdigest()
+
 
 def forgot_password(request):
     if request.method == 'POST':
@@ -135,7 +172,7 @@ def forgot_password(request):
             # Generate and store OTP in session
             otp = random.randint(100000, 999999)
             request.session['reset_email'] = email
-            request.session['otp'] = otp
+            request.session['otp'] = _otp_digest(email, otp)
             request.session['otp_expiry'] = (
                 datetime.datetime.now() + datetime.timedelta(minutes=5)
             ).isoformat()
@@ -160,8 +197,8 @@ def forgot_password(request):
 
 def verify_otp(request):
     if request.method == 'POST':
-        entered_otp = request.POST.get('otp')
-        session_otp = str(request.session.get('otp'))
+        entered_otp = (request.POST.get('otp') or '').strip()
+        session_otp = request.session.get('otp') or ''
         otp_expiry_str = request.session.get('otp_expiry')
 
         # Convert expiry time to datetime object
@@ -179,7 +216,7 @@ def verify_otp(request):
             messages.error(request, "OTP has expired. Please request a new OTP.")
             return redirect('resend_otp')
 
-        if entered_otp == session_otp:
+        if constant_time_compare(_otp_digest(request.session.get('reset_email'), entered_otp), session_otp):
             messages.success(request, "OTP verified successfully. You can now reset your password.")
             return redirect('reset_password')
         else:
@@ -196,7 +233,7 @@ def resend_otp(request):
 
     # Generate a new OTP
     otp = random.randint(100000, 999999)
-    request.session['otp'] = otp
+    request.session['otp'] = _otp_digest(email, otp)
     request.session['otp_expiry'] = (
         datetime.datetime.now() + datetime.timedelta(minutes=5)
     ).isoformat()
@@ -364,12 +401,28 @@ from django.db.models.functions import TruncDate
 #         }
 #         return render(request, 'company_admin/dashboard.html', context)
 
+from .dashboard_metrics import is_salesman, metrics_for
+
+
 def dashboard(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
         return redirect('login')
 
-    return render(request, 'company_admin/dashboard.html', {'current_user': current_user, 'role_permission':role_permission})
+    # ✅ Only the page shell; the figures are fetched from dashboard_metrics_api
+    template = 'company_admin/salesman_dashboard.html' if is_salesman(current_user) else 'company_admin/dashboard.html'
+    return render(request, template, {'current_user': current_user, 'role_permission':role_permission})
+
+
+@requires("dashboard", "v", json=True)
+def dashboard_metrics_api(request):
+    current_user, role_permission = get_logged_in_user(request)
+
+    # 🔹 Role-scoped and cached for a short while; see dashboard_metrics._cached
+    metrics = metrics_for(current_user)
+    if metrics is None:
+        return JsonResponse({"error": "Permission denied"}, status=403)
+    return JsonResponse(metrics)
 
 @csrf_exempt
 def profile(request):
@@ -397,6 +450,7 @@ def profile(request):
     return render(request, 'accounts/profile.html', {'current_user': current_user, 'role_permission':role_permission})
 
 
+@requires("users", "v")
 def user_table(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -444,6 +498,7 @@ def send_welcome_email(user, password):
 
 
 
+@requires("users", "a")
 def add_user(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -453,7 +508,8 @@ def add_user(request):
     context = {
         'current_user': current_user,
         'role_permission': role_permission,
-        'roles': roles
+        'roles': roles,
+        'locations': Location.objects.filter(is_active=True)
     }
 
     if request.method == 'POST':
@@ -495,7 +551,8 @@ def add_user(request):
             state=state,
             pincode=pincode,
             is_active=is_active,
-            profile_picture=profile_picture
+            profile_picture=profile_picture,
+            home_location_id=request.POST.get('home_location') or None
         )
         user.save()
 
@@ -509,6 +566,7 @@ def add_user(request):
 
 
 
+@requires("users", "e")
 def edit_user(request, id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -521,7 +579,8 @@ def edit_user(request, id):
         'current_user': current_user,
         'role_permission': role_permission,
         'edit_user': user,
-        'roles': roles
+        'roles': roles,
+        'locations': Location.objects.filter(is_active=True)
     }
 
     if request.method == 'POST':
@@ -548,6 +607,7 @@ def edit_user(request, id):
         user.state = request.POST['state']
         user.pincode = request.POST['pincode']
         user.is_active = request.POST.get('is_active') == 'true'
+        user.home_location_id = request.POST.get('home_location') or None
 
         # ✅ Update role
         role_id = request.POST.get('role')
@@ -570,6 +630,7 @@ def edit_user(request, id):
 
 
 
+@requires("users", "d")
 def delete_user(request, id):
     current_user = get_logged_in_user(request)
     if not current_user:
@@ -580,6 +641,7 @@ def delete_user(request, id):
     return redirect('user_table')
 
 
+@requires("customer", "v")
 def customer_table(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -703,6 +765,7 @@ def fetch_gstin_details(gstin: str):
     except Exception as e:
         return {"success": False, "message": str(e)}
 
+@requires("customer", "v", json=True)
 @csrf_exempt
 @require_POST
 def gstin_details(request):
@@ -715,6 +778,9 @@ def gstin_details(request):
     return JsonResponse(data, status=200 if data.get("success") else 400)
 
 
+from .customer_dedupe import find_duplicate_customers, normalize_gst, normalize_name, normalize_address
+
+@requires("customer", "v", json=True)
 @csrf_exempt
 @require_POST
 def check_customer_exists(request):
@@ -726,17 +792,27 @@ def check_customer_exists(request):
     query = Customer.objects.all()
     exists = False
 
-    if gst_number:
-        exists = query.filter(gst_number__iexact=gst_number).exists()
+    # ✅ Exact matches go through the indexed normalized keys
+    gst_key = normalize_gst(gst_number)
+    if gst_key:
+        exists = query.filter(gst_key=gst_key).exists()
 
     if not exists and shop_name and shop_address:
         exists = query.filter(
-            shop_name__iexact=shop_name,
-            shop_address__iexact=shop_address
+            name_key=normalize_name(shop_name),
+            address_key=normalize_address(shop_address)
         ).exists()
 
-    return JsonResponse({"exists": exists})
+    # ✅ Near-duplicates ("Sri Ram Electronics" vs "Sriram Electronics")
+    duplicates = find_duplicate_customers(
+        shop_name=shop_name,
+        shop_address=shop_address,
+        gst_number=gst_number,
+    )
+
+    return JsonResponse({"exists": exists, "duplicates": duplicates})
 
+@requires("customer", "a")
 def add_customer(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -846,6 +922,7 @@ def add_customer(request):
     return render(request, 'accounts/add_customer.html', context)
 
 
+@requires("customer", "e")
 def edit_customer(request, id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -903,6 +980,7 @@ def edit_customer(request, id):
     return render(request, 'accounts/add_customer.html', context)
 
 
+@requires("customer", "d")
 def delete_customer(request, id):
     current_user = get_logged_in_user(request)
     if not current_user:
@@ -913,6 +991,7 @@ def delete_customer(request, id):
     return redirect('customer_table')
 
 
+@requires("roles", "v")
 def role_table(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -922,6 +1001,7 @@ def role_table(request):
     return render(request, 'accounts/role_table.html',context )
 
 
+@requires("roles", "a")
 def add_role(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -943,6 +1023,7 @@ def add_role(request):
     return render(request, 'accounts/add_role.html', context)
 
 
+@requires("roles", "e")
 def edit_role(request, id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -969,6 +1050,7 @@ def edit_role(request, id):
     context = {"edit_role": role, 'current_user': current_user, 'role_permission': role_permission}
     return render(request, 'accounts/add_role.html', context)
 
+@requires("roles", "d")
 def delete_role(request, id):
     current_user = get_logged_in_user(request)
     if not current_user:
@@ -978,6 +1060,7 @@ def delete_role(request, id):
     messages.success(request, "role deleted successfully")
     return redirect('role_table')
 
+@requires("roles", "e")
 def role_permissions(request, role_id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -988,9 +1071,8 @@ def role_permissions(request, role_id):
 
     if request.method == 'POST':
 
-        for field in RolePermissions._meta.get_fields():
-            if field.name not in ['id', 'role']:
-                setattr(permissions, field.name, field.name in request.POST)
+        for name in PERMISSION_FIELDS:
+            setattr(permissions, name, name in request.POST)
 
         permissions.save()
         messages.success(request, "Permissions updated successfully.")
@@ -1003,6 +1085,7 @@ def role_permissions(request, role_id):
         'role_permission': role_permission
     })
 
+@requires("category", "v")
 def category_table(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1012,6 +1095,7 @@ def category_table(request):
     return render(request, 'company_admin/category_table.html',context)
 
 
+@requires("category", "a")
 def add_category(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1034,6 +1118,7 @@ def add_category(request):
     return render(request, 'company_admin/add_category.html', context)
 
 
+@requires("category", "e")
 def edit_category(request,id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1054,6 +1139,7 @@ def edit_category(request,id):
     return render(request, 'company_admin/add_category.html', context)
 
 
+@requires("category", "d")
 def delete_category(request,id):
     current_user = get_logged_in_user(request)
     if not current_user:
@@ -1065,17 +1151,23 @@ def delete_category(request,id):
     return redirect('category_table')
     
 
+from .product_ranking import PRIMARY_WINDOW, with_rank
+
+
+@requires("all_products", "v")
 def product_table(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
         return redirect('login')
-    products = Product.objects.all()
-    context = {'products':products,'current_user':current_user, 'role_permission': role_permission}
+    # ✅ Fast movers first, ranked by refresh_product_ranks
+    products = with_rank(Product.objects.select_related('category'))
+    context = {'products':products,'rank_window': PRIMARY_WINDOW,'current_user':current_user, 'role_permission': role_permission}
     return render(request, 'company_admin/product_table.html',context)
 
 
 from decimal import Decimal
 
+@requires("all_products", "a")
 def add_product(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1138,6 +1230,7 @@ def add_product(request):
     }
     return render(request, 'company_admin/add_product.html', context)
 
+@requires("all_products", "e")
 def edit_product(request, id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1180,6 +1273,7 @@ def edit_product(request, id):
     }
     return render(request, 'company_admin/add_product.html', context)
 
+@requires("all_products", "d")
 def delete_product(request, id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1191,6 +1285,7 @@ def delete_product(request, id):
 
 
 
+@requires("inventory", "v")
 def inventory_table(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1207,7 +1302,132 @@ def inventory_table(request):
     return render(request, 'company_admin/inventory_table.html', context)
 
 
+from django.db.models import Max
+from .stock_ageing import GROUPS as AGEING_GROUPS, ageing, bucket_labels
+from .reorder_planner import suggested_orders
+
+
+@requires("inventory", "v")
+def component_reorder_plan(request):
+    current_user, role_permission = get_logged_in_user(request)
+    if not current_user:
+        return redirect('login')
+
+    # ✅ Reads what plan_component_reorders stored; nothing is recomputed per request
+    context = {
+        'groups': suggested_orders(),
+        'planned_at': ComponentReorderPlan.objects.aggregate(last=Max('planned_at'))['last'],
+        'current_user': current_user,
+        'role_permission': role_permission
+    }
+    return render(request, 'company_admin/component_reorder_plan.html', context)
+
+
+@requires("inventory", "v")
+def stock_ageing_report(request):
+    current_user, role_permission = get_logged_in_user(request)
+    if not current_user:
+        return redirect('login')
+
+    group = request.GET.get('group', 'product')
+    if group not in AGEING_GROUPS:
+        group = 'product'
+    try:
+        older_than = max(int(request.GET.get('older_than') or 0), 0)
+    except ValueError:
+        older_than = 0
+
+    # 🔹 Only batches still holding stock are read (batch_in_stock_idx), oldest first
+    context = {
+        'rows': ageing(group, older_than=older_than),
+        'labels': bucket_labels(),
+        'group': group,
+        'older_than': older_than,
+        'current_user': current_user,
+        'role_permission': role_permission
+    }
+    return render(request, 'company_admin/stock_ageing.html', context)
+
+
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from .locations import available, transfer
 
+
+@requires("inventory", "v")
+def location_table(request):
+    current_user, role_permission = get_logged_in_user(request)
+    if not current_user:
+        return redirect('login')
+
+    # ✅ Units per store room in one grouped read
+    locations = Location.objects.annotate(
+        units=Coalesce(Sum('batch_stock__quantity'), 0),
+        product_count=Count('batch_stock__product', distinct=True, filter=Q(batch_stock__quantity__gt=0)),
+    )
+    transfers = (StockTransfer.objects.select_related('from_location', 'to_location', 'created_by')
+                 .annotate(units=Sum('lines__quantity'), product_name=Max('lines__product__name'))[:20])
+
+    context = {
+        'locations': locations,
+        'transfers': transfers,
+        'current_user': current_user,
+        'role_permission': role_permission
+    }
+    return render(request, 'company_admin/location_table.html', context)
+
+
+@requires("inventory", "a")
+def add_location(request):
+    if request.method == 'POST':
+        name = request.POST.get('name', '').strip()
+        if not name:
+            messages.error(request, "Location name is required.")
+        elif Location.objects.filter(name__iexact=name).exists():
+            messages.error(request, "A location with this name already exists.")
+        else:
+            Location.objects.create(
+                name=name,
+                address=request.POST.get('address', '').strip(),
+                is_default=not Location.objects.filter(is_default=True).exists(),
+            )
+            messages.success(request, f"Location {name} added.")
+    return redirect('location_table')
+
+
+@requires("inventory", "e")
+def transfer_stock(request):
+    current_user, role_permission = get_logged_in_user(request)
+
+    if request.method == 'POST':
+        from_location = get_object_or_404(Location, id=request.POST.get('from_location'))
+        to_location = get_object_or_404(Location, id=request.POST.get('to_location'), is_active=True)
+        product = get_object_or_404(Product, id=request.POST.get('product'))
+        try:
+            move = transfer(
+                from_location, to_location, product, request.POST.get('quantity') or 0,
+                user=current_user, remarks=request.POST.get('remarks', '').strip(),
+            )
+            messages.success(request, f"Moved {product.name} from {from_location.name} to {to_location.name} (transfer #{move.id}).")
+        except (ValidationError, ValueError) as e:
+            messages.error(request, '; '.join(e.messages) if isinstance(e, ValidationError) else "Quantity must be a number.")
+    return redirect('location_table')
+
+
+@requires("inventory", "v", json=True)
+def location_stock_api(request, location_id):
+    location = get_object_or_404(Location, id=location_id)
+    try:
+        product_ids = [int(p) for p in request.GET.getlist('product')] or None
+    except ValueError:
+        return JsonResponse({"error": "product must be an id"}, status=400)
+
+    # 🔹 One read of the (location, product, batch) index
+    return JsonResponse({"location": location.id, "stock": available(location.id, product_ids)})
+
+
+
+@requires("daily_production", "v")
 def daily_production_table(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1217,6 +1437,11 @@ def daily_production_table(request):
     return render(request, 'company_admin/daily_production_table.html',context)
 
 
+from .locations import restock
+from .work_orders import produce
+
+
+@requires("daily_production", "a")
 def add_daily_production(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1247,33 +1472,33 @@ def add_daily_production(request):
             # convert stock_in to integer
             stock_in = int(stock_in) if stock_in else 0
             weight_per_packet = float(weight_per_packet) if weight_per_packet else 0
-            sale_price = float(sale_price) if sale_price else 0
-            mrp = float(mrp) if mrp else 0
-
-            production = DailyProduction(
-                product=product,
-                refurbished_date=refurbished_date,
-                stock_in=stock_in,
+            sale_price = safe_decimal(sale_price)
+            mrp = safe_decimal(mrp)
+
+            # ✅ One work order: consumes the bill of materials, costs the batch and stocks it in
+            production = produce(
+                product,
+                stock_in,
+                sale_price,
+                mrp,
                 serial_number=serial_number,
-                sale_price=sale_price,
-                mrp=mrp
+                production_date=refurbished_date or None,
+                user=current_user,
+                remarks=request.POST.get('remarks', ''),
+                location=Location.objects.filter(id=request.POST.get('location') or None, is_active=True).first(),
             )
 
-            inventory, _ = Inventory.objects.get_or_create(product=product)
-            inventory.stock_in += stock_in  # ✅ safe now
-            inventory.update_stock()
-            production.save()
-            
-            messages.success(request, "Daily production added successfully!")
+            messages.success(request, f"Daily production added successfully! Unit cost ₹{production.unit_cost}.")
         except ValidationError as e:
-            messages.error(request, str(e))  
+            messages.error(request, '; '.join(e.messages))
 
         return redirect("daily_production_table")
 
-    context = {'products': products, 'current_user': current_user, 'role_permission': role_permission}
+    context = {'products': products, 'locations': Location.objects.filter(is_active=True), 'current_user': current_user, 'role_permission': role_permission}
     return render(request, 'company_admin/add_daily_production.html', context)
 
 
+@requires("daily_production", "e")
 def edit_daily_production(request, id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1303,29 +1528,36 @@ def edit_daily_production(request, id):
 
             new_product = get_object_or_404(Product, id=new_product_id)
 
-            # ✅ Adjust inventory: remove old stock_in first
-            old_inventory, _ = Inventory.objects.get_or_create(product=daily_production.product)
-            old_inventory.stock_in -= daily_production.stock_in
-            old_inventory.update_stock()
-
-            # ✅ Update production fields
-            daily_production.product = new_product
-            daily_production.stock_in = new_stock_in
-            daily_production.serial_number = new_serial_number
-            daily_production.sale_price = new_sale_price
-            daily_production.mrp = new_mrp
-            daily_production.refurbished_date = new_refurbished_date
-            daily_production.weight_per_packet = new_weight
-            daily_production.save()
-
-            # ✅ Update new inventory with latest stock_in
-            new_inventory, _ = Inventory.objects.get_or_create(product=new_product)
-            new_inventory.stock_in += new_stock_in
-            new_inventory.update_stock()
+            # ✅ Location stock, both inventories and the batch change together or not at all
+            with transaction.atomic():
+                # ✅ The change lands on the location the batch was stocked into
+                restock(daily_production, new_stock_in - daily_production.stock_in, new_product)
+
+                # ✅ Adjust inventory: remove old stock_in first
+                old_inventory, _ = Inventory.objects.get_or_create(product=daily_production.product)
+                old_inventory.stock_in -= daily_production.stock_in
+                old_inventory.update_stock()
+
+                # ✅ Update production fields
+                daily_production.product = new_product
+                daily_production.stock_in = new_stock_in
+                daily_production.serial_number = new_serial_number
+                daily_production.sale_price = new_sale_price
+                daily_production.mrp = new_mrp
+                daily_production.refurbished_date = new_refurbished_date
+                daily_production.weight_per_packet = new_weight
+                daily_production.save()
+
+                # ✅ Update new inventory with latest stock_in
+                new_inventory, _ = Inventory.objects.get_or_create(product=new_product)
+                new_inventory.stock_in += new_stock_in
+                new_inventory.update_stock()
 
             messages.success(request, 'Production updated successfully.')
             return redirect('daily_production_table')
 
+        except ValidationError as e:
+            messages.error(request, '; '.join(e.messages))
         except Exception as e:
             messages.error(request, f"Error updating production: {e}")
 
@@ -1338,6 +1570,7 @@ def edit_daily_production(request, id):
     return render(request, 'company_admin/add_daily_production.html', context)
 
 
+@requires("daily_production", "d")
 def delete_daily_production(request, id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1359,6 +1592,7 @@ def delete_daily_production(request, id):
     return redirect('daily_production_table')
 
 
+@requires("orders", "v")
 def order_table(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1384,6 +1618,7 @@ def safe_decimal(value, default=Decimal('0.00')):
         return default
 
 
+@requires("orders", "a", json=True)
 def get_customer_details(request, customer_id):
     try:
         customer = Customer.objects.get(id=customer_id)
@@ -1405,6 +1640,7 @@ def get_customer_details(request, customer_id):
             'shop_pincode': '',
         })
     
+@requires("orders", "a", json=True)
 def get_product_details(request, product_id):
     try:
         prod = DailyProduction.objects.filter(product_id=product_id, stock_in__gt=0).order_by('id').first()
@@ -1421,6 +1657,24 @@ def get_product_details(request, product_id):
         return JsonResponse({"error": str(e)}, status=500)   
 
 
+from .autocomplete import complete_customers, complete_products, customer_option, parse_limit
+
+
+@requires("orders", "a", json=True)
+def autocomplete_customers(request):
+    current_user, role_permission = get_logged_in_user(request)
+    query = request.GET.get('q', '').strip()
+    limit = parse_limit(request.GET.get('limit'))
+    return JsonResponse({"query": query, "results": complete_customers(current_user, query, limit)})
+
+
+@requires("orders", "a", json=True)
+def autocomplete_products(request):
+    query = request.GET.get('q', '').strip()
+    limit = parse_limit(request.GET.get('limit'))
+    return JsonResponse({"query": query, "results": complete_products(query, limit)})
+
+
 def send_order_email(order):
     """
     Send confirmation email to customer and assigned salesman when an order is placed.
@@ -1492,6 +1746,7 @@ def check_salesman_checked_in(user, request):
             return redirect("checkin_checkout_list")
     return None
 
+@requires("orders", "a")
 def add_order(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1501,8 +1756,8 @@ def add_order(request):
     if checkin_redirect:
         return checkin_redirect
 
-    active_visit = SalesmanVisit.objects.filter(salesman=current_user, is_active=True).last()
-    preselected_customer_id = active_visit.customer.id if active_visit and active_visit.customer else None    
+    active_visit = SalesmanVisit.objects.filter(salesman=current_user, is_active=True).select_related('customer').last()
+    preselected_customer = customer_option(active_visit.customer) if active_visit and active_visit.customer else None
 
     if request.method == 'POST':
         customer_id = request.POST.get('customer')
@@ -1601,23 +1856,16 @@ def add_order(request):
             return redirect('add_order')
 
     # GET request
-    products = Product.objects.filter(product_type='REFURBISHED')
-
-    if current_user.role.name.lower() == "admin":
-        customers = Customer.objects.all()
-    else:
-        customers = Customer.objects.filter(user=current_user)
-
+    # 🔹 Customers and products are picked through the autocomplete endpoints, not embedded in the page
     return render(request, 'company_admin/add_order.html', {
-        'products': products,
-        'customers': customers,
         'current_user': current_user,
         'role_permission': role_permission,
-        'preselected_customer_id': preselected_customer_id,
+        'preselected_customer': preselected_customer,
     })
 
 
 
+@requires("orders", "d")
 def delete_order(request, order_id):
     order = get_object_or_404(SalesOrder, id=order_id)
 
@@ -1640,47 +1888,36 @@ def delete_order(request, order_id):
     return redirect('order_table')
 
 
-def fifo_batch1(request, product_id, weight):
-    # Fetch batches in FIFO order
-    batches = DailyProduction.objects.filter(
-        product_id=product_id,
-        weight_per_packet=weight,
-        current_stock__gt=0  # Only available stock
-    ).order_by("manufactured_date", "id")
+from .stock_ageing import fifo_batches
 
-    if not batches.exists():
-        return JsonResponse({"error": "No stock available"}, status=404)
 
-    # Prepare batch info with available quantity
-    batch_list = []
-    total_qty = 0
-    for b in batches:
-        available_qty = b.current_stock  # stock_in - stock_out
-        total_qty += available_qty
-        batch_list.append({
-            "id": b.id,
-            "batch_number": b.batch_number,
-            "manufactured_date": str(b.manufactured_date),
-            "expiry_date": str(b.expiry_date),
-            "sale_price": float(b.sale_price),
-            "mrp": float(b.mrp),
-            "available_qty": available_qty,
-            "weight_per_packet": float(b.weight_per_packet),
-        })
+@requires("inventory", "v", json=True)
+def fifo_batches_api(request, product_id):
+    product = get_object_or_404(Product, id=product_id)
+    try:
+        location_id = int(request.GET['location']) if request.GET.get('location') else None
+    except ValueError:
+        return JsonResponse({"error": "location must be a number"}, status=400)
 
-    # Take first batch for default selection
-    first_batch = batch_list[0]
+    # ✅ Oldest batch first, across all locations or at one (?location=<id>)
+    batches = fifo_batches(product.id, location_id)
+    if not batches:
+        return JsonResponse({"error": "No stock available"}, status=404)
 
     return JsonResponse({
-        "batches": batch_list,
-        "total_quantity": total_qty,
-        "weight_per_packet": first_batch["weight_per_packet"],
-        "sale_price": first_batch["sale_price"],
-        "mrp": first_batch["mrp"],
-        "gstpercentage": DailyProduction.objects.filter(product_id=product_id).first().product.gstpercentage,
+        "product": product.id,
+        "batches": batches,
+        "total_quantity": sum(b["available_qty"] for b in batches),
+        "sale_price": batches[0]["sale_price"],
+        "mrp": batches[0]["mrp"],
+        "gstpercentage": float(product.gstpercentage),
     })
 
 
+from .locations import allocate_order
+
+
+@requires("orders", "a")
 @transaction.atomic
 def generate_invoice(request, order_id):
     order = get_object_or_404(SalesOrder, id=order_id)
@@ -1695,41 +1932,18 @@ def generate_invoice(request, order_id):
         invoice.invoice_number = f"INV{invoice.id:03d}-ORD{order.id}"
         invoice.save(update_fields=['invoice_number'])
 
-        # ✅ FIFO deduction (increase stock_out, not decrease stock_in)
-        for item in order.items.all():
-            required_qty = item.quantity
-
-            fifo_batches = (
-                DailyProduction.objects.filter(
-                    product=item.product,
-                    current_stock__gt=0
-                ) # FIFO order
-            )
-
-            for batch in fifo_batches:
-                if required_qty <= 0:
-                    break
-
-                available = batch.current_stock
-                deduction = min(required_qty, available)
-
-                # Increase stock_out
-                batch.stock_out += deduction
-                batch.save(update_fields=["stock_out", "current_stock"])
-
-                required_qty -= deduction
-
-            if required_qty > 0:
-                raise ValueError(
-                    f"Not enough stock for product {item.product.name} "
-                    f"(needed {item.quantity}, missing {required_qty})"
-                )
+        # ✅ FIFO deduction (increase stock_out, not decrease stock_in), served from the salesman's home location first,
+        # recording which batch and location served each item
+        home_location_id = order.created_by.home_location_id if order.created_by else None
+        allocations = allocate_order(list(order.items.select_related('product')), home_location_id)
+        SaleItemBatch.objects.bulk_create(allocations)
 
     # ✅ Redirect to invoice/receipt page
     return redirect('view_receipt', order_id=order.id)
 
 
 
+@requires("orders", "a")
 def pay_remaining_amount(request, order_id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1777,6 +1991,7 @@ def pay_remaining_amount(request, order_id):
     })
 
 
+@requires("customer", "v")
 def view_customer(request, customer_id):
     current_user, role_permission= get_logged_in_user(request)
     if not current_user:
@@ -1794,6 +2009,7 @@ def view_customer(request, customer_id):
     return render(request, 'accounts/view_customer.html', context)
 
 
+@requires("users", "v")
 def view_user(request, user_id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1807,6 +2023,7 @@ def view_user(request, user_id):
     }
     return render(request, 'accounts/view_user.html', context)
 
+@requires("all_products", "v")
 def view_product(request, product_id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1825,6 +2042,7 @@ def view_product(request, product_id):
     }
     return render(request, 'company_admin/view_product.html', context)
 
+@requires("orders", "v")
 def view_receipt(request, order_id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1874,6 +2092,7 @@ def view_receipt(request, order_id):
     return render(request, 'company_admin/invoice.html', context)
 
 
+@requires("s_reports", "v")
 def order_reports_view(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1946,6 +2165,7 @@ def order_reports_view(request):
     return render(request, 'company_admin/order_reports.html', context)
 
 
+@requires("c_reports", "v")
 def customer_reports(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -1998,6 +2218,7 @@ def customer_reports(request):
     return render(request, 'company_admin/customer_reports.html', context)
 
 
+@requires("c_reports", "v")
 def customer_report_view(request, customer_id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -2044,6 +2265,7 @@ def customer_report_view(request, customer_id):
     return render(request, "company_admin/customer_report_view.html", context)
 
 
+@requires("c_reports", "v")
 def salesman_reports(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -2091,6 +2313,7 @@ def salesman_reports(request):
 
 
 import json
+@requires("c_reports", "v")
 def salesman_report_view(request, salesman_id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -2149,7 +2372,7 @@ def get_address_from_latlng(lat, lng):
     try:
         api_key = settings.GOOGLE_MAPS_API_KEY
         url = f"https://maps.googleapis.com/maps/api/geocode/json?latlng={lat},{lng}&key={api_key}"
-        response = requests.get(url)
+        response = requests.get(url, timeout=5)
         data = response.json()
 
         if data.get("status") == "OK" and data.get("results"):
@@ -2234,21 +2457,26 @@ def checkin_checkout_list(request):
     })
 
 
+@requires("s_reports", "v")
 def salesman_visit_list(request): 
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
         return redirect("login")
 
-    visits = SalesmanVisit.objects.all()
+    visits = SalesmanVisit.objects.select_related("salesman", "customer").order_by("-check_in_time")
     salesmen = User.objects.filter(role__name__icontains="Salesman")
     customers = Customer.objects.all() 
 
+    # ✅ Summaries are kept fresh by the refresh_route_summaries cron job
+    daily_summaries = SalesmanDailySummary.objects.select_related("salesman")
+
     context = {
         "current_user": current_user,
         "role_permission": role_permission,
         "visits": visits,
         "salesmen":salesmen,
-        "customers":customers
+        "customers":customers,
+        "daily_summaries": daily_summaries,
     }
 
     return render(request, "accounts/salesman_active_check.html", context)
@@ -2257,6 +2485,7 @@ def salesman_visit_list(request):
 
 
 
+@requires("users", "v")
 def vendor_table(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -2270,6 +2499,7 @@ def vendor_table(request):
     }
     return render(request, 'accounts/vendor_table.html', context)
 
+@requires("users", "a")
 def add_vendor(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -2315,6 +2545,7 @@ def add_vendor(request):
 
     return render(request, 'accounts/add_vendor.html', context)
 
+@requires("users", "e")
 def edit_vendor(request, id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -2360,6 +2591,7 @@ def edit_vendor(request, id):
 
     return render(request, 'accounts/add_vendor.html', context)
 
+@requires("users", "d")
 def delete_vendor(request, id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -2370,24 +2602,33 @@ def delete_vendor(request, id):
     messages.success(request, 'Vendor deleted successfully.')
     return redirect('vendor_table')
 
+from .payables import allocate, open_orders, pay
+
+
+@requires("users", "v")
 def view_vendor(request, vendor_id):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
         return redirect('login')
     
     try:
-        vendor = Vendor.objects.get(id=vendor_id)
+        vendor = Vendor.objects.select_related('balance').get(id=vendor_id)
     except Vendor.DoesNotExist:
         messages.error(request, "Vendor not found")
         return redirect('vendor_table')
     
+    # ✅ Payables come from the running VendorBalance, not from adding up every PO
     context = {
         'vendor': vendor,
+        'balance': getattr(vendor, 'balance', None),
+        'open_orders': open_orders(vendor)[:20],
+        'payment_runs': vendor.payment_runs.select_related('paid_by').order_by('-payment_date')[:10],
         'current_user': current_user,
         'role_permission': role_permission
     }
     return render(request, 'accounts/view_vendor.html', context)
 
+@requires("orders", "v")
 def purchase_order_table(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -2406,6 +2647,7 @@ def purchase_order_table(request):
     return render(request, 'company_admin/purchase_order_table.html', context)
 
 
+@requires("orders", "a")
 def add_purchase_order(request):
     current_user, role_permission = get_logged_in_user(request)
     if not current_user:
@@ -2415,43 +2657,60 @@ def add_purchase_order(request):
         vendor_id = request.POST.get('vendor')
         items = request.POST.getlist('items[]')  # expects CSV strings: productId,quantity,cost_price,total_price
         remarks = request.POST.get('remarks', '')
-        grand_total = safe_decimal(request.POST.get('grand_total', '0'))
         total_paid = safe_decimal(request.POST.get('amount_paid', '0'))
 
         vendor = get_object_or_404(Vendor, id=vendor_id)
         user = get_object_or_404(User, username=current_user.username)
 
         try:
+            # 🔹 Parse every line first; each item_data should be: "productId,quantity,cost_price,total_price"
+            lines = []
+            for item_data in items:
+                try:
+                    product_id, quantity, cost_price, total_price = [p.strip() for p in item_data.split(',')]
+                except ValueError:
+                    raise ValueError(f"Invalid item format: {item_data}")
+                lines.append((int(product_id), int(float(quantity)), safe_decimal(cost_price), safe_decimal(total_price)))
+
+            products = Product.objects.in_bulk({line[0] for line in lines})
+            missing = {line[0] for line in lines} - products.keys()
+            if missing:
+                raise ValueError(f"Unknown product(s): {', '.join(map(str, sorted(missing)))}")
+
+            # ✅ The order total comes from its lines, not from the posted grand_total
+            total_amount = sum((line[3] for line in lines), Decimal('0.00'))
+
             with transaction.atomic():
                 order = PurchaseOrder.objects.create(
                     vendor=vendor,
                     created_by=user,
                     remarks=remarks,
+                    total_amount=total_amount,
                     total_paid=total_paid,
-                    balance_due=(grand_total - total_paid),
-                    payment_status='paid' if total_paid >= grand_total else 'partial' if total_paid > 0 else 'pending'
+                    balance_due=(total_amount - total_paid),
+                    payment_status='paid' if total_paid >= total_amount else 'partial' if total_paid > 0 else 'pending'
                 )
 
-                # create PurchaseItem rows
-                for item_data in items:
-                    # each item_data should be: "productId,quantity,cost_price,total_price"
-                    try:
-                        product_id, quantity, cost_price, total_price = [p.strip() for p in item_data.split(',')]
-                    except ValueError:
-                        raise ValueError(f"Invalid item format: {item_data}")
-
-                    product = get_object_or_404(Product, id=int(product_id))
-                    quantity = int(float(quantity))
-                    cost_price = safe_decimal(cost_price)
-                    total_price = safe_decimal(total_price)
-
-                    PurchaseItem.objects.create(
+                PurchaseItem.objects.bulk_create([
+                    PurchaseItem(
                         purchase_order=order,
-                        product=product,
+                        product=products[product_id],
                         quantity=quantity,
                         cost_price=cost_price,
                         total_price=total_price
                     )
+                    for product_id, quantity, cost_price, total_price in lines
+                ])
+
+                # 🔹 Whatever was paid upfront is the order's first vendor payment
+                if total_paid > 0:
+                    VendorPayment.objects.create(
+                        purchase_order=order,
+                        paid_by=user,
+                        amount_paid=total_paid,
+                        payment_mode=request.POST.get('payment_mode', 'cash'),
+                        remarks="Paid with order"
+                    )
 
                 messages.success(request, "Purchase order created successfully.")
                 return redirect('purchase_order_table')
@@ -2471,3 +2730,179 @@ def add_purchase_order(request):
         'role_permission': role_permission
     }
     return render(request, 'company_admin/purchase_order.html', context)
+
+
+@requires("orders", "a")
+def pay_vendor(request, vendor_id):
+    current_user, role_permission = get_logged_in_user(request)
+    if not current_user:
+        return redirect('login')
+
+    vendor = get_object_or_404(Vendor.objects.select_related('balance'), id=vendor_id)
+
+    if request.method == 'POST':
+        try:
+            if request.POST.get('allocate'):
+                # 🔹 One amount, settled against the oldest orders first
+                amount = Decimal(request.POST.get('total_amount') or '0')
+                if amount <= 0:
+                    raise ValidationError("Amount must be greater than 0.")
+                allocations = allocate(vendor, amount)
+            else:
+                allocations = {
+                    key.split('_', 1)[1]: Decimal(value)
+                    for key, value in request.POST.items()
+                    if key.startswith('amount_') and value.strip()
+                }
+            run = pay(
+                vendor,
+                allocations,
+                user=current_user,
+                payment_mode=request.POST.get('payment_mode', 'bank_transfer'),
+                reference=request.POST.get('reference', '').strip(),
+                remarks=request.POST.get('remarks', '')
+            )
+        except (ValidationError, InvalidOperation, ValueError) as e:
+            messages.error(request, f"Error processing payment: {'; '.join(getattr(e, 'messages', [str(e)]))}")
+            return redirect('pay_vendor', vendor_id=vendor.id)
+
+        messages.success(request, f"₹{run.amount} paid to {vendor.name} across {len(allocations)} purchase order(s).")
+        return redirect('view_vendor', vendor_id=vendor.id)
+
+    context = {
+        'vendor': vendor,
+        'balance': getattr(vendor, 'balance', None),
+        'orders': open_orders(vendor),
+        'selected': request.GET.get('order', ''),
+        'current_user': current_user,
+        'role_permission': role_permission
+    }
+    return render(request, 'company_admin/pay_vendor.html', context)
+
+
+from .goods_receipt import receive
+
+
+@requires("inventory", "a")
+def receive_purchase_order(request, order_id):
+    current_user, role_permission = get_logged_in_user(request)
+    if not current_user:
+        return redirect('login')
+
+    order = get_object_or_404(PurchaseOrder.objects.select_related('vendor'), id=order_id)
+
+    if request.method == 'POST':
+        if request.POST.get('receive_all'):
+            quantities = None
+        else:
+            quantities = {
+                key.split('_', 1)[1]: value
+                for key, value in request.POST.items()
+                if key.startswith('received_') and value.strip()
+            }
+        try:
+            receipt = receive(order.id, quantities, user=current_user, remarks=request.POST.get('remarks', ''))
+        except (ValidationError, ValueError) as e:
+            messages.error(request, f"Error receiving purchase order: {'; '.join(getattr(e, 'messages', [str(e)]))}")
+            return redirect('receive_purchase_order', order_id=order.id)
+
+        if receipt is None:
+            messages.error(request, "Enter the quantity received for at least one item.")
+            return redirect('receive_purchase_order', order_id=order.id)
+        messages.success(request, f"GRN-{receipt.id} posted to inventory.")
+        return redirect('purchase_order_table')
+
+    context = {
+        'order': order,
+        'items': order.items.select_related('product'),
+        'receipts': order.receipts.select_related('received_by').prefetch_related('movements__product').order_by('-received_at'),
+        'current_user': current_user,
+        'role_permission': role_permission
+    }
+    return render(request, 'company_admin/receive_purchase_order.html', context)
+
+
+from .search import search
+
+def global_search(request):
+    current_user, role_permission = get_logged_in_user(request)
+    if not current_user:
+        return JsonResponse({"error": "Login required"}, status=401)
+
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 50))
+    except ValueError:
+        limit = 20
+
+    return JsonResponse({"query": query, "results": search(current_user, role_permission, query, limit=limit)})
+
+
+from .margins import GROUPS, drilldown
+
+
+@requires("reports", "v", json=True)
+def margin_report_api(request):
+    current_user, role_permission = get_logged_in_user(request)
+
+    group = request.GET.get('group', 'product')
+    if group not in GROUPS:
+        return JsonResponse({"error": f"group must be one of: {', '.join(GROUPS)}"}, status=400)
+
+    try:
+        start = dt.strptime(request.GET['start'], "%Y-%m-%d").date() if request.GET.get('start') else None
+        end = dt.strptime(request.GET['end'], "%Y-%m-%d").date() if request.GET.get('end') else None
+        limit = max(1, min(int(request.GET.get('limit', 50)), 500))
+        product, salesman, customer = (
+            int(request.GET[name]) if request.GET.get(name) else None for name in ('product', 'salesman', 'customer')
+        )
+    except ValueError:
+        return JsonResponse({"error": "start/end must be YYYY-MM-DD; limit, product, salesman and customer numbers"}, status=400)
+
+    # 🔹 Salesmen only drill into their own sales
+    if not (current_user.role and current_user.role.name.lower() == "admin"):
+        salesman = current_user.id
+
+    report = drilldown(
+        group,
+        start=start,
+        end=end,
+        product=product,
+        salesman=salesman,
+        customer=customer,
+        limit=limit,
+    )
+    return JsonResponse({"group": group, "start": start, "end": end, **report})
+
+
+from .sales_trends import BUCKETS, DIMENSIONS, range_error, trend
+
+
+@requires("reports", "v", json=True)
+def sales_trend_api(request):
+    current_user, role_permission = get_logged_in_user(request)
+
+    bucket = request.GET.get('bucket', 'month')
+    dimension = request.GET.get('dimension', 'all')
+    if bucket not in BUCKETS or dimension not in DIMENSIONS:
+        return JsonResponse({"error": f"bucket must be one of: {', '.join(BUCKETS)}; "
+                                      f"dimension one of: {', '.join(DIMENSIONS)}"}, status=400)
+
+    try:
+        end = dt.strptime(request.GET['end'], "%Y-%m-%d").date() if request.GET.get('end') else timezone.localdate()
+        start = dt.strptime(request.GET['start'], "%Y-%m-%d").date() if request.GET.get('start') else None
+        limit = max(1, min(int(request.GET.get('limit', 10)), 100))
+    except ValueError:
+        return JsonResponse({"error": "start/end must be YYYY-MM-DD and limit a number"}, status=400)
+    # ✅ Checked before any date arithmetic or bucket building
+    error = range_error(start or end, end, bucket)
+    if error:
+        return JsonResponse({"error": error}, status=400)
+    start = start or end - datetime.timedelta(days=364)
+
+    # 🔹 Salesmen only see the trend of their own sales
+    key = request.GET.get('key')
+    if not (current_user.role and current_user.role.name.lower() == "admin"):
+        dimension, key = 'salesman', str(current_user.id)
+
+    return JsonResponse(trend(start, end, bucket=bucket, dimension=dimension, key=key, limit=limit))
@@ -0,0 +1,104 @@
+import uuid
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .goods_receipt import weighted_average
+from .locations import default_location, stock_in
+from .models import BillOfMaterial, Component, ComponentUsage, DailyProduction, Inventory, RefurbishedProduct
+
+
+CENT = Decimal('0.01')
+
+
+def bom_cost(lines, prices):
+    """Component cost of one unit: sum of purchase_price x quantity over the recipe lines."""
+    total = sum((prices[component_id] * quantity for component_id, quantity in lines), Decimal('0'))
+    return total.quantize(CENT, ROUND_HALF_UP)
+
+
+def _consume(needs):
+    """
+    Take `needs` ({component_id: units}) out of stock in one UPDATE. stock_quantity
+    is a PositiveIntegerField, so the database's CHECK rejects the whole statement
+    if any row would go below zero, even when another work order got there first.
+    """
+    drawn = Case(*[When(id=component_id, then=Value(units)) for component_id, units in needs.items()],
+                 output_field=IntegerField())
+    try:
+        with transaction.atomic():
+            Component.objects.filter(id__in=needs).update(stock_quantity=F('stock_quantity') - drawn)
+    except IntegrityError:
+        raise ValidationError("Component stock changed while posting the work order; try again.")
+
+
+def produce(product, quantity, sale_price, mrp, serial_number='', production_date=None, user=None, remarks='', location=None):
+    """
+    Run a refurbishment work order: make `quantity` units of `product`.
+
+    Consumes the product's whole bill of materials for every unit at once
+    (components locked, one conditional UPDATE, usage rows bulk-inserted),
+    prices a unit from the components' purchase_price and records the batch
+    as a DailyProduction carrying that unit_cost, held at `location` (the
+    default store room when None), with the product's Inventory stocked in
+    and its average cost re-weighted. Products without a bill of materials
+    are stocked in as before, with no cost and nothing consumed.
+
+    Query count doesn't grow with the size of the bill of materials.
+    Raises ValidationError listing every short component; returns the batch.
+    """
+    quantity = int(quantity)
+    if quantity <= 0:
+        raise ValidationError("Quantity must be greater than 0.")
+    serial_number = (serial_number or '').strip()
+
+    with transaction.atomic():
+        lines = list(BillOfMaterial.objects.filter(product=product).values_list('component_id', 'quantity'))
+        needs = {component_id: per_unit * quantity for component_id, per_unit in lines}
+
+        # Locked in id order so two work orders sharing components can't deadlock
+        components = {c.id: c for c in Component.objects.select_for_update().filter(id__in=needs).order_by('id')}
+        short = [
+            f"{components[cid].name} (need {units}, have {components[cid].stock_quantity})"
+            for cid, units in needs.items() if components[cid].stock_quantity < units
+        ]
+        if short:
+            raise ValidationError(f"Not enough stock for {', '.join(short)}.")
+
+        if needs:
+            _consume(needs)
+        unit_cost = bom_cost(lines, {cid: c.purchase_price for cid, c in components.items()})
+
+        if not serial_number:
+            serial_number = f"WO-{uuid.uuid4().hex[:10].upper()}"
+        if RefurbishedProduct.objects.filter(serial_number=serial_number).exists():
+            raise ValidationError(f"Work order {serial_number} already exists.")
+
+        production_date = production_date or timezone.localdate()
+        work_order = RefurbishedProduct.objects.create(
+            product=product, serial_number=serial_number, production_date=production_date,
+            produced_quantity=quantity, remarks=remarks, created_by=user,
+        )
+        # bulk_create skips ComponentUsage.save, which would deduct the stock a second time
+        ComponentUsage.objects.bulk_create([
+            ComponentUsage(refurbished_product=work_order, component_id=cid, quantity_used=units)
+            for cid, units in needs.items()
+        ])
+        batch = DailyProduction.objects.create(
+            refurbished_product=work_order, product=product, refurbished_date=production_date,
+            stock_in=quantity, serial_number=serial_number, sale_price=sale_price, mrp=mrp, unit_cost=unit_cost,
+            location=location or default_location(),
+        )
+        stock_in(batch, batch.location)
+
+        inventory = Inventory.objects.select_for_update().filter(product=product).order_by('id').first()
+        if inventory is None:
+            inventory = Inventory(product=product)
+        if lines:
+            inventory.average_cost = weighted_average(inventory.current_stock, inventory.average_cost, quantity, unit_cost)
+        inventory.stock_in += quantity
+        inventory.update_stock()
+    return batch
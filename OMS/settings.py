@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,9 +48,20 @@ INSTALLED_APPS = [
 CRONJOBS = [
     # every 30 minutes
     ('*/30 * * * *', 'yourapp.cron.refresh_gsp_token'),
+    # every 10 minutes: days touched by check-ins, check-outs and orders since the last run
+    ('*/10 * * * *', 'django.core.management.call_command', ['refresh_route_summaries']),
+    # every 15 minutes: margin facts and sales rollups for days changed since the last run
+    ('*/15 * * * *', 'django.core.management.call_command', ['refresh_margin_facts']),
+    ('*/15 * * * *', 'django.core.management.call_command', ['refresh_sales_trends']),
+    # nightly: full margin and trend rebuilds (they drop deleted orders), product ranks, component reorder plan
+    ('30 1 * * *', 'django.core.management.call_command', ['refresh_margin_facts', '--full']),
+    ('45 1 * * *', 'django.core.management.call_command', ['refresh_sales_trends', '--full']),
+    ('0 2 * * *', 'django.core.management.call_command', ['refresh_product_ranks']),
+    ('30 2 * * *', 'django.core.management.call_command', ['plan_component_reorders']),
 ]
 
 MIDDLEWARE = [
+    'App1.query_metrics.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,10 +75,17 @@ ROOT_URLCONF = 'OMS.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'App1.query_metrics.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR,'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates are compiled once per process; runserver's autoreloader
+            # clears this cache when a template file changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -81,12 +101,113 @@ WSGI_APPLICATION = 'OMS.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Database profile, chosen by OMS_DB:
+#   "sqlite"   (default) local development; App1.db_tuning applies SQLITE_PRAGMAS
+#              (busy_timeout, mmap, and with OMS_SQLITE_WAL=1 also WAL and
+#              synchronous=NORMAL) to every connection.
+#   "postgres" production; needs the OMS_DB_* variables below and psycopg
+#              (pip install -r requirements-postgres.txt).
+OMS_DB = os.environ.get('OMS_DB', 'sqlite')
+
+if OMS_DB == 'postgres':
+    try:
+        import psycopg  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured('OMS_DB=postgres needs psycopg: pip install -r requirements-postgres.txt')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('OMS_DB_NAME', 'oms'),
+            'USER': os.environ.get('OMS_DB_USER', 'oms'),
+            'PASSWORD': os.environ.get('OMS_DB_PASSWORD', ''),
+            'HOST': os.environ.get('OMS_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('OMS_DB_PORT', '5432'),
+            # Reuse each worker's connection across requests, and ping it
+            # before reuse so a restarted server doesn't surface as a 500.
+            'CONN_MAX_AGE': int(os.environ.get('OMS_DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('OMS_DB_POOL') == '1':
+        # psycopg's pool (in requirements-postgres.txt) replaces persistent connections.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('OMS_DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('OMS_DB_POOL_MAX', 10)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('OMS_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Take the write lock when a transaction starts instead of
+                # failing with "database is locked" when a reader upgrades.
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
+
+SQLITE_PRAGMAS = {
+    'busy_timeout': int(os.environ.get('OMS_SQLITE_BUSY_TIMEOUT', 20000)),  # ms to wait for the write lock
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
 }
+# WAL is stored in the database file itself and keeps -wal/-shm files beside
+# it, so the checked-in db.sqlite3 stays in rollback mode unless asked for
+# (use OMS_DB_NAME to point at a copy). "PRAGMA journal_mode=DELETE" undoes it.
+if os.environ.get('OMS_SQLITE_WAL') == '1':
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',       # readers no longer block the writer (and vice versa)
+        'synchronous': 'NORMAL',     # safe with WAL; fsync at checkpoints, not every commit
+        **SQLITE_PRAGMAS,
+    }
+
+
+# Cache: "file" (default) is a file cache every worker on the host shares
+# without running a cache server (App1.file_cache: atomic add/incr, and a
+# private directory, since the cache unpickles what it reads - never point it
+# at a shared path like /tmp or /dev/shm); "locmem" is per-process and only
+# suits a single process.
+OMS_CACHE = os.environ.get('OMS_CACHE', 'file')
+
+CACHES = {
+    'file': {
+        'default': {
+            'BACKEND': 'App1.file_cache.FileBasedCache',
+            'LOCATION': os.environ.get('OMS_CACHE_LOCATION', str(BASE_DIR / 'var' / 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    },
+    'locmem': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'oms',
+        }
+    },
+}[OMS_CACHE]
+
+
+# Sessions: "cached_db" (default) serves reads from the cache and only writes
+# the database when a session changes; "signed_cookies" keeps no server-side
+# state at all; "db" is Django's default table-per-request store.
+OMS_SESSION_MODE = os.environ.get('OMS_SESSION_MODE', 'cached_db')
+
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[OMS_SESSION_MODE]
+
+
+# Per-request query metrics (App1.query_metrics): the X-DB-Queries and
+# Server-Timing headers are sent when DEBUG is on or OMS_QUERY_HEADERS=1; set
+# OMS_QUERY_LOG to a file path to also append one JSON line per request for
+# `manage.py query_report`.
+QUERY_METRICS_HEADERS = DEBUG or os.environ.get('OMS_QUERY_HEADERS') == '1'
+QUERY_METRICS_LOG = os.environ.get('OMS_QUERY_LOG') or None
+QUERY_METRICS_SAMPLE = float(os.environ.get('OMS_QUERY_SAMPLE', 1.0))
 
 
 # Password validation
@@ -148,6 +269,17 @@ EMAIL_HOST_PASSWORD = 'bziw yrjw xypw kujj'
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Uploads are stored once per content hash (media/cas/) and reference counted,
+# so duplicate uploads share one file and URLs can be cached forever.
+STORAGES = {
+    "default": {
+        "BACKEND": "App1.media_storage.ContentAddressedStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
 
 # --- GSP credentials (put real values in env vars) ---
 GSP_APPID = "771CB8E5C27049A48B38426439175284"
@@ -0,0 +1,121 @@
+// Type-ahead picker for an <input> backed by a JSON endpoint answering
+// ?q=<text>&limit=<n> with {"results": [...]}.
+//
+//   attachAutocomplete(input, {
+//       url: "/autocomplete/products/",
+//       label: item => item.name,           // main line
+//       detail: item => "₹" + item.mrp,     // optional second line
+//       onPick: item => { ... },
+//   });
+//
+// Lookups are debounced, a newer lookup cancels the one in flight and answers
+// are kept per query, so retyping or backspacing doesn't hit the server again.
+function attachAutocomplete(input, options) {
+    const limit = options.limit || 10;
+    const answers = new Map();
+    const menu = document.createElement("div");
+    menu.className = "list-group shadow-sm";
+    menu.style.cssText = "position:absolute; left:0; right:0; z-index:1050; max-height:320px; overflow-y:auto; display:none;";
+    input.parentNode.style.position = "relative";
+    input.after(menu);
+    input.setAttribute("autocomplete", "off");
+
+    let timer = null;
+    let controller = null;
+    let items = [];
+    let active = -1;
+
+    function close() {
+        menu.style.display = "none";
+        active = -1;
+    }
+
+    function highlight(index) {
+        const entries = menu.querySelectorAll(".list-group-item-action");
+        if (!entries.length) return;
+        active = (index + entries.length) % entries.length;
+        entries.forEach((el, i) => el.classList.toggle("active", i === active));
+        entries[active].scrollIntoView({ block: "nearest" });
+    }
+
+    function pick(index) {
+        const item = items[index];
+        if (!item) return;
+        close();
+        options.onPick(item);
+    }
+
+    function render(results) {
+        items = results;
+        active = -1;
+        menu.innerHTML = "";
+
+        if (!results.length) {
+            const empty = document.createElement("div");
+            empty.className = "list-group-item text-muted";
+            empty.textContent = "No matches";
+            menu.appendChild(empty);
+        }
+        results.forEach((item, i) => {
+            const option = document.createElement("button");
+            option.type = "button";
+            option.className = "list-group-item list-group-item-action";
+            option.textContent = options.label(item);
+            if (options.detail) {
+                const detail = document.createElement("small");
+                detail.className = "d-block text-muted";
+                detail.textContent = options.detail(item);
+                option.appendChild(detail);
+            }
+            // mousedown fires before the input's blur closes the menu
+            option.addEventListener("mousedown", e => {
+                e.preventDefault();
+                pick(i);
+            });
+            menu.appendChild(option);
+        });
+        menu.style.display = "block";
+    }
+
+    function lookup() {
+        const query = input.value.trim().toLowerCase();
+        if (answers.has(query)) return render(answers.get(query));
+
+        if (controller) controller.abort();
+        controller = new AbortController();
+        const params = new URLSearchParams({ q: query, limit: limit });
+
+        fetch(`${options.url}?${params}`, { signal: controller.signal })
+            .then(res => res.json())
+            .then(data => {
+                if (data.error) return console.error("❌ Autocomplete failed:", data.error);
+                answers.set(query, data.results);
+                if (document.activeElement === input) render(data.results);
+            })
+            .catch(err => {
+                if (err.name !== "AbortError") console.error("❌ Autocomplete failed:", err);
+            });
+    }
+
+    input.addEventListener("input", () => {
+        clearTimeout(timer);
+        timer = setTimeout(lookup, 150);
+    });
+    input.addEventListener("focus", lookup);
+    input.addEventListener("blur", close);
+    input.addEventListener("keydown", e => {
+        if (menu.style.display === "none") return;
+        if (e.key === "ArrowDown") {
+            e.preventDefault();
+            highlight(active + 1);
+        } else if (e.key === "ArrowUp") {
+            e.preventDefault();
+            highlight(active - 1);
+        } else if (e.key === "Enter") {
+            e.preventDefault();
+            pick(active >= 0 ? active : 0);
+        } else if (e.key === "Escape") {
+            close();
+        }
+    });
+}